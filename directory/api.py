@@ -0,0 +1,333 @@
+"""
+A read-only JSON API for the directory.
+
+Each resource is a list, in primary key order, paginated with a cursor:
+``?after=<pk>`` (the ``next`` url is given in each response), and
+``?limit=`` (default 100, at most 1000).  ``?fields=a,b,...`` selects
+the fields of each object.
+
+Responses have an ETag and a Last-Modified header, derived from small
+aggregate queries (the latest ``modified`` time of everything the
+resource shows, and the number of objects, and of their related rows,
+so that deletions change the ETag), so a conditional request for an
+unchanged resource gets a 304 response without anything being rendered.
+"""
+###############
+from __future__ import print_function, unicode_literals
+
+import hashlib
+
+from django.db import models
+from django.http import JsonResponse
+from django.views.decorators.http import condition
+from django.views.generic import View
+
+from .models import DirectoryEntry, EntryType
+
+#######################################################################
+
+
+def _isoformat(value):
+    return None if value is None else value.isoformat()
+
+
+def _text(value):
+    return None if value in (None, "") else "{}".format(value)
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class APIListView(View):
+    """
+    The base class for API resources.
+    Subclasses give the ``queryset`` (or ``get_queryset()``),
+    ``field_names``, and ``serialize(obj)`` returning a dictionary.
+    ``modified_lookups`` are the (to-one) datetime lookups the
+    validators use; ``get_related(queryset)`` gives the querysets of
+    to-many related rows, whose latest ``modified`` time is also used,
+    and which the ETag counts (since deleting one changes no
+    ``modified`` time).  Each is aggregated on its own, rather than
+    over a join which multiplies the rows.
+    """
+
+    http_method_names = ["get", "head", "options"]
+    queryset = None
+    field_names = []
+    modified_lookups = ["modified"]
+    page_size = 100
+    max_page_size = 1000
+
+    def get_queryset(self):
+        return self.queryset.all()
+
+    def prepare(self, queryset):
+        """
+        Add related object loading to the page queryset.
+        """
+        return queryset
+
+    def get_related(self, queryset):
+        """
+        The querysets of to-many related rows shown with ``queryset``.
+        """
+        return []
+
+    def serialize(self, obj):
+        """
+        Return the dictionary of all the ``field_names`` for an object.
+        """
+        raise NotImplementedError
+
+    def get_state(self):
+        """
+        The triple (latest modification time, number of objects,
+        numbers of related rows); one query, plus one for each related
+        queryset, computed once per request.
+        """
+        if not hasattr(self, "_state"):
+            queryset = self.get_queryset().order_by()
+            aggregates = {
+                "modified_{}".format(n): models.Max(lookup)
+                for n, lookup in enumerate(self.modified_lookups)
+            }
+            result = queryset.aggregate(
+                count=models.Count("pk", distinct=True), **aggregates
+            )
+            modified = [result[k] for k in aggregates]
+            related_counts = []
+            for related in self.get_related(queryset):
+                related = related.order_by().aggregate(
+                    modified=models.Max("modified"), count=models.Count("pk")
+                )
+                modified.append(related["modified"])
+                related_counts.append(related["count"])
+            modified = [value for value in modified if value is not None]
+            self._state = (
+                max(modified) if modified else None,
+                result["count"],
+                related_counts,
+            )
+        return self._state
+
+    def get_last_modified(self, request, *args, **kwargs):
+        return self.get_state()[0]
+
+    def get_etag(self, request, *args, **kwargs):
+        last_modified, count, related_counts = self.get_state()
+        value = "{}|{}|{}|{}".format(
+            request.get_full_path(),
+            _isoformat(last_modified),
+            count,
+            ",".join(map(str, related_counts)),
+        )
+        return hashlib.md5(value.encode("utf-8")).hexdigest()
+
+    def dispatch(self, request, *args, **kwargs):
+        view = condition(
+            etag_func=self.get_etag, last_modified_func=self.get_last_modified
+        )(super(APIListView, self).dispatch)
+        return view(request, *args, **kwargs)
+
+    def get_fields(self):
+        fields = self.request.GET.get("fields")
+        if not fields:
+            return list(self.field_names)
+        fields = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in fields if f not in self.field_names]
+        if unknown:
+            raise BadRequest("Unknown field(s): {}".format(", ".join(unknown)))
+        return fields
+
+    def _int_param(self, name, default):
+        value = self.request.GET.get(name)
+        if value in (None, ""):
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise BadRequest("{} must be an integer".format(name))
+
+    def get(self, request, *args, **kwargs):
+        try:
+            fields = self.get_fields()
+            limit = self._int_param("limit", self.page_size)
+            after = self._int_param("after", None)
+        except BadRequest as e:
+            return JsonResponse({"error": "{}".format(e)}, status=400)
+        limit = max(1, min(limit, self.max_page_size))
+
+        queryset = self.get_queryset().order_by("pk")
+        if after is not None:
+            queryset = queryset.filter(pk__gt=after)
+        # one extra, to know if there is a next page.
+        object_list = list(self.prepare(queryset[: limit + 1]))
+        next_url = None
+        if len(object_list) > limit:
+            object_list = object_list[:limit]
+            params = request.GET.copy()
+            params["after"] = object_list[-1].pk
+            next_url = request.build_absolute_uri(
+                request.path + "?" + params.urlencode()
+            )
+
+        results = []
+        for obj in object_list:
+            data = self.serialize(obj)
+            results.append(dict([(f, data[f]) for f in fields]))
+        return JsonResponse(
+            {"count": self.get_state()[1], "next": next_url, "results": results}
+        )
+
+
+#######################################################################
+
+
+class EntryTypeAPIView(APIListView):
+    """
+    The active entry types.
+    """
+
+    queryset = EntryType.objects.active()
+    field_names = ["id", "slug", "verbose_name", "verbose_name_plural", "ordering"]
+
+    def serialize(self, obj):
+        return {
+            "id": obj.pk,
+            "slug": obj.slug,
+            "verbose_name": obj.verbose_name,
+            "verbose_name_plural": obj.verbose_name_plural,
+            "ordering": obj.ordering,
+        }
+
+
+class DirectoryEntryAPIView(APIListView):
+    """
+    The directory entries (``DirectoryEntry.objects.default_list()``);
+    ``?type=<slug>`` restricts the entry type.
+    """
+
+    field_names = [
+        "id",
+        "type",
+        "person",
+        "name",
+        "title",
+        "office",
+        "phone",
+        "email",
+        "url",
+        "mugshot_url",
+        "note",
+        "ordering",
+    ]
+    modified_lookups = [
+        "modified",
+        "type__modified",
+        "person__modified",
+        "office__modified",
+    ]
+
+    def get_queryset(self):
+        queryset = DirectoryEntry.objects.default_list()
+        if self.request.GET.get("type"):
+            queryset = queryset.filter(type__slug=self.request.GET["type"])
+        return queryset
+
+    def get_related(self, queryset):
+        from people.models import EmailAddress, PhoneNumber
+
+        person_pks = queryset.values("person")
+        return [
+            PhoneNumber.objects.filter(person__in=person_pks),
+            EmailAddress.objects.filter(person__in=person_pks),
+        ]
+
+    def prepare(self, queryset):
+        from people.models import EmailAddress, PhoneNumber
+        from people.querysets import contact_info_prefetches
+
+        return queryset.prefetch_related(None).prefetch_related(
+            *contact_info_prefetches("person__", types=[PhoneNumber, EmailAddress])
+        )
+
+    def serialize(self, obj):
+        from .utils.snapshot import snapshot_values
+
+        values = snapshot_values(obj)
+        return {
+            "id": obj.pk,
+            "type": obj.type.slug,
+            "person": obj.person.slug,
+            "name": values["name"],
+            "title": _text(values["title"]),
+            "office": _text(values["office"]),
+            "phone": _text(values["phone"]),
+            "email": _text(values["email"]),
+            "url": _text(values["url"]),
+            "mugshot_url": _text(values["mugshot_url"]),
+            "note": _text(values["note"]),
+            "ordering": obj.ordering,
+        }
+
+
+class PersonAPIView(APIListView):
+    """
+    The people with active directory entries
+    (``DirectoryEntry.objects.person_list()``).
+    """
+
+    field_names = [
+        "id",
+        "slug",
+        "cn",
+        "given_name",
+        "sn",
+        "title",
+        "phone",
+        "email",
+        "url",
+    ]
+
+    def get_queryset(self):
+        return DirectoryEntry.objects.person_list()
+
+    def get_related(self, queryset):
+        from people.models import EmailAddress, PhoneNumber
+
+        person_pks = queryset.values("pk")
+        return [
+            PhoneNumber.objects.filter(person__in=person_pks),
+            EmailAddress.objects.filter(person__in=person_pks),
+        ]
+
+    def prepare(self, queryset):
+        from people.models import EmailAddress, PhoneNumber
+
+        return queryset.with_contact_info(PhoneNumber, EmailAddress).with_urls()
+
+    def serialize(self, obj):
+        from people.utils.permalink import resolve
+
+        email = obj.email
+        return {
+            "id": obj.pk,
+            "slug": obj.slug,
+            "cn": obj.cn,
+            "given_name": obj.given_name,
+            "sn": obj.sn,
+            "title": _text(obj.title),
+            "phone": _text(obj.phone),
+            "email": None if email is None else email.address,
+            "url": _text(resolve(obj)),
+        }
+
+
+#######################################################################
+
+entrytype_list = EntryTypeAPIView.as_view()
+directoryentry_list = DirectoryEntryAPIView.as_view()
+person_list = PersonAPIView.as_view()
+
+#######################################################################
@@ -0,0 +1,89 @@
+"""
+Memoized application settings, shared by the ``conf`` modules of the
+directory, people, and person_tags applications.
+
+Each application's settings (its ``*_CONFIG`` dictionary, over its
+``DEFAULT``) are resolved once, on first use, and again whenever
+Django's ``setting_changed`` signal reports a change to them,
+e.g., with ``override_settings()`` in tests.
+
+Values derived from the settings (e.g., a frozenset for membership
+tests) can be memoized with ``derived()``; they are cleared along
+with the settings.
+"""
+#######################
+from __future__ import print_function, unicode_literals
+
+from django.conf import settings
+from django.core.signals import setting_changed
+
+#######################################################################
+
+
+class AppConf(object):
+    """
+    The settings of an application: ``CONFIG_NAME`` over ``DEFAULT``.
+    """
+
+    def __init__(self, config_name, default):
+        self.config_name = config_name
+        self.default = default
+        self._values = None
+        self._derived = {}
+        setting_changed.connect(self._setting_changed, weak=False)
+
+    def _setting_changed(self, setting=None, **kwargs):
+        if setting == self.config_name:
+            self.clear()
+
+    def clear(self):
+        """
+        Forget the resolved settings, and derived values.
+        """
+        self._values = None
+        self._derived = {}
+
+    def _load(self):
+        app_settings = getattr(settings, self.config_name, self.default)
+        self._values = dict(
+            [
+                (setting, app_settings.get(setting, default))
+                for setting, default in self.default.items()
+            ]
+        )
+        return self._values
+
+    def get(self, setting):
+        values = self._values
+        if values is None:
+            values = self._load()
+        try:
+            return values[setting]
+        except KeyError:
+            raise AssertionError("the setting %r has no default value" % setting)
+
+    def set(self, setting, value):
+        assert setting in self.default, "the setting %r has no default value" % setting
+        app_settings = getattr(settings, self.config_name, self.default)
+        app_settings[setting] = value
+        self.clear()
+        return value
+
+    def get_all(self):
+        values = self._values
+        if values is None:
+            values = self._load()
+        return dict(values)
+
+    def derived(self, name, func):
+        """
+        Return ``func()``, computed once per resolution of the settings.
+        """
+        try:
+            return self._derived[name]
+        except KeyError:
+            value = self._derived[name] = func()
+            return value
+
+
+#######################################################################
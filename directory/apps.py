@@ -48,5 +48,115 @@ class DirectoryConfig(AppConfig):
                 signals.directoryentry_post_delete, sender=DirectoryEntry
             )
 
+        if conf.get("cache:enabled"):
+            from django.apps import apps
+            from people.models import EmailAddress, Person, PhoneNumber
+            from .models import EntryType, DirectoryEntry
+
+            # Invalidate cached pages on any edit of what they show.
+            office_model = apps.get_model(*conf.get("office_model").split("."))
+            for sender in [
+                DirectoryEntry,
+                EntryType,
+                Person,
+                PhoneNumber,
+                EmailAddress,
+                office_model,
+            ]:
+                models.signals.post_save.connect(
+                    signals.cache_post_change, sender=sender
+                )
+                models.signals.post_delete.connect(
+                    signals.cache_post_change, sender=sender
+                )
+                for field in sender._meta.many_to_many:
+                    models.signals.m2m_changed.connect(
+                        signals.cache_m2m_changed, sender=field.remote_field.through
+                    )
+            for sender in [DirectoryEntry, EntryType, Person]:
+                models.signals.pre_save.connect(
+                    signals.cache_pre_save_remember, sender=sender
+                )
+
+        if (
+            conf.get("cache:enabled")
+            or conf.get("mailing-lists:materialized")
+            or conf.get("snapshot:enabled")
+        ):
+            from people.signals import people_deactivated
+
+            people_deactivated.connect(signals.people_deactivated_handler)
+
+        if conf.get("mailing-lists:materialized"):
+            from people.models import EmailAddress, Person
+            from .models import EntryType, DirectoryEntry
+
+            # Refresh the mailing lists on any edit of what they include.
+            for sender in [DirectoryEntry, EntryType, Person, EmailAddress]:
+                models.signals.post_save.connect(
+                    signals.mailinglist_post_change, sender=sender
+                )
+                models.signals.post_delete.connect(
+                    signals.mailinglist_post_change, sender=sender
+                )
+            for sender in [DirectoryEntry, EntryType]:
+                models.signals.pre_save.connect(
+                    signals.cache_pre_save_remember, sender=sender
+                )
+
+        if conf.get("snapshot:enabled"):
+            from django.apps import apps
+            from people.models import EmailAddress, Person, PhoneNumber
+            from .models import EntryType, DirectoryEntry
+
+            # Refresh the snapshot rows on any edit of what they show.
+            office_model = apps.get_model(*conf.get("office_model").split("."))
+            for sender in [
+                DirectoryEntry,
+                EntryType,
+                Person,
+                PhoneNumber,
+                EmailAddress,
+                office_model,
+            ]:
+                models.signals.post_save.connect(
+                    signals.snapshot_post_change, sender=sender
+                )
+                models.signals.post_delete.connect(
+                    signals.snapshot_post_change, sender=sender
+                )
+
+        if conf.get("print:prebuild") and conf.get("print:cache"):
+            from django.apps import apps
+            from people.models import Person, PhoneNumber
+            from .models import EntryType, DirectoryEntry
+
+            # Rebuild the printed directory on any edit of what it shows.
+            office_model = apps.get_model(*conf.get("office_model").split("."))
+            for sender in [
+                DirectoryEntry,
+                EntryType,
+                Person,
+                PhoneNumber,
+                office_model,
+            ]:
+                models.signals.post_save.connect(
+                    signals.print_post_change, sender=sender
+                )
+                models.signals.post_delete.connect(
+                    signals.print_post_change, sender=sender
+                )
+
+        if conf.get("mugshot:thumbnails"):
+            from .models import DirectoryEntry
+
+            # Generate thumbnails for new mugshots.
+            models.signals.pre_save.connect(
+                signals.mugshot_pre_save, sender=DirectoryEntry
+            )
+            models.signals.post_save.connect(
+                signals.mugshot_post_save, sender=DirectoryEntry
+            )
+
 
 #########################################################################
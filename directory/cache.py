@@ -0,0 +1,163 @@
+"""
+Rendered page cache for the directory.
+
+Cached pages are keyed by the request URL and by the current version of
+every "scope" the page depends on:
+
+* ``lists``: pages that aggregate the whole directory.
+* ``type:<slug>``: the page for a single entry type.
+* ``person:<slug>``: the directory page for a single person.
+
+Signal handlers (see ``directory.signals``) bump the versions of exactly
+the scopes affected by an edit, after the transaction commits; pages
+cached under old versions are never read again and simply expire.
+"""
+###############
+from __future__ import print_function, unicode_literals
+
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import caches
+from django.db import transaction
+
+from . import conf
+
+VERSION_KEY_PREFIX = "directory:cache:version:"
+PAGE_KEY_PREFIX = "directory:cache:page:"
+LISTS_SCOPE = "lists"
+
+#######################################################################
+
+
+def get_cache():
+    return caches[conf.get("cache:alias")]
+
+
+def _version_key(scope):
+    return VERSION_KEY_PREFIX + hashlib.md5(scope.encode("utf-8")).hexdigest()
+
+
+def get_versions(scope_list):
+    """
+    Return a list of the current versions for the scopes.
+    Missing versions are initialized from the clock, so that pages
+    cached before a version key was evicted are never reused.
+    """
+    cache = get_cache()
+    keys = [_version_key(scope) for scope in scope_list]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            cache.add(key, int(time.time() * 1000), None)
+            version = cache.get(key)
+        versions.append(version)
+    return versions
+
+
+def bump_versions(scope_list):
+    """
+    Invalidate every page cached for the scopes.
+    """
+    cache = get_cache()
+    for scope in set(scope_list):
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # not set (or evicted): any new clock value is a new version.
+            cache.set(key, int(time.time() * 1000), None)
+
+
+def invalidate(type_slugs=None, person_slugs=None):
+    """
+    Invalidate the aggregate pages, and the pages for the given
+    entry types and people, once the current transaction commits.
+    """
+    scope_list = [LISTS_SCOPE]
+    scope_list += ["type:{}".format(slug) for slug in type_slugs or [] if slug]
+    scope_list += ["person:{}".format(slug) for slug in person_slugs or [] if slug]
+    invalidate_scopes(scope_list)
+
+
+def invalidate_scopes(scope_list):
+    """
+    Invalidate every page cached for the scopes, once the current
+    transaction commits.
+    """
+    transaction.on_commit(lambda: bump_versions(scope_list))
+
+
+#######################################################################
+
+
+def is_cacheable_request(request):
+    """
+    Only anonymous GET/HEAD requests are cached; anything else may
+    see per-user content (e.g., update links).
+    """
+    if request.method not in ("GET", "HEAD"):
+        return False
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return False
+    return True
+
+
+def page_key(request, scope_list):
+    """
+    The cache key for this request, given the scopes of the page.
+    """
+    versions = get_versions(scope_list)
+    url = request.build_absolute_uri()
+    return "{}{}.{}".format(
+        PAGE_KEY_PREFIX,
+        hashlib.md5(url.encode("utf-8")).hexdigest(),
+        ".".join(["{}".format(v) for v in versions]),
+    )
+
+
+def cache_directory_page(*scopes):
+    """
+    View decorator: cache the rendered page under the given scopes.
+    Scopes are formatted with the view's keyword arguments, e.g.,
+    ``cache_directory_page("type:{slug}")``.
+    With no scopes, the page is an aggregate (``lists``) page.
+    """
+    if not scopes:
+        scopes = (LISTS_SCOPE,)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not conf.get("cache:enabled") or not is_cacheable_request(request):
+                return view(request, *args, **kwargs)
+
+            key = page_key(request, [scope.format(**kwargs) for scope in scopes])
+            cache = get_cache()
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return response
+
+            def store(response):
+                cache.set(key, response, conf.get("cache:timeout"))
+
+            if callable(getattr(response, "render", None)):
+                response.add_post_render_callback(store)
+            else:
+                store(response)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+#######################################################################
@@ -4,8 +4,11 @@ CLI list for DirectoryEntry objects.
 #######################
 from __future__ import print_function, unicode_literals
 
+import sys
+
+from people.utils.export import FORMATS, throughput_report, write_export
+
 from ..models import DirectoryEntry as Model
-from . import resolve_fields
 
 #######################
 #######################################################################
@@ -23,6 +26,27 @@ OPTION_LIST = (
             default="type,office,office.phone_number,person.email",
         ),
     ),
+    (
+        ["--format"],
+        dict(
+            choices=FORMATS,
+            default="tsv",
+            help="Output format [default: %(default)s]",
+        ),
+    ),
+    (
+        ["--chunk-size"],
+        dict(
+            type=int,
+            default=500,
+            dest="chunk_size",
+            help="Number of objects loaded per chunk [default: %(default)s]",
+        ),
+    ),
+    (
+        ["--stats"],
+        dict(action="store_true", help="Report throughput on stderr when done"),
+    ),
 )
 
 # ARGS_USAGE = '...'
@@ -35,12 +59,15 @@ OPTION_LIST = (
 
 def main(options, args):
 
-    qs = Model.objects.active()
-    for item in qs:
-        value_list = ["{}".format(item.pk), "{}".format(item)]
-        if options["field_list"]:
-            value_list += resolve_fields(item, options["field_list"].split(","))
-        print("\t".join(value_list))
+    queryset = Model.objects.active()
+    field_list = []
+    if options["field_list"]:
+        field_list = options["field_list"].split(",")
+    n, elapsed = write_export(
+        queryset, field_list, options["format"], chunk_size=options["chunk_size"]
+    )
+    if options["stats"]:
+        print(throughput_report(n, elapsed), file=sys.stderr)
 
 
 #######################################################################
@@ -0,0 +1,66 @@
+"""
+Print the directory mailing lists, from the materialized store.
+One line per list: the list slug, a tab, and the comma separated addresses.
+"""
+#######################
+from __future__ import print_function, unicode_literals
+
+import json
+
+from django.utils.dateparse import parse_datetime
+
+from ..utils.EMAIL import get_lists, main as all_lists, refresh_lists
+
+#######################
+#######################################################################
+
+HELP_TEXT = __doc__.strip()
+DJANGO_COMMAND = "main"
+USE_ARGPARSE = True
+OPTION_LIST = (
+    (
+        ["--refresh"],
+        dict(
+            action="store_true",
+            help="Recompute every list from the directory first (only changed lists are written)",
+        ),
+    ),
+    (
+        ["--since"],
+        dict(
+            help="Only lists changed since this date/time (e.g., 2019-06-01T00:00:00); emptied lists are printed with no addresses",
+        ),
+    ),
+    (
+        ["--format"],
+        dict(
+            choices=["tsv", "json"],
+            default="tsv",
+            help="Output format [default: %(default)s]",
+        ),
+    ),
+)
+
+#######################################################################
+
+
+def main(options, args):
+    if options["refresh"]:
+        refresh_lists()
+    if options["since"]:
+        since = parse_datetime(options["since"])
+        if since is None:
+            print("Could not parse date/time: {}".format(options["since"]))
+            return
+        results = get_lists(since)
+    else:
+        results = all_lists()
+
+    if options["format"] == "json":
+        print(json.dumps(results, indent=2, sort_keys=True))
+        return
+    for slug in sorted(results):
+        print("{}\t{}".format(slug, results[slug]))
+
+
+#######################################################################
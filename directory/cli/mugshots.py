@@ -0,0 +1,53 @@
+"""
+Generate the missing mugshot thumbnails (e.g., for photos uploaded
+before thumbnails were enabled), and report the changes.
+"""
+#######################
+from __future__ import print_function, unicode_literals
+
+from .. import conf
+from ..utils.mugshots import update_thumbnails
+
+#######################
+#######################################################################
+
+HELP_TEXT = __doc__.strip()
+DJANGO_COMMAND = "main"
+USE_ARGPARSE = True
+OPTION_LIST = (
+    (
+        ["entry_pk"],
+        dict(
+            nargs="*",
+            type=int,
+            help="Only process the mugshots of these directory entries [default: all]",
+        ),
+    ),
+    (
+        ["--force"],
+        dict(action="store_true", help="Regenerate existing thumbnails"),
+    ),
+    (
+        ["--quiet"],
+        dict(action="store_true", help="Only report changes"),
+    ),
+)
+
+#######################################################################
+
+
+def main(options, args):
+    if not conf.get("mugshot:thumbnails") and not options["quiet"]:
+        print("Note: new uploads do not get thumbnails (mugshot:thumbnails).")
+    updated, written = update_thumbnails(
+        options["entry_pk"] or None, force=options["force"]
+    )
+    if updated or written or not options["quiet"]:
+        print(
+            "Mugshots: {} entries updated, {} thumbnails written.".format(
+                updated, written
+            )
+        )
+
+
+#######################################################################
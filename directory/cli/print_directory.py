@@ -10,12 +10,9 @@ import sys
 import time
 from optparse import make_option
 
-from directory.models import DirectoryEntry, EntryType
-from django.template import Context, Template
-from django.template.loader import render_to_string
 from latex import LaTeX_Document
 
-from .. import conf
+from ..utils.printing import get_pdf, render_source
 
 #######################
 
@@ -40,18 +37,10 @@ OPTION_LIST = (
 
 #############################################################
 
-TEMPLATE = "directory/print/directory.tex"
-
-# extra_context = conf.get('extra_context')
-
-#############################################################
-
 
 def main(options, args):
     d = LaTeX_Document()
-    context = {"directory_list": EntryType.objects.active()}
-    #    context.update(extra_context)
-    src = render_to_string(TEMPLATE, context)
+    src = render_source()
 
     d.set_full_src(src)
 
@@ -59,7 +48,8 @@ def main(options, args):
         print("You cannot use both --pdf and --tex")
         sys.exit(1)
     elif options["pdf"]:
-        sys.stdout.write(d.pdf_data())
+        # the same build cache as the admin view.
+        sys.stdout.write(get_pdf(src))
     elif options["tex"]:
         sys.stdout.write(str(d))
         if sys.stdout.isatty() and not str(d).endswith("\n"):
@@ -0,0 +1,47 @@
+"""
+Refresh the directory snapshot (the flattened copy of the active
+entries used to render the public pages), and report the changes.
+"""
+#######################
+from __future__ import print_function, unicode_literals
+
+from .. import conf
+from ..utils.snapshot import refresh_snapshot
+
+#######################
+#######################################################################
+
+HELP_TEXT = __doc__.strip()
+DJANGO_COMMAND = "main"
+USE_ARGPARSE = True
+OPTION_LIST = (
+    (
+        ["entry_pk"],
+        dict(
+            nargs="*",
+            type=int,
+            help="Only refresh the rows of these directory entries [default: all]",
+        ),
+    ),
+    (
+        ["--quiet"],
+        dict(action="store_true", help="Only report changes"),
+    ),
+)
+
+#######################################################################
+
+
+def main(options, args):
+    if not conf.get("snapshot:enabled") and not options["quiet"]:
+        print("Note: the snapshot is not enabled (snapshot:enabled).")
+    created, updated, deleted = refresh_snapshot(options["entry_pk"] or None)
+    if created or updated or deleted or not options["quiet"]:
+        print(
+            "Snapshot: {} created, {} updated, {} deleted.".format(
+                created, updated, deleted
+            )
+        )
+
+
+#######################################################################
@@ -41,6 +41,9 @@ DEFAULT = {
     # specify the domain '@example.com' for aggregate mailing lists.
     # using None disables the generation of aggregate directory lists.
     "mailing-lists:domain": None,
+    # keep the mailing lists materialized in the database (see utils/EMAIL.py),
+    #   updated as entries, people and email addresses change.
+    "mailing-lists:materialized": True,
     # for each entrytype slug listed: signals automatically handle personflags
     # which correspond to entrytypes.  The slug '__all__' indicates what
     # you would expect.
@@ -48,9 +51,40 @@ DEFAULT = {
     # This next setting allows all directory entry types to be personflags
     #   but not all personflags become directory entry types, unless ``True``.
     "signals:entrytypes-personflags:personflag-fwd-on": False,
+    # Rendered page cache for the public directory pages (see cache.py).
+    #   Pages are only cached for anonymous users.
+    #   Edits invalidate pages by bumping version keys in the cache, so the
+    #   cache (``cache:alias``) *must* be shared by every process, e.g.,
+    #   memcached or redis -- not the default per-process LocMemCache.
+    "cache:enabled": False,
+    "cache:alias": "default",
+    "cache:timeout": 60 * 60 * 24,  # seconds; edits invalidate immediately.
+    # keep a flattened snapshot of the active entries (see utils/snapshot.py),
+    #   updated as entries, people, contact information and offices change;
+    #   the entry type pages and the printed directory render from it.
+    "snapshot:enabled": False,
+    # mugshot thumbnails (see utils/mugshots.py): generated for new uploads,
+    #   as each width (pixels) in each format; backfill with the mugshots CLI.
+    #   The visual directories show photos 90 pixels wide.
+    "mugshot:thumbnails": True,
+    "mugshot:widths": [90, 180, 270],
+    "mugshot:formats": ["webp", "jpeg"],
+    "mugshot:quality": 80,
+    # cache the printed directory PDF (see utils/printing.py), keyed on the
+    #   LaTeX source; the PDF shows the date it was built, hence the timeout.
+    "print:cache": True,
+    "print:timeout": 60 * 60 * 24,  # seconds
+    "print:lock-timeout": 5 * 60,  # seconds; the longest a build may take.
+    # rebuild the PDF of the whole directory in a celery task on any edit.
+    "print:prebuild": False,
+    # the number of urls on each page of the sitemap (see sitemap.py).
+    "sitemap:limit": 1000,
 }
 
-from django.conf import settings
+from .appconf import AppConf
+
+
+_conf = AppConf(CONFIG_NAME, DEFAULT)
 
 
 def get(setting):
@@ -58,18 +92,22 @@ def get(setting):
     get(setting) -> value
 
     setting should be a string representing the application settings to
-    retrieve.
+    retrieve.  Settings are resolved once, see directory.appconf
     """
-    assert setting in DEFAULT, "the setting %r has no default value" % setting
-    app_settings = getattr(settings, CONFIG_NAME, DEFAULT)
-    return app_settings.get(setting, DEFAULT[setting])
+    return _conf.get(setting)
 
 
 def get_all():
     """
     Return all current settings as a dictionary.
     """
-    app_settings = getattr(settings, CONFIG_NAME, DEFAULT)
-    return dict(
-        [(setting, app_settings.get(setting, DEFAULT[setting])) for setting in DEFAULT]
-    )
+    return _conf.get_all()
+
+
+def derived(name, func):
+    """
+    derived(name, func) -> func()
+
+    A value computed from the settings, memoized until they change.
+    """
+    return _conf.derived(name, func)
@@ -0,0 +1,48 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("directory", "0006_auto_20170602_1055")]
+
+    operations = [
+        migrations.CreateModel(
+            name="MailingList",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="creation time"
+                    ),
+                ),
+                (
+                    "modified",
+                    models.DateTimeField(
+                        db_index=True,
+                        default=django.utils.timezone.now,
+                        editable=False,
+                        verbose_name="last change time",
+                    ),
+                ),
+                ("slug", models.SlugField(max_length=64, unique=True)),
+                ("addresses", models.TextField(blank=True, default="")),
+                (
+                    "content_hash",
+                    models.CharField(blank=True, default="", max_length=40),
+                ),
+            ],
+            options={"ordering": ["slug"]},
+        )
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 2.2.28 on 2026-10-18 11:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("people", "0001_initial"), ("directory", "0007_mailinglist")]
+
+    operations = [
+        migrations.CreateModel(
+            name="DirectorySnapshot",
+            fields=[
+                (
+                    "entry",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="snapshot",
+                        serialize=False,
+                        to="directory.DirectoryEntry",
+                    ),
+                ),
+                (
+                    "modified",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        editable=False,
+                        verbose_name="last change time",
+                    ),
+                ),
+                ("ordering", models.PositiveSmallIntegerField(default=100)),
+                ("sn", models.CharField(blank=True, max_length=64)),
+                ("given_name", models.CharField(blank=True, max_length=64)),
+                ("name", models.CharField(max_length=255)),
+                ("url", models.CharField(blank=True, max_length=255)),
+                ("title", models.CharField(blank=True, max_length=128)),
+                ("office", models.CharField(blank=True, max_length=128)),
+                ("phone", models.CharField(blank=True, max_length=64)),
+                ("email", models.CharField(blank=True, max_length=254)),
+                ("mugshot_url", models.CharField(blank=True, max_length=512)),
+                ("note", models.CharField(blank=True, max_length=200)),
+                (
+                    "content_hash",
+                    models.CharField(blank=True, default="", max_length=40),
+                ),
+                (
+                    "person",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="people.Person",
+                    ),
+                ),
+                (
+                    "type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="directory.EntryType",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "directory snapshot row",
+                "ordering": ["ordering", "sn", "given_name", "entry"],
+            },
+        ),
+    ]
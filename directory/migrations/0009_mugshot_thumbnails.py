@@ -0,0 +1,28 @@
+#
+# Generated by Django 2.2.28 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [("directory", "0008_directorysnapshot")]
+
+    operations = [
+        migrations.AddField(
+            model_name="directoryentry",
+            name="mugshot_hash",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=40
+            ),
+        ),
+        migrations.AddField(
+            model_name="directorysnapshot",
+            name="mugshot_srcset",
+            field=models.TextField(blank=True, default=""),
+        ),
+        migrations.AddField(
+            model_name="directorysnapshot",
+            name="mugshot_webp_srcset",
+            field=models.TextField(blank=True, default=""),
+        ),
+    ]
@@ -17,10 +17,12 @@ from importlib import import_module
 from django.apps import apps
 from django.db import models
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.encoding import python_2_unicode_compatible
 from people.models import Person
 
 from . import PhoneNumberField, conf
+from .utils import mugshots
 
 mugshot_uploadto = conf.get("mugshot_path")
 office_modelname = conf.get("office_model")  # e.g. 'places.Office'
@@ -81,6 +83,34 @@ class EntryTypeQuerySet(CustomQuerySet):
         """
         return self.values_list("slug", flat=True)
 
+    def with_entry_counts(self):
+        """
+        Annotate each entry type with ``active_entry_count``,
+        the number of active entries for active people.
+        """
+        return self.annotate(
+            active_entry_count=models.Count(
+                "directoryentry",
+                filter=models.Q(
+                    directoryentry__active=True, directoryentry__person__active=True
+                ),
+            )
+        )
+
+    def with_active_entries(self):
+        """
+        Prefetch the active entries of every entry type, as the list
+        ``active_entry_list``.  This is a fixed number of queries,
+        regardless of the number of types or entries.
+        """
+        return self.prefetch_related(
+            models.Prefetch(
+                "directoryentry_set",
+                queryset=DirectoryEntry.objects.active(),
+                to_attr="active_entry_list",
+            )
+        )
+
 
 class EntryTypeManager(CustomQuerySetManager):
     queryset_class = EntryTypeQuerySet
@@ -239,6 +269,10 @@ class DirectoryEntry(models.Model):
         blank=True,
         help_text="(Optional) a photo for the visual directory.",
     )
+    # content hash of the mugshot, once its thumbnails exist.
+    mugshot_hash = models.CharField(
+        max_length=40, blank=True, default="", editable=False
+    )
     note = models.CharField(
         max_length=200,
         blank=True,
@@ -266,5 +300,99 @@ class DirectoryEntry(models.Model):
         if get_absolute_url is not None:
             return get_absolute_url()
 
+    @property
+    def mugshot_thumbnail_url(self):
+        return mugshots.thumbnail_url(self.mugshot, self.mugshot_hash)
+
+    @property
+    def mugshot_srcset(self):
+        return mugshots.srcset(self.mugshot, self.mugshot_hash, "jpeg")
+
+    @property
+    def mugshot_webp_srcset(self):
+        return mugshots.srcset(self.mugshot, self.mugshot_hash, "webp")
+
+
+######################################################################
+
+
+@python_2_unicode_compatible
+class MailingList(models.Model):
+    """
+    The materialized email addresses for the active entries of an
+    entry type, maintained by ``directory.utils.EMAIL``.
+    ``modified`` is only updated when the addresses change.
+    """
+
+    created = models.DateTimeField(
+        auto_now_add=True, editable=False, verbose_name="creation time"
+    )
+    modified = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        db_index=True,
+        verbose_name="last change time",
+    )
+
+    slug = models.SlugField(max_length=64, unique=True)
+    addresses = models.TextField(blank=True, default="")
+    content_hash = models.CharField(max_length=40, blank=True, default="")
+
+    class Meta:
+        ordering = ["slug"]
+
+    def __str__(self):
+        return self.slug
+
+
+######################################################################
+
+
+@python_2_unicode_compatible
+class DirectorySnapshot(models.Model):
+    """
+    A flattened, display ready copy of an active directory entry,
+    maintained by ``directory.utils.snapshot``, so the public pages
+    can be rendered without joins.
+    ``modified`` is only updated when the row changes.
+    """
+
+    entry = models.OneToOneField(
+        DirectoryEntry,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="snapshot",
+    )
+    type = models.ForeignKey(EntryType, on_delete=models.CASCADE)
+    person = models.ForeignKey(Person, on_delete=models.CASCADE, related_name="+")
+    modified = models.DateTimeField(
+        default=timezone.now, editable=False, verbose_name="last change time"
+    )
+
+    # DirectoryEntry ordering: type, ordering, person (sn, given_name)
+    ordering = models.PositiveSmallIntegerField(default=100)
+    sn = models.CharField(max_length=64, blank=True)
+    given_name = models.CharField(max_length=64, blank=True)
+
+    name = models.CharField(max_length=255)
+    url = models.CharField(max_length=255, blank=True)
+    title = models.CharField(max_length=128, blank=True)
+    office = models.CharField(max_length=128, blank=True)
+    phone = models.CharField(max_length=64, blank=True)
+    email = models.CharField(max_length=254, blank=True)
+    mugshot_url = models.CharField(max_length=512, blank=True)
+    mugshot_srcset = models.TextField(blank=True, default="")
+    mugshot_webp_srcset = models.TextField(blank=True, default="")
+    note = models.CharField(max_length=200, blank=True)
+
+    content_hash = models.CharField(max_length=40, blank=True, default="")
+
+    class Meta:
+        ordering = ["ordering", "sn", "given_name", "entry"]
+        verbose_name = "directory snapshot row"
+
+    def __str__(self):
+        return self.name
+
 
 #
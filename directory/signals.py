@@ -5,13 +5,29 @@ circular signal handling.
 """
 ################################################################
 
+from django.dispatch import Signal
+
 from . import conf
 
-SYNC_SLUGS = conf.get("signals:entrytypes-personflags")
+################################################################
+
+# Sent after directory entries are created or (de)activated in bulk
+#   (bulk_create() and QuerySet.update() send no post_save signals), e.g.,
+#   by ``directory.utils.sync`` and ``directory.utils.sessionals``.
+#   ``sender`` is the DirectoryEntry model; ``person_pks`` the people
+#   whose entries (or who themselves) changed.
+entries_changed = Signal(providing_args=["person_pks"])
+
+################################################################
+
+
+def _sync_slugs():
+    return frozenset(conf.get("signals:entrytypes-personflags"))
 
 
 def should_sync(slug):
-    return "__all__" in SYNC_SLUGS or slug in SYNC_SLUGS
+    sync_slugs = conf.derived("sync-slugs", _sync_slugs)
+    return "__all__" in sync_slugs or slug in sync_slugs
 
 
 ################################################################
@@ -150,46 +166,44 @@ def person_flags_m2m_changed_handler(
 ):
     """
     Push person flag changes to corresponding directory entries, if any.
+    This works for both person.flags and personflag.person_set changes.
     """
     if getattr(instance, "_directory_sync_signal", False):
         return
-    person = instance
-
-    if action not in ["post_add", "post_remove", "pre_clear"]:
+    if action == "pre_clear":
+        # remember what is about to be cleared, for post_clear.
+        field = "personflag_id" if reverse else "person_id"
+        other = "person_id" if reverse else "personflag_id"
+        instance._directory_sync_cleared = set(
+            sender.objects.filter(**{field: instance.pk}).values_list(other, flat=True)
+        )
+        return
+    if action == "post_clear":
+        pk_set = instance.__dict__.pop("_directory_sync_cleared", set())
+    elif action not in ["post_add", "post_remove"]:
         return
 
-    from .models import EntryType, DirectoryEntry
     from people.models import PersonFlag
+    from people.utils import deferred
 
-    slug_list = []
-    if pk_set is not None:
-        slug_list = PersonFlag.objects.filter(pk__in=pk_set).values_list(
-            "slug", flat=True
-        )
-    if action == "pre_clear":
-        slug_list = person.flags.all().values_list("slug", flat=True)
-
-    slug_list = [slug for slug in slug_list if should_sync(slug)]
+    if reverse:
+        person_pks, flag_pks = pk_set, [instance.pk]
+    else:
+        person_pks, flag_pks = [instance.pk], pk_set
+    if not person_pks or not flag_pks:
+        return
+    if deferred.is_deferred():
+        deferred.defer("directory.utils.sync.sync_entries_from_flags", person_pks)
+        return
 
-    person._directory_sync_signal = True
-    if action in ["pre_clear", "post_remove"]:
-        directoryentry_qs = person.directoryentry_set.filter(
-            active=True, type__slug__in=slug_list
-        )
-        directoryentry_qs.update(active=False)
+    from .utils.sync import sync_entries_from_flags
 
-    if action == "post_add":
-        entrytype_slugs = EntryType.objects.slug_list()
-        for slug in slug_list:
-            if slug not in entrytype_slugs:
-                continue
-            entrytype = EntryType.objects.get(slug=slug)
-            entry, created = DirectoryEntry.objects.get_or_create(
-                type=entrytype, person=person
-            )
-            if not entry.active:
-                entry.active = True
-                entry.save()
+    slug_list = PersonFlag.objects.filter(pk__in=flag_pks).values_list(
+        "slug", flat=True
+    )
+    slug_list = [slug for slug in slug_list if should_sync(slug)]
+    if slug_list:
+        sync_entries_from_flags(person_pks, slug_list)
 
 
 ################################################################
@@ -249,3 +263,217 @@ def directoryentry_post_delete(sender, instance, **kwargs):
 
 
 ################################################################
+
+
+def cache_pre_save_remember(sender, instance, raw, **kwargs):
+    """
+    Remember what an edit may move a page away from: the old slug,
+    or for directory entries, the old type and person.
+    """
+    if instance.pk is None:
+        return
+    from .models import DirectoryEntry
+
+    fields = ["type", "person"] if sender is DirectoryEntry else ["slug"]
+    instance._directory_cache_old = (
+        sender._default_manager.filter(pk=instance.pk).values(*fields).first()
+    )
+
+
+################################################################
+
+
+def cache_post_change(sender, instance, **kwargs):
+    """
+    Invalidate the cached directory pages which show this instance:
+    a directory entry, entry type, person, contact info, or office.
+    Used for both post_save and post_delete.
+    """
+    from people.models import Person
+    from . import cache
+    from .models import DirectoryEntry, EntryType
+
+    old = getattr(instance, "_directory_cache_old", None) or {}
+    type_pks, person_pks = [], []
+    type_slugs, person_slugs = [], []
+    entries = None
+    if isinstance(instance, DirectoryEntry):
+        type_pks = [instance.type_id, old.get("type")]
+        person_pks = [instance.person_id, old.get("person")]
+    elif isinstance(instance, EntryType):
+        type_slugs = [instance.slug, old.get("slug")]
+        entries = DirectoryEntry.objects.filter(type=instance.pk)
+    elif isinstance(instance, Person):
+        person_slugs = [instance.slug, old.get("slug")]
+        entries = DirectoryEntry.objects.filter(person=instance.pk)
+    elif hasattr(instance, "person_id"):  # contact information
+        person_pks = [instance.person_id]
+        entries = DirectoryEntry.objects.filter(person=instance.person_id)
+    else:  # office
+        entries = DirectoryEntry.objects.filter(office=instance.pk)
+
+    if entries is not None:
+        for type_slug, person_slug in entries.values_list("type__slug", "person__slug"):
+            type_slugs.append(type_slug)
+            person_slugs.append(person_slug)
+    type_pks = [pk for pk in type_pks if pk is not None]
+    if type_pks:
+        type_slugs += EntryType.objects.filter(pk__in=type_pks).values_list(
+            "slug", flat=True
+        )
+    person_pks = [pk for pk in person_pks if pk is not None]
+    if person_pks:
+        person_slugs += Person.objects.filter(pk__in=person_pks).values_list(
+            "slug", flat=True
+        )
+    cache.invalidate(type_slugs, person_slugs)
+
+
+################################################################
+
+
+def cache_m2m_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """
+    Many-to-many changes invalidate cached pages as an edit of
+    the object(s) on the cached side of the relation.
+    """
+    if action not in ["post_add", "post_remove", "pre_clear"]:
+        return
+    if not reverse:
+        cache_post_change(instance.__class__, instance)
+        return
+    if pk_set is None:  # reverse clear
+        field = [
+            f for f in model._meta.many_to_many if f.remote_field.through is sender
+        ]
+        obj_list = model._default_manager.filter(**{field[0].name: instance})
+    else:
+        obj_list = model._default_manager.filter(pk__in=pk_set)
+    for obj in obj_list:
+        cache_post_change(model, obj)
+
+
+################################################################
+
+
+def mailinglist_post_change(sender, instance, **kwargs):
+    """
+    Refresh the materialized mailing lists which include this instance:
+    a directory entry, entry type, person, or email address.
+    Used for both post_save and post_delete.
+    """
+    from .models import DirectoryEntry, EntryType
+    from .utils.EMAIL import schedule_refresh
+
+    old = getattr(instance, "_directory_cache_old", None) or {}
+    if isinstance(instance, DirectoryEntry):
+        type_pks = [pk for pk in [instance.type_id, old.get("type")] if pk]
+        type_slugs = EntryType.objects.filter(pk__in=type_pks)
+    elif isinstance(instance, EntryType):
+        type_slugs = [instance.slug, old.get("slug")]
+    else:
+        person_pk = getattr(instance, "person_id", instance.pk)
+        type_slugs = EntryType.objects.filter(directoryentry__person=person_pk)
+    if not isinstance(type_slugs, list):
+        type_slugs = list(type_slugs.values_list("slug", flat=True).distinct())
+    schedule_refresh(type_slugs)
+
+
+################################################################
+
+
+def people_deactivated_handler(sender, pk_list, **kwargs):
+    """
+    People (and their entries) were deactivated in bulk: invalidate
+    their cached pages, and refresh their mailing lists and snapshot rows.
+    """
+    from people.models import Person
+    from . import cache
+    from .models import DirectoryEntry
+    from .utils.EMAIL import schedule_refresh
+
+    from .utils import snapshot
+
+    entries = DirectoryEntry.objects.filter(person__in=pk_list)
+    type_slugs = set(entries.values_list("type__slug", flat=True))
+    schedule_refresh(type_slugs)
+    if conf.get("snapshot:enabled"):
+        snapshot.schedule_refresh(entries.values_list("pk", flat=True))
+    if conf.get("cache:enabled"):
+        person_slugs = Person.objects.filter(pk__in=pk_list).values_list(
+            "slug", flat=True
+        )
+        cache.invalidate(type_slugs, person_slugs)
+
+
+################################################################
+
+
+def snapshot_post_change(sender, instance, **kwargs):
+    """
+    Refresh the snapshot rows which show this instance: a directory
+    entry, entry type, person, contact information, or office.
+    Used for both post_save and post_delete.
+    """
+    from .models import DirectoryEntry, EntryType
+    from .utils.snapshot import schedule_refresh
+    from people.models import Person
+
+    if isinstance(instance, DirectoryEntry):
+        schedule_refresh([instance.pk])
+        return
+    if isinstance(instance, EntryType):
+        entries = DirectoryEntry.objects.filter(type=instance.pk)
+    elif isinstance(instance, Person):
+        entries = DirectoryEntry.objects.filter(person=instance.pk)
+    elif hasattr(instance, "person_id"):  # contact information
+        entries = DirectoryEntry.objects.filter(person=instance.person_id)
+    else:  # office
+        entries = DirectoryEntry.objects.filter(office=instance.pk)
+    schedule_refresh(entries.order_by().values_list("pk", flat=True))
+
+
+################################################################
+
+
+def mugshot_pre_save(sender, instance, raw, **kwargs):
+    """
+    A new (or removed) mugshot forgets the content hash of the old one,
+    so its thumbnails are no longer used.
+    """
+    if raw or not instance.mugshot_hash:
+        return
+    old_name = (
+        sender._default_manager.filter(pk=instance.pk)
+        .values_list("mugshot", flat=True)
+        .first()
+    )
+    if old_name != instance.mugshot.name:
+        instance.mugshot_hash = ""
+
+
+def mugshot_post_save(sender, instance, raw, **kwargs):
+    """
+    Generate the thumbnails of a new mugshot.
+    """
+    if raw or not instance.mugshot or instance.mugshot_hash:
+        return
+    from .utils.mugshots import schedule_update
+
+    schedule_update([instance.pk])
+
+
+################################################################
+
+
+def print_post_change(sender, instance, **kwargs):
+    """
+    Rebuild the printed directory after any edit of what it shows.
+    Used for both post_save and post_delete.
+    """
+    from .utils.printing import schedule_prebuild
+
+    schedule_prebuild()
+
+
+################################################################
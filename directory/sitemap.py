@@ -0,0 +1,52 @@
+"""
+Sitemap for the directory: the personal pages of the people listed
+in the directory (see the people ``permalink`` setting).
+
+The sitemap is paginated (``sitemap:limit`` urls per page), and its
+pages are cached like the other aggregate directory pages, until the
+directory changes (see ``directory.cache``).
+"""
+from __future__ import print_function, unicode_literals
+
+from django.contrib.sitemaps import Sitemap
+from django.contrib.sitemaps import views as sitemap_views
+from people.models import Person
+from people.utils.permalink import get_permalink, resolve
+
+from . import conf
+from .cache import cache_directory_page
+from .models import DirectoryEntry
+
+#######################################################################
+
+
+class DirectorySitemap(Sitemap):
+    """
+    The people with active directory entries, with their urls attached
+    as the page is loaded.
+    """
+
+    @property
+    def limit(self):
+        return conf.get("sitemap:limit")
+
+    def items(self):
+        if get_permalink() is None:
+            return Person.objects.none()  # no personal pages.
+        return DirectoryEntry.objects.person_list().with_urls().order_by("pk")
+
+    def location(self, person):
+        return resolve(person)
+
+    def lastmod(self, person):
+        return person.modified
+
+
+sitemaps = {"directory": DirectorySitemap}
+
+#######################################################################
+
+index = cache_directory_page()(sitemap_views.index)
+sitemap = cache_directory_page()(sitemap_views.sitemap)
+
+#######################################################################
@@ -11,9 +11,13 @@ from django.conf import settings
 from django.core.mail import mail_admins
 
 from celery.schedules import crontab
-from celery.task import PeriodicTask
+from celery.task import PeriodicTask, Task
 
+from . import conf
+from .cli.mugshots import main as update_mugshots
+from .cli.snapshot import main as refresh_snapshot
 from .cli.update_sessionals import main as update_sessionals
+from .utils.printing import prebuild as prebuild_print_directory
 
 ###############################################################
 
@@ -53,8 +57,57 @@ class CLITaskRunMixin(object):
 class UpdateSessionals(PeriodicTask, CLITaskRunMixin):
     run_every = timedelta(hours=24)
 
+    options = {"role": False, "dry_run": False, "format": "tsv"}
+
+    def run(self, **kwargs):
+        return self.cli_taskrun_wrapper(update_sessionals, self.options, [])
+
+
+###############################################################
+
+
+class RefreshSnapshot(PeriodicTask, CLITaskRunMixin):
+    """
+    Catch anything the signals missed, e.g., bulk edits.
+    """
+
+    run_every = timedelta(hours=24)
+
+    options = {"entry_pk": [], "quiet": True}
+
+    def run(self, **kwargs):
+        if conf.get("snapshot:enabled"):
+            return self.cli_taskrun_wrapper(refresh_snapshot, self.options, [])
+
+
+###############################################################
+
+
+class UpdateMugshots(PeriodicTask, CLITaskRunMixin):
+    """
+    Thumbnails for mugshots the signals missed, e.g., bulk imports.
+    """
+
+    run_every = timedelta(hours=24)
+
+    options = {"entry_pk": [], "force": False, "quiet": True}
+
+    def run(self, **kwargs):
+        if conf.get("mugshot:thumbnails"):
+            return self.cli_taskrun_wrapper(update_mugshots, self.options, [])
+
+
+###############################################################
+
+
+class PrebuildPrintDirectory(Task):
+    """
+    Build the printed directory PDF, if it is not cached;
+    see directory.utils.printing
+    """
+
     def run(self, **kwargs):
-        return self.cli_taskrun_wrapper(update_sessionals, {}, [])
+        prebuild_print_directory()
 
 
 ###############################################################
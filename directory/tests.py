@@ -5,7 +5,22 @@ unittest). These will both pass when you run "manage.py test".
 Replace these with more appropriate tests for your application.
 """
 
-from django.test import TestCase
+import datetime
+import json
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sites.requests import RequestSite
+from django.core.cache import caches
+from django.db import models
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from people.models import EmailAddress, Person
+
+from . import conf
+from .cache import cache_directory_page
+from .models import DirectoryEntry, DirectorySnapshot, EntryType, MailingList
+from .utils import EMAIL, sessionals, snapshot
 
 
 class SimpleTest(TestCase):
@@ -24,3 +39,881 @@ Another way to test that 1 + 1 is equal to 2.
 True
 """
 }
+
+
+#######################################################################
+
+
+@override_settings(DIRECTORY_CONFIG={"cache:enabled": True})
+class PageCache(TransactionTestCase):
+    """
+    Test the rendered page cache and its invalidation.
+    (TransactionTestCase, since invalidation happens on commit.)
+    """
+
+    def setUp(self):
+        from django.apps import apps
+
+        from people.models import EmailAddress, PhoneNumber
+
+        from . import signals
+
+        # the handlers DirectoryConfig.ready() connects with cache:enabled.
+        self.senders = [
+            DirectoryEntry,
+            EntryType,
+            Person,
+            PhoneNumber,
+            EmailAddress,
+            apps.get_model(*conf.get("office_model").split(".")),
+        ]
+        for sender in self.senders:
+            for signal in [models.signals.post_save, models.signals.post_delete]:
+                signal.connect(signals.cache_post_change, sender=sender)
+        for sender in [DirectoryEntry, EntryType, Person]:
+            models.signals.pre_save.connect(
+                signals.cache_pre_save_remember, sender=sender
+            )
+
+        caches[conf.get("cache:alias")].clear()
+        self.calls = []
+
+        def view(request, slug=None):
+            self.calls.append(slug)
+            return HttpResponse("page {}".format(len(self.calls)))
+
+        self.type_view = cache_directory_page("type:{slug}")(view)
+        self.person_view = cache_directory_page("person:{slug}")(view)
+        self.list_view = cache_directory_page()(view)
+
+        self.person = Person.objects.create(
+            given_name="First", sn="Person", cn="First Person"
+        )
+        self.other = Person.objects.create(
+            given_name="Other", sn="Person", cn="Other Person"
+        )
+        self.entrytype = EntryType.objects.create(
+            slug="staff", verbose_name="Staff", verbose_name_plural="Staff"
+        )
+        self.entry = DirectoryEntry.objects.create(
+            person=self.person, type=self.entrytype
+        )
+
+    def get(self, view, path, **kwargs):
+        request = RequestFactory().get(path)
+        request.user = AnonymousUser()
+        return view(request, **kwargs).content
+
+    def tearDown(self):
+        from . import signals
+
+        for sender in self.senders:
+            for signal in [models.signals.post_save, models.signals.post_delete]:
+                signal.disconnect(signals.cache_post_change, sender=sender)
+        for sender in [DirectoryEntry, EntryType, Person]:
+            models.signals.pre_save.disconnect(
+                signals.cache_pre_save_remember, sender=sender
+            )
+
+    def test_cached(self):
+        """
+        Repeated requests are served from the cache.
+        """
+        first = self.get(self.type_view, "/table/staff/", slug="staff")
+        second = self.get(self.type_view, "/table/staff/", slug="staff")
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_entry_invalidates(self):
+        """
+        Editing an entry invalidates its type, person, and the list pages,
+        but not other people.
+        """
+        self.get(self.type_view, "/table/staff/", slug="staff")
+        self.get(self.person_view, "/by-person/first/", slug=self.person.slug)
+        self.get(self.person_view, "/by-person/other/", slug=self.other.slug)
+        self.get(self.list_view, "/table/")
+        self.assertEqual(len(self.calls), 4)
+
+        self.entry.note = "On leave"
+        self.entry.save()
+        self.get(self.type_view, "/table/staff/", slug="staff")
+        self.get(self.person_view, "/by-person/first/", slug=self.person.slug)
+        self.get(self.person_view, "/by-person/other/", slug=self.other.slug)
+        self.get(self.list_view, "/table/")
+        self.assertEqual(len(self.calls), 7)
+
+    def test_contact_info_invalidates(self):
+        """
+        Editing a person's contact information invalidates their pages.
+        """
+        self.get(self.type_view, "/table/staff/", slug="staff")
+        self.person.add_email("first@example.com", "work", public=True)
+        self.get(self.type_view, "/table/staff/", slug="staff")
+        self.assertEqual(len(self.calls), 2)
+
+    def test_entry_move_invalidates(self):
+        """
+        Moving an entry to another type invalidates both types.
+        """
+        other_type = EntryType.objects.create(
+            slug="other", verbose_name="Other", verbose_name_plural="Others"
+        )
+        self.get(self.type_view, "/table/staff/", slug="staff")
+        self.get(self.type_view, "/table/other/", slug="other")
+        self.entry.type = other_type
+        self.entry.save()
+        self.get(self.type_view, "/table/staff/", slug="staff")
+        self.get(self.type_view, "/table/other/", slug="other")
+        self.assertEqual(len(self.calls), 4)
+
+
+#######################################################################
+
+
+class EntryTypeEntries(TestCase):
+    """
+    Test loading the entries of entry types in a fixed number of queries.
+    """
+
+    def setUp(self):
+        for t in range(3):
+            entrytype = EntryType.objects.create(
+                slug="type-{}".format(t),
+                verbose_name="Type {}".format(t),
+                verbose_name_plural="Types {}".format(t),
+            )
+            for n in range(t + 1):
+                person = Person.objects.create(
+                    given_name="Given{}".format(n),
+                    sn="Type{}".format(t),
+                    cn="Given{} Type{}".format(n, t),
+                )
+                person.add_email("p{}{}@example.com".format(t, n), "work", public=True)
+                DirectoryEntry.objects.create(person=person, type=entrytype)
+        # not counted: an inactive entry and an entry for an inactive person
+        entrytype = EntryType.objects.get(slug="type-2")
+        entry = entrytype.directoryentry_set.first()
+        entry.active = False
+        entry.save()
+        person = Person.objects.create(
+            given_name="Gone", sn="Type2", cn="Gone Type2", active=False
+        )
+        DirectoryEntry.objects.create(person=person, type=entrytype)
+
+    def test_entry_counts(self):
+        """
+        with_entry_counts() counts only active entries of active people.
+        """
+        counts = dict(
+            EntryType.objects.with_entry_counts().values_list(
+                "slug", "active_entry_count"
+            )
+        )
+        self.assertEqual(counts, {"type-0": 1, "type-1": 2, "type-2": 2})
+
+    def test_active_entries(self):
+        """
+        Entries, their people and contact info load in a fixed number of queries.
+        """
+        with self.assertNumQueries(4):
+            type_list = list(
+                EntryType.objects.active().with_entry_counts().with_active_entries()
+            )
+            emails = [
+                [entry.person.email.address for entry in t.active_entry_list]
+                for t in type_list
+            ]
+        self.assertEqual(
+            [len(t.active_entry_list) for t in type_list],
+            [t.active_entry_count for t in type_list],
+        )
+        self.assertEqual(emails[0], ["p00@example.com"])
+
+
+#######################################################################
+
+
+class SessionalChanges(TestCase):
+    """
+    Test the set-based update of sessional entries.
+    """
+
+    config = {
+        "academic:type:slug_list": ["academic-staff"],
+        "sessional:type:slug_list": ["sessional-instructors"],
+        "cn:blacklist": ["Black Listed"],
+    }
+
+    def setUp(self):
+        self.academic = EntryType.objects.create(
+            slug="academic-staff",
+            verbose_name="Academic staff",
+            verbose_name_plural="Academic staff",
+        )
+        self.sessional = EntryType.objects.create(
+            slug="sessional-instructors",
+            verbose_name="Sessional instructor",
+            verbose_name_plural="Sessional instructors",
+        )
+        self.people = {}
+        for cn in ["Prof", "Teaching", "Done", "Back", "New", "Gone", "Black Listed"]:
+            given_name, sn = (cn + " X").split()[:2]
+            self.people[cn] = Person.objects.create(
+                cn=cn, given_name=given_name, sn=sn, active=cn != "Gone"
+            )
+        DirectoryEntry.objects.create(person=self.people["Prof"], type=self.academic)
+        for cn, active in [("Teaching", True), ("Done", True), ("Back", False)]:
+            DirectoryEntry.objects.create(
+                person=self.people[cn], type=self.sessional, active=active
+            )
+
+    def test_changes(self):
+        teaching = set(
+            [
+                self.people[cn].pk
+                for cn in ["Prof", "Teaching", "Back", "New", "Gone", "Black Listed"]
+            ]
+        )
+        with self.assertNumQueries(2):
+            diff = sessionals.compute_changes(teaching, teaching, self.config)
+        self.assertEqual(
+            [(row["action"], row["cn"]) for row in diff],
+            [
+                (sessionals.DEACTIVATE, "Done"),
+                (sessionals.REACTIVATE, "Back"),
+                (sessionals.REACTIVATE_PERSON, "Gone"),
+                (sessionals.NEED_ENTRY, "Gone"),
+                (sessionals.NEED_ENTRY, "New"),
+            ],
+        )
+        report = sessionals.format_diff(diff).splitlines()
+        self.assertEqual(report[0].split("\t"), sessionals.DIFF_FIELDS)
+        self.assertEqual(len(report), 6)
+
+        sessionals.apply_changes(diff)
+        active = set(
+            DirectoryEntry.objects.active()
+            .filter(type=self.sessional)
+            .values_list("person__cn", flat=True)
+        )
+        self.assertEqual(active, set(["Teaching", "Back"]))
+        self.assertTrue(Person.objects.get(cn="Gone").active)
+        self.assertTrue(
+            Person.objects.filter(cn="New", flags__slug="directory").exists()
+        )
+        self.assertEqual(
+            sessionals.compute_changes(teaching, teaching, self.config)[-2:],
+            diff[-2:],
+        )
+
+    def test_inactive_people(self):
+        """
+        The entries of inactive people are neither academic nor sessional.
+        """
+        retired = Person.objects.create(
+            cn="Retired", given_name="Retired", sn="X", active=False
+        )
+        DirectoryEntry.objects.create(person=retired, type=self.academic)
+        DirectoryEntry.objects.create(person=self.people["Gone"], type=self.sessional)
+        diff = sessionals.compute_changes(
+            set([retired.pk]), set([retired.pk]), self.config
+        )
+        self.assertEqual(
+            [(row["action"], row["cn"]) for row in diff],
+            [
+                (sessionals.DEACTIVATE, "Done"),
+                (sessionals.DEACTIVATE, "Teaching"),
+                (sessionals.REACTIVATE_PERSON, "Retired"),
+                (sessionals.NEED_ENTRY, "Retired"),
+            ],
+        )
+
+    def test_reactivate_current_sections_only(self):
+        back = set([self.people["Back"].pk])
+        diff = sessionals.compute_changes(back, set(), self.config)
+        self.assertNotIn(sessionals.REACTIVATE, [row["action"] for row in diff])
+
+
+#######################################################################
+
+
+class MailingLists(TransactionTestCase):
+    """
+    Test the materialized mailing lists.
+    (TransactionTestCase, since lists are refreshed on commit.)
+    """
+
+    def setUp(self):
+        self.staff = EntryType.objects.create(
+            slug="support-staff", verbose_name="Staff", verbose_name_plural="Staff"
+        )
+        self.people = []
+        for n in range(3):
+            person = Person.objects.create(
+                given_name="P{}".format(n), sn="Staff", cn="P{} Staff".format(n)
+            )
+            person.add_email("p{}@example.com".format(n), "work", public=True)
+            DirectoryEntry.objects.create(person=person, type=self.staff)
+            self.people.append(person)
+
+    def test_incremental(self):
+        self.assertEqual(
+            EMAIL.get_lists(),
+            {"support-staff": "p0@example.com,p1@example.com,p2@example.com"},
+        )
+        since = MailingList.objects.get().modified
+        self.assertEqual(EMAIL.get_lists(since), {})
+
+        # an email change, then a deactivated entry.
+        email = self.people[1].emailaddress_set.get()
+        email.address = "new@example.com"
+        email.save()
+        self.people[1].add_email("other@example.com", "home", public=False)
+        self.assertIn("new@example.com", EMAIL.get_lists()["support-staff"])
+        entry = self.people[0].directoryentry_set.get()
+        entry.active = False
+        entry.save()
+        self.assertEqual(
+            EMAIL.get_lists(since), {"support-staff": "new@example.com,p2@example.com"}
+        )
+
+        # renaming the type moves the list.
+        self.staff.slug = "staff"
+        self.staff.save()
+        self.assertEqual(EMAIL.get_lists(), {"staff": "new@example.com,p2@example.com"})
+        self.assertEqual(EMAIL.get_lists(since)["support-staff"], "")
+
+    def test_queries(self):
+        with self.assertNumQueries(1):
+            EMAIL.get_lists()
+        with self.assertNumQueries(2):
+            lists = EMAIL.compute_lists()
+        self.assertEqual(
+            lists,
+            {"support-staff": ["p0@example.com", "p1@example.com", "p2@example.com"]},
+        )
+        self.assertEqual(EMAIL.refresh_lists(), [])
+
+
+class AppSettings(TestCase):
+    """
+    Test the memoized application settings.
+    """
+
+    def test_memoized(self):
+        from .appconf import AppConf
+
+        config = {"a": 1}
+        app_conf = AppConf("TEST_APPCONF_CONFIG", {"a": 0, "b": 0})
+        with self.settings(TEST_APPCONF_CONFIG=config):
+            self.assertEqual(app_conf.get_all(), {"a": 1, "b": 0})
+            config["a"] = 2  # not seen: resolved once.
+            self.assertEqual(app_conf.get("a"), 1)
+            self.assertEqual(app_conf.derived("ab", lambda: "ab"), "ab")
+            self.assertEqual(app_conf.derived("ab", lambda: "changed"), "ab")
+            app_conf.set("b", 3)
+            self.assertEqual(app_conf.get_all(), {"a": 2, "b": 3})
+            self.assertEqual(app_conf.derived("ab", lambda: "changed"), "changed")
+            with self.assertRaises(AssertionError):
+                app_conf.get("c")
+        self.assertEqual(app_conf.get_all(), {"a": 0, "b": 0})
+
+    def test_should_sync(self):
+        from .signals import should_sync
+
+        with override_settings(
+            DIRECTORY_CONFIG={"signals:entrytypes-personflags": ["faculty"]}
+        ):
+            self.assertTrue(should_sync("faculty"))
+            self.assertFalse(should_sync("staff"))
+        with override_settings(
+            DIRECTORY_CONFIG={"signals:entrytypes-personflags": ["__all__"]}
+        ):
+            self.assertTrue(should_sync("staff"))
+        self.assertEqual(
+            should_sync("staff"),
+            "staff" in conf.get("signals:entrytypes-personflags"),
+        )
+
+
+@override_settings(DIRECTORY_CONFIG={"snapshot:enabled": True, "cache:enabled": False})
+class Snapshot(TransactionTestCase):
+    """
+    Test the directory snapshot.
+    (TransactionTestCase, since rows are refreshed on commit.)
+    """
+
+    def setUp(self):
+        from django.apps import apps
+
+        from people.models import EmailAddress, PhoneNumber
+
+        from . import signals
+
+        self.senders = [
+            DirectoryEntry,
+            EntryType,
+            Person,
+            PhoneNumber,
+            EmailAddress,
+            apps.get_model(*conf.get("office_model").split(".")),
+        ]
+        for sender in self.senders:
+            for signal in [models.signals.post_save, models.signals.post_delete]:
+                signal.connect(signals.snapshot_post_change, sender=sender)
+
+        self.staff = EntryType.objects.create(
+            slug="staff", verbose_name="Staff", verbose_name_plural="Staff"
+        )
+        self.entries = []
+        for n in range(3):
+            person = Person.objects.create(
+                given_name="P{}".format(n),
+                sn="Staff{}".format(2 - n),
+                cn="P{} Staff".format(n),
+                title="Person title",
+            )
+            person.add_email("p{}@example.com".format(n), "work", public=True)
+            self.entries.append(
+                DirectoryEntry.objects.create(
+                    person=person, type=self.staff, note="n{}".format(n)
+                )
+            )
+
+    def tearDown(self):
+        from . import signals
+
+        for sender in self.senders:
+            for signal in [models.signals.post_save, models.signals.post_delete]:
+                signal.disconnect(signals.snapshot_post_change, sender=sender)
+
+    def test_incremental(self):
+        rows = list(snapshot.get_rows([self.staff.pk]))
+        self.assertEqual([r.name for r in rows], ["P2 Staff", "P1 Staff", "P0 Staff"])
+        self.assertEqual(rows[0].email, "p2@example.com")
+        self.assertEqual(rows[0].title, "Person title")
+        self.assertEqual(rows[0].note, "n2")
+
+        # edits of the entry, the person, and contact information.
+        entry = self.entries[0]
+        entry.title = "Entry title"
+        entry.save()
+        person = entry.person
+        person.cn = "Renamed"
+        person.save()
+        email = person.emailaddress_set.get()
+        email.public = False
+        email.save()
+        row = DirectorySnapshot.objects.get(entry=entry)
+        self.assertEqual(
+            (row.name, row.title, row.email), ("Renamed", "Entry title", "")
+        )
+
+        # deactivation and deletion remove rows.
+        entry.active = False
+        entry.save()
+        self.entries[1].delete()
+        self.assertEqual(
+            list(DirectorySnapshot.objects.values_list("name", flat=True)),
+            ["P2 Staff"],
+        )
+        self.assertEqual(snapshot.refresh_snapshot(), (0, 0, 0))
+
+    def test_rebuild(self):
+        DirectorySnapshot.objects.all().delete()
+        self.assertEqual(snapshot.refresh_snapshot(), (3, 0, 0))
+        DirectorySnapshot.objects.filter(entry=self.entries[0]).update(name="stale")
+        DirectoryEntry.objects.filter(pk=self.entries[1].pk).update(active=False)
+        self.assertEqual(snapshot.refresh_snapshot(), (0, 0, 1))
+        DirectorySnapshot.objects.filter(entry=self.entries[0]).update(
+            name="stale", content_hash=""
+        )
+        self.assertEqual(snapshot.refresh_snapshot(), (0, 1, 0))
+        self.assertEqual(
+            DirectorySnapshot.objects.get(entry=self.entries[0]).name, "P0 Staff"
+        )
+
+    def test_flag_sync(self):
+        """
+        Entries which flags create or (de)activate get snapshot rows.
+        """
+        from .utils.sync import sync_entries_from_flags
+
+        person = Person.objects.create(cn="Flagged", given_name="F", sn="Flagged")
+        config = {
+            "snapshot:enabled": True,
+            "cache:enabled": False,
+            "signals:entrytypes-personflags": ["__all__"],
+        }
+        with self.settings(DIRECTORY_CONFIG=config):
+            person.add_flag_by_name("staff")
+            self.assertEqual(sync_entries_from_flags([person.pk]), (1, 0))
+            entry = person.directoryentry_set.get()
+            self.assertTrue(DirectorySnapshot.objects.filter(entry=entry).exists())
+            person.flags.clear()
+            self.assertEqual(sync_entries_from_flags([person.pk]), (0, 1))
+            self.assertFalse(DirectorySnapshot.objects.filter(entry=entry).exists())
+
+    def test_templates(self):
+        from django.template.loader import render_to_string
+
+        type_list = snapshot.attach_rows(EntryType.objects.all())
+        self.assertEqual(len(type_list[0].snapshot_list), 3)
+        self.assertEqual(snapshot.attach_rows(type_list, True)[0].snapshot_list, [])
+
+        with self.assertNumQueries(1):
+            entry_list = list(snapshot.get_rows([self.staff.pk]))
+        entry_list[1].email = ""  # (email links are obfuscated)
+        for template_name in [
+            "directory/table/includes/snapshot_entry.html",
+            "directory/visual_1col/includes/snapshot_entry.html",
+            "directory/visual_4col/includes/snapshot_entry.html",
+            "directory/print/includes/snapshot_direntry.tex",
+        ]:
+            with self.assertNumQueries(0):
+                text = render_to_string(template_name, {"entry": entry_list[1]})
+            self.assertIn("P1 Staff", text)
+
+
+class JsonAPI(TestCase):
+    """
+    Test the JSON API.
+    """
+
+    def setUp(self):
+        self.staff = EntryType.objects.create(
+            slug="staff", verbose_name="Staff", verbose_name_plural="Staff"
+        )
+        self.entries = []
+        for n in range(5):
+            person = Person.objects.create(
+                given_name="P{}".format(n), sn="Staff", cn="P{} Staff".format(n)
+            )
+            person.add_email("p{}@example.com".format(n), "work", public=True)
+            self.entries.append(
+                DirectoryEntry.objects.create(person=person, type=self.staff)
+            )
+
+    def get(self, view, path="/", **headers):
+        return view(RequestFactory().get(path, **headers))
+
+    def test_pagination(self):
+        from .api import directoryentry_list
+
+        response = self.get(directoryentry_list, "/?limit=2&fields=id,name,email")
+        data = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(data["count"], 5)
+        self.assertEqual(
+            data["results"],
+            [
+                {"id": e.pk, "name": e.person.cn, "email": e.person.email.address}
+                for e in self.entries[:2]
+            ],
+        )
+        seen = [row["id"] for row in data["results"]]
+        while data["next"]:
+            # aggregates (entries, phones, emails); entries, phones, emails.
+            with self.assertNumQueries(6):
+                response = self.get(directoryentry_list, data["next"])
+            data = json.loads(response.content.decode("utf-8"))
+            seen += [row["id"] for row in data["results"]]
+        self.assertEqual(seen, [e.pk for e in self.entries])
+
+        response = self.get(directoryentry_list, "/?fields=nope")
+        self.assertEqual(response.status_code, 400)
+        response = self.get(directoryentry_list, "/?type=other")
+        data = json.loads(response.content.decode("utf-8"))
+        self.assertEqual((data["count"], data["results"]), (0, []))
+
+    def test_conditional(self):
+        from .api import entrytype_list, person_list
+
+        response = self.get(person_list)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        with self.assertNumQueries(3):  # people, phones, emails.
+            response = self.get(person_list, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.get(
+            person_list, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+        # an edit changes the validators.
+        email = self.entries[0].person.emailaddress_set.get()
+        email.modified = email.modified + datetime.timedelta(seconds=5)
+        EmailAddress.objects.filter(pk=email.pk).update(modified=email.modified)
+        response = self.get(person_list, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+        response = self.get(entrytype_list)
+        data = json.loads(response.content.decode("utf-8"))
+        self.assertEqual([row["slug"] for row in data["results"]], ["staff"])
+
+    def test_deletion_changes_etag(self):
+        from .api import directoryentry_list
+
+        etag = self.get(directoryentry_list)["ETag"]
+        self.entries[-1].person.emailaddress_set.get().delete()
+        response = self.get(directoryentry_list, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+def _image_file(name, size, color):
+    from io import BytesIO
+
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from PIL import Image
+
+    output = BytesIO()
+    Image.new("RGB", size, color).save(output, "JPEG")
+    return SimpleUploadedFile(name, output.getvalue(), content_type="image/jpeg")
+
+
+class MugshotThumbnails(TransactionTestCase):
+    """
+    Test the mugshot thumbnails.
+    (TransactionTestCase, since thumbnails are generated on commit.)
+    """
+
+    def setUp(self):
+        import tempfile
+
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, MEDIA_URL="/media/"
+        )
+        self.settings_override.enable()
+        person = Person.objects.create(given_name="Pat", sn="Face", cn="Pat Face")
+        staff = EntryType.objects.create(
+            slug="staff", verbose_name="Staff", verbose_name_plural="Staff"
+        )
+        self.entry = DirectoryEntry.objects.create(person=person, type=staff)
+
+    def tearDown(self):
+        import shutil
+
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_upload(self):
+        from django.core.files.storage import default_storage
+        from PIL import Image
+
+        from .utils import mugshots
+
+        self.assertEqual(self.entry.mugshot_thumbnail_url, "")
+        self.assertEqual(self.entry.mugshot_srcset, "")
+
+        self.entry.mugshot = _image_file("face.jpg", (1200, 1600), "red")
+        self.entry.save()
+        entry = DirectoryEntry.objects.get(pk=self.entry.pk)
+        digest = entry.mugshot_hash
+        self.assertEqual(len(digest), 40)
+        name = mugshots.thumbnail_name(digest, 90, "jpeg")
+        self.assertTrue(name.startswith("directory/faces/thumbs/"))
+        with default_storage.open(name) as f:
+            self.assertEqual(Image.open(f).size, (90, 120))
+        self.assertEqual(entry.mugshot_thumbnail_url, "/media/" + name)
+        self.assertEqual(entry.mugshot_srcset.count("w, "), 2)
+        self.assertIn(
+            "/media/{} 270w".format(mugshots.thumbnail_name(digest, 270, "webp")),
+            entry.mugshot_webp_srcset,
+        )
+
+        # unchanged photo: nothing is regenerated.
+        entry.note = "On leave"
+        entry.save()
+        self.assertEqual(mugshots.update_thumbnails(), (0, 0))
+
+        # a new photo: new thumbnails.
+        entry.mugshot = _image_file("face.jpg", (300, 300), "blue")
+        entry.save()
+        entry = DirectoryEntry.objects.get(pk=self.entry.pk)
+        self.assertNotIn(entry.mugshot_hash, ["", digest])
+
+        # no photo: no thumbnails.
+        entry.mugshot = None
+        entry.save()
+        entry = DirectoryEntry.objects.get(pk=self.entry.pk)
+        self.assertEqual(entry.mugshot_hash, "")
+        self.assertEqual(entry.mugshot_srcset, "")
+
+    def test_backfill(self):
+        from django.core.files.storage import default_storage
+        from django.template.loader import render_to_string
+
+        from .api import directoryentry_list
+        from .utils import mugshots
+
+        with self.settings(DIRECTORY_CONFIG={"mugshot:thumbnails": False}):
+            self.entry.mugshot = _image_file("face.jpg", (400, 500), "green")
+            self.entry.save()
+        entry = DirectoryEntry.objects.get(pk=self.entry.pk)
+        self.assertEqual(entry.mugshot_hash, "")
+        self.assertEqual(entry.mugshot_thumbnail_url, entry.mugshot.url)
+        text = render_to_string(
+            "directory/visual_1col/includes/entry.html", {"entry": entry}
+        )
+        self.assertNotIn("srcset", text)
+        etag = directoryentry_list(RequestFactory().get("/"))["ETag"]
+
+        self.assertEqual(mugshots.update_thumbnails(), (1, 6))
+        # the API validators see the new mugshot urls.
+        response = directoryentry_list(
+            RequestFactory().get("/", HTTP_IF_NONE_MATCH=etag)
+        )
+        self.assertEqual(response.status_code, 200)
+        entry = DirectoryEntry.objects.get(pk=self.entry.pk)
+        self.assertTrue(
+            default_storage.exists(
+                mugshots.thumbnail_name(entry.mugshot_hash, 180, "jpeg")
+            )
+        )
+        text = render_to_string(
+            "directory/visual_1col/includes/entry.html", {"entry": entry}
+        )
+        self.assertIn('srcset="{}"'.format(entry.mugshot_srcset), text)
+        self.assertIn('<source type="image/webp"', text)
+
+        # regenerated in place: the hash, and so the urls, do not change.
+        self.assertEqual(mugshots.update_thumbnails(force=True), (0, 6))
+        self.assertEqual(mugshots.update_thumbnails(), (0, 0))
+
+
+class PrintCache(TestCase):
+    """
+    Test the printed directory build cache.
+    (LaTeX is not run: ``build_pdf`` is replaced.)
+    """
+
+    def setUp(self):
+        from places.models import Office
+
+        from .utils import printing
+
+        self.printing = printing
+        self.build_pdf = printing.build_pdf
+        self.builds = []
+
+        def build_pdf(src):
+            self.builds.append(src)
+            time.sleep(self.delay)
+            return "%PDF {}".format(len(self.builds))
+
+        self.delay = 0
+        printing.build_pdf = build_pdf
+        caches["default"].clear()
+
+        staff = EntryType.objects.create(
+            slug="staff", verbose_name="Staff", verbose_name_plural="Staff"
+        )
+        person = Person.objects.create(given_name="Pat", sn="Print", cn="Pat Print")
+        office = Office.objects.create(slug="mh-101", number="101", building="MH")
+        self.entry = DirectoryEntry.objects.create(
+            person=person, type=staff, office=office
+        )
+
+    def tearDown(self):
+        self.printing.build_pdf = self.build_pdf
+        caches["default"].clear()
+
+    def test_cache(self):
+        src = self.printing.render_source()
+        self.assertIn("Pat Print", src)
+        self.assertEqual(self.printing.get_pdf(src), "%PDF 1")
+        self.assertEqual(self.printing.get_pdf(src), "%PDF 1")
+        self.assertEqual(self.printing.get_pdf(src, ["1"]), "%PDF 2")
+        self.assertEqual(len(self.builds), 2)
+
+        # an edit changes the source, and so the key.
+        self.entry.title = "Printer"
+        self.entry.save()
+        new_src = self.printing.render_source()
+        self.assertNotEqual(new_src, src)
+        self.assertEqual(self.printing.get_pdf(new_src), "%PDF 3")
+
+        self.printing.prebuild()
+        self.assertEqual(len(self.builds), 3)
+
+        with self.settings(DIRECTORY_CONFIG={"print:cache": False}):
+            self.assertEqual(self.printing.get_pdf(src), "%PDF 4")
+
+    def test_coalesce(self):
+        import threading
+
+        self.delay = 0.2
+        results = []
+
+        def request():
+            results.append(self.printing.get_pdf("source"))
+
+        threads = [threading.Thread(target=request) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["%PDF 1"] * 4)
+        self.assertEqual(len(self.builds), 1)
+
+    def test_other_process(self):
+        import threading
+
+        cache = caches["default"]
+        key = self.printing.pdf_key("source")
+        # another process holds the lock, and stores the PDF.
+        cache.add(key + ":lock", 1)
+        timer = threading.Timer(0.3, cache.set, [key, "%PDF elsewhere"])
+        timer.start()
+        self.assertEqual(self.printing.get_pdf("source"), "%PDF elsewhere")
+        timer.join()
+        self.assertEqual(self.builds, [])
+
+
+def _person_url(person):
+    return "/people/{}/".format(person.slug)
+
+
+class DirectorySitemap(TestCase):
+    """
+    Test the paginated directory sitemap.
+    """
+
+    def setUp(self):
+        staff = EntryType.objects.create(
+            slug="staff", verbose_name="Staff", verbose_name_plural="Staff"
+        )
+        for n in range(3):
+            person = Person.objects.create(
+                cn="Site {}".format(n), given_name="Site", sn="{}".format(n)
+            )
+            DirectoryEntry.objects.create(person=person, type=staff)
+        Person.objects.create(cn="Not Listed", given_name="Not", sn="Listed")
+        self.site = RequestSite(RequestFactory().get("/"))
+
+    @override_settings(
+        PEOPLE_CONFIG={"permalink": "directory.tests._person_url"},
+        DIRECTORY_CONFIG={"sitemap:limit": 2},
+    )
+    def test_sitemap(self):
+        from .sitemap import DirectorySitemap
+
+        sitemap = DirectorySitemap()
+        with self.assertNumQueries(2):  # the count, and the page.
+            urls = sitemap.get_urls(page=1, site=self.site)
+        self.assertEqual(
+            [url["location"] for url in urls],
+            ["http://testserver/people/site-0/", "http://testserver/people/site-1/"],
+        )
+        self.assertIsNotNone(urls[0]["lastmod"])
+        urls = sitemap.get_urls(page=2, site=self.site)
+        self.assertEqual(
+            [url["location"] for url in urls], ["http://testserver/people/site-2/"]
+        )
+
+    def test_no_pages(self):
+        from .sitemap import DirectorySitemap
+
+        self.assertEqual(DirectorySitemap().get_urls(site=self.site), [])
@@ -1,6 +1,7 @@
 from django.conf.urls import include, url
 from django.views.generic import TemplateView
 
+from .. import sitemap
 from ..views import by_person_detail, by_person_list
 
 urlpatterns = [
@@ -9,6 +10,7 @@ urlpatterns = [
         TemplateView.as_view(template_name="directory/index.html"),
         name="directory-index",
     ),
+    url(r"^api/", include("directory.urls.api")),
     url(r"^table/", include("directory.urls.table")),
     url(r"^visual-1col/", include("directory.urls.visual_1col")),
     url(r"^visual-4col/", include("directory.urls.visual_4col")),
@@ -18,4 +20,16 @@ urlpatterns = [
         by_person_detail,
         name="directory-by-person-detail",
     ),
+    url(
+        r"^sitemap\.xml$",
+        sitemap.index,
+        {"sitemaps": sitemap.sitemaps, "sitemap_url_name": "directory-sitemap"},
+        name="directory-sitemap-index",
+    ),
+    url(
+        r"^sitemap-(?P<section>[\w-]+)\.xml$",
+        sitemap.sitemap,
+        {"sitemaps": sitemap.sitemaps},
+        name="directory-sitemap",
+    ),
 ]
@@ -0,0 +1,12 @@
+"""
+Directory JSON API urls.
+"""
+from django.conf.urls import url
+
+from ..api import directoryentry_list, entrytype_list, person_list
+
+urlpatterns = [
+    url(r"^types/$", entrytype_list, name="directory-api-type-list"),
+    url(r"^entries/$", directoryentry_list, name="directory-api-entry-list"),
+    url(r"^people/$", person_list, name="directory-api-person-list"),
+]
@@ -1,15 +1,48 @@
 """
 Email synchronizer for the directory app.
+
+The mailing list for each entry type (the public email addresses of
+its active entries) is materialized in the ``MailingList`` table, with
+a content hash; see ``refresh_lists()``.  Signal handlers refresh the
+lists affected by an edit, once the transaction commits, so reading
+every list is a single query.
+
+Aggregate lists (``all-directory``, ``staff``, ``grad-students``) are
+derived when the lists are read, when ``mailing-lists:domain`` is set.
 """
+from __future__ import print_function, unicode_literals
+
+import hashlib
+
+from django.db import transaction
+from django.utils import timezone
 
 from .. import conf
-from ..models import DirectoryEntry
+from ..models import DirectoryEntry, EntryType, MailingList
 
+#######################################################################
 
-def main():
-    entries = DirectoryEntry.objects.active()
 
-    mail_domain = conf.get("mailing-lists:domain")
+def content_hash(addresses):
+    return hashlib.sha1(addresses.encode("utf-8")).hexdigest()
+
+
+def compute_lists(type_slugs=None):
+    """
+    Compute the mailing lists for the given entry type slugs
+    (default: all types), from the directory: {slug: [address, ...]}
+    Only lists with addresses are included.
+    Two queries: the entries with their people, and their email addresses.
+    """
+    from people.models import EmailAddress
+    from people.querysets import contact_info_prefetches
+
+    entries = DirectoryEntry.objects.active()
+    if type_slugs is not None:
+        entries = entries.filter(type__slug__in=list(type_slugs))
+    entries = entries.prefetch_related(None).prefetch_related(
+        *contact_info_prefetches("person__", types=[EmailAddress])
+    )
 
     results = {}
     for e in entries:
@@ -18,20 +51,135 @@ def main():
         if e.type.slug not in results:
             results[e.type.slug] = []
         results[e.type.slug].append(e.person.email.address)
+    return results
+
 
-    if mail_domain is not None:
-        if not mail_domain.startswith("@"):
-            mail_domain = "@" + mail_domain
-        results["all-directory"] = [e + mail_domain for e in results.keys()]
-        results["staff"] = [
+def aggregate_lists(slug_list):
+    """
+    The aggregate lists for the given (non-empty) list slugs,
+    or an empty dictionary when no mail domain is configured.
+    """
+    mail_domain = conf.get("mailing-lists:domain")
+    if mail_domain is None:
+        return {}
+    if not mail_domain.startswith("@"):
+        mail_domain = "@" + mail_domain
+    return {
+        "all-directory": [e + mail_domain for e in slug_list],
+        "staff": [
             e + mail_domain
             for e in ["academic-staff", "sessional-instructors", "support-staff"]
-        ]
-        results["grad-students"] = [
-            e + mail_domain for e in ["phd-students", "msc-students"]
-        ]
+        ],
+        "grad-students": [e + mail_domain for e in ["phd-students", "msc-students"]],
+    }
+
+
+#######################################################################
+
 
+def refresh_lists(type_slugs=None):
+    """
+    Bring the materialized lists for the given entry type slugs
+    (default: all types) up to date.  Only lists whose content changed
+    are written (and get a new ``modified`` time).
+    Returns the list of changed slugs.
+    """
+    full = type_slugs is None
+    if full:
+        type_slugs = set(EntryType.objects.values_list("slug", flat=True))
+        type_slugs |= set(MailingList.objects.values_list("slug", flat=True))
+    type_slugs = set(type_slugs)
+    computed = compute_lists(type_slugs)
+    now = timezone.now()
+
+    with transaction.atomic():
+        stored = {
+            ml.slug: ml
+            for ml in MailingList.objects.select_for_update().filter(
+                slug__in=type_slugs
+            )
+        }
+        create, update = [], []
+        for slug in type_slugs:
+            addresses = ",".join(computed.get(slug, []))
+            digest = content_hash(addresses)
+            ml = stored.get(slug)
+            if ml is None:
+                if addresses:
+                    create.append(
+                        MailingList(
+                            slug=slug,
+                            addresses=addresses,
+                            content_hash=digest,
+                            modified=now,
+                        )
+                    )
+            elif ml.content_hash != digest:
+                # emptied lists are kept, so the change shows in a delta.
+                ml.addresses, ml.content_hash, ml.modified = addresses, digest, now
+                update.append(ml)
+        MailingList.objects.bulk_create(create)
+        MailingList.objects.bulk_update(
+            update, ["addresses", "content_hash", "modified"]
+        )
+    return sorted([ml.slug for ml in create + update])
+
+
+def schedule_refresh(type_slugs):
+    """
+    Refresh the lists for the entry type slugs when the current
+    transaction commits (coalesced with any other refreshes scheduled
+    in the transaction).  Does nothing unless lists are materialized.
+    """
+    from people.utils.deferred import defer
+
+    type_slugs = [slug for slug in type_slugs if slug]
+    if type_slugs and conf.get("mailing-lists:materialized"):
+        defer("directory.utils.EMAIL.refresh_lists", type_slugs)
+
+
+def get_lists(since=None):
+    """
+    Return the materialized lists as {slug: "address,address,..."},
+    in one query.  With ``since`` (a datetime), only the lists changed
+    since then are included: emptied lists have the value "",
+    and the aggregate lists are included if any list changed.
+    """
+    rows = MailingList.objects.all()
+    if since is not None:
+        rows = rows.filter(modified__gt=since)
+    results = dict(rows.values_list("slug", "addresses"))
+    if since is not None and not results:
+        return results
+    if since is None:
+        results = {k: v for k, v in results.items() if v}
+        slug_list = list(results)
+    else:
+        slug_list = MailingList.objects.exclude(addresses="")
+        slug_list = list(slug_list.values_list("slug", flat=True))
+    for key, values in aggregate_lists(slug_list).items():
+        results[key] = ",".join(values)
+    return results
+
+
+#######################################################################
+
+
+def main():
+    """
+    Return all of the mailing lists: {slug: "address,address,..."}
+    """
+    if conf.get("mailing-lists:materialized"):
+        if not MailingList.objects.exists():
+            refresh_lists()
+        return get_lists()
+
+    results = compute_lists()
+    results.update(aggregate_lists(list(results)))
     for key in results:
         values = results[key]
         results[key] = ",".join(values)
     return results
+
+
+#######################################################################
@@ -0,0 +1,261 @@
+"""
+Mugshot thumbnails: fixed width JPEG (and WebP) derivatives of each
+``DirectoryEntry.mugshot``, for the visual directory pages.
+
+Derivatives are named by the content hash of the original upload, in a
+``thumbs`` folder under the ``mugshot_path`` setting, e.g.,
+``directory/faces/thumbs/3f/3f2a...-180.webp``; so an unchanged photo is
+never processed twice, and a replaced photo gets new urls.  The hash is
+stored on the entry (``mugshot_hash``); urls and ``srcset`` values are
+computed from it without touching the storage.
+
+Saving an entry with a new mugshot generates its derivatives when the
+transaction commits (or in a celery task; see ``people.utils.deferred``);
+the ``mugshots`` CLI command backfills existing photos.
+"""
+from __future__ import print_function, unicode_literals
+
+import hashlib
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.utils.timezone import now
+
+from .. import conf
+
+#######################################################################
+
+# file extension for each format.
+EXTENSIONS = {"jpeg": "jpg", "webp": "webp"}
+
+#######################################################################
+
+
+def content_hash(fieldfile):
+    """
+    The sha1 hex digest of the contents of an image field file.
+    """
+    digest = hashlib.sha1()
+    fieldfile.open("rb")
+    try:
+        for chunk in fieldfile.chunks():
+            digest.update(chunk)
+    finally:
+        fieldfile.close()
+    return digest.hexdigest()
+
+
+def thumbnail_root():
+    """
+    The folder for derivatives: the fixed part of ``mugshot_path``
+    (before any date formatting), plus ``thumbs``.
+    """
+    path = conf.get("mugshot_path")
+    if callable(path):
+        path = ""
+    path = path.split("%", 1)[0].rstrip("/")
+    return os.path.join(path, "thumbs") if path else "thumbs"
+
+
+def thumbnail_name(digest, width, format):
+    """
+    The storage name of a derivative.
+    """
+    return os.path.join(
+        thumbnail_root(),
+        digest[:2],
+        "{}-{}.{}".format(digest, width, EXTENSIONS[format]),
+    )
+
+
+def _formats():
+    from PIL import features
+
+    formats = []
+    for format in conf.get("mugshot:formats"):
+        if format == "webp" and not features.check("webp"):
+            continue
+        formats.append(format)
+    return formats
+
+
+def get_formats():
+    """
+    The configured formats which this Pillow can write, most preferred first.
+    """
+    return conf.derived("mugshot-formats", _formats)
+
+
+#######################################################################
+
+
+def render_thumbnails(image, widths, formats, quality):
+    """
+    Yield (width, format, bytes) for each derivative of a Pillow image.
+    The aspect ratio is kept; metadata is dropped.
+    """
+    from PIL import Image, ImageOps
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    for width in widths:
+        height = max(1, int(round(image.height * width / float(image.width))))
+        thumb = image.resize((width, height), Image.LANCZOS)
+        for format in formats:
+            output = BytesIO()
+            if format == "jpeg":
+                thumb.save(
+                    output, "JPEG", quality=quality, optimize=True, progressive=True
+                )
+            else:
+                thumb.save(output, format.upper(), quality=quality)
+            yield width, format, output.getvalue()
+
+
+def generate_thumbnails(fieldfile, digest=None, force=False):
+    """
+    Write the missing derivatives of an image field file.
+    Returns the pair (content hash, number of files written).
+    """
+    from PIL import Image
+
+    if digest is None:
+        digest = content_hash(fieldfile)
+    storage = fieldfile.storage
+    widths = sorted(conf.get("mugshot:widths"))
+    formats = get_formats()
+    wanted = [(w, f) for w in widths for f in formats]
+    if not force:
+        wanted = [
+            (w, f)
+            for w, f in wanted
+            if not storage.exists(thumbnail_name(digest, w, f))
+        ]
+    if not wanted:
+        return digest, 0
+
+    fieldfile.open("rb")
+    try:
+        image = Image.open(BytesIO(fieldfile.read()))
+        image.load()
+    finally:
+        fieldfile.close()
+    written = 0
+    for width, format, data in render_thumbnails(
+        image,
+        sorted(set(w for w, f in wanted)),
+        [f for f in formats if f in set(f for w, f in wanted)],
+        conf.get("mugshot:quality"),
+    ):
+        if (width, format) not in wanted:
+            continue
+        name = thumbnail_name(digest, width, format)
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(data))
+        written += 1
+    return digest, written
+
+
+def update_thumbnails(entry_pks=None, force=False):
+    """
+    Generate the derivatives for the mugshots of the given directory
+    entry pks (default: every entry with a mugshot), and store their
+    content hashes.  Entries whose hash changed have their cached pages
+    and snapshot rows refreshed.
+    Returns the pair (n_entries_updated, n_files_written).
+    """
+    from .. import cache
+    from ..models import DirectoryEntry
+    from . import snapshot
+
+    entries = DirectoryEntry.objects.exclude(mugshot="").exclude(mugshot=None)
+    if entry_pks is not None:
+        entries = entries.filter(pk__in=list(entry_pks))
+    entries = (
+        entries.select_related(None)
+        .select_related("type", "person")
+        .only("pk", "mugshot", "mugshot_hash", "type__slug", "person__slug")
+    )
+    changed, written = [], 0
+    for entry in entries:
+        try:
+            digest, n = generate_thumbnails(entry.mugshot, force=force)
+        except (IOError, OSError, ValueError):
+            # missing or unreadable image: fall back to the original.
+            digest, n = "", 0
+        written += n
+        if digest != entry.mugshot_hash:
+            DirectoryEntry.objects.filter(pk=entry.pk).update(
+                mugshot_hash=digest, modified=now()
+            )
+            changed.append(entry)
+    if changed:
+        cache.invalidate(
+            [e.type.slug for e in changed], [e.person.slug for e in changed]
+        )
+        snapshot.schedule_refresh([e.pk for e in changed])
+    return len(changed), written
+
+
+def schedule_update(entry_pks):
+    """
+    Generate derivatives for the directory entry pks once the current
+    transaction commits.  Does nothing unless thumbnails are enabled.
+    """
+    from people.utils.deferred import defer
+
+    entry_pks = [pk for pk in entry_pks if pk is not None]
+    if entry_pks and conf.get("mugshot:thumbnails"):
+        defer("directory.utils.mugshots.update_thumbnails", entry_pks)
+
+
+#######################################################################
+
+
+def thumbnail_urls(fieldfile, digest, format):
+    """
+    A list of (width, url) for the derivatives of a mugshot; empty when
+    there are none (yet).
+    """
+    if not digest or format not in get_formats():
+        return []
+    storage = fieldfile.storage
+    return [
+        (width, storage.url(thumbnail_name(digest, width, format)))
+        for width in sorted(conf.get("mugshot:widths"))
+    ]
+
+
+def srcset(fieldfile, digest, format="jpeg"):
+    """
+    The ``srcset`` attribute value for a mugshot's derivatives,
+    or "" when there are none.
+    """
+    if not fieldfile:
+        return ""
+    return ", ".join(
+        "{} {}w".format(url, width)
+        for width, url in thumbnail_urls(fieldfile, digest, format)
+    )
+
+
+def thumbnail_url(fieldfile, digest):
+    """
+    The url of the smallest JPEG derivative, or of the original when
+    there are no derivatives; "" when there is no mugshot.
+    """
+    if not fieldfile:
+        return ""
+    urls = thumbnail_urls(fieldfile, digest, "jpeg")
+    if urls:
+        return urls[0][1]
+    try:
+        return fieldfile.url
+    except ValueError:
+        return ""
+
+
+#######################################################################
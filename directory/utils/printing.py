@@ -0,0 +1,159 @@
+"""
+The printed (PDF) directory, with a build cache.
+
+Compiling the LaTeX source takes seconds, so built PDFs are cached
+(in the directory's cache, see the ``cache:alias`` setting) under a hash
+of the rendered source and the selected entry types: any edit which
+changes the printed directory changes the source, and so the key.
+
+Concurrent requests for the same PDF are coalesced: one builds it,
+holding a lock in the cache, while the others wait for the result.
+
+With ``print:prebuild`` (and celery), edits of directory data rebuild
+the PDF of the whole directory in the background, once the transaction
+commits, so it is usually ready before anyone asks for it.
+"""
+from __future__ import print_function, unicode_literals
+
+import hashlib
+import threading
+import time
+
+from django.template.loader import render_to_string
+
+from .. import conf
+from ..cache import get_cache
+
+#######################################################################
+
+TEMPLATE = "directory/print/directory.tex"
+PDF_KEY_PREFIX = "directory:print:pdf:"
+LOCK_POLL = 0.25  # seconds between checks for a build by another process.
+
+# builds in this process are serialized; requests waiting for the lock
+# find the PDF in the cache once it is released.
+_build_lock = threading.Lock()
+
+#######################################################################
+
+
+def get_context(directory_list):
+    """
+    The template context for the printed directory of the entry types.
+    """
+    from .snapshot import attach_rows
+
+    context = dict(conf.get("print_context"))
+    context["directory_list"] = directory_list
+    if conf.get("snapshot:enabled"):
+        # render from the snapshot: one query for every type.
+        context["directory_list"] = attach_rows(directory_list, offices_only=True)
+        context["use_snapshot"] = True
+    return context
+
+
+def render_source(type_pks=None):
+    """
+    The LaTeX source of the printed directory, for the given entry type
+    pks (default: every active type).
+    """
+    from ..models import EntryType
+
+    type_list = EntryType.objects.active()
+    if type_pks is not None:
+        type_list = type_list.filter(pk__in=list(type_pks))
+    return render_to_string(TEMPLATE, get_context(type_list))
+
+
+def build_pdf(src):
+    """
+    Compile the LaTeX source: the PDF data.
+    """
+    from latex import LaTeX_Document
+
+    document = LaTeX_Document()
+    document.set_full_src(src)
+    return document.pdf_data()
+
+
+def pdf_key(src, type_pks=None):
+    """
+    The cache key for the PDF of the source and the selected entry types.
+    """
+    selected = "" if type_pks is None else ",".join(sorted(set(map(str, type_pks))))
+    digest = hashlib.sha256(src.encode("utf-8"))
+    digest.update(b"\0" + selected.encode("utf-8"))
+    return PDF_KEY_PREFIX + digest.hexdigest()
+
+
+#######################################################################
+
+
+def get_pdf(src, type_pks=None):
+    """
+    The PDF data for the LaTeX source: from the cache, or built (once,
+    however many requests ask for it at the same time).
+    """
+    if not conf.get("print:cache"):
+        return build_pdf(src)
+    cache = get_cache()
+    key = pdf_key(src, type_pks)
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    with _build_lock:
+        data = cache.get(key)
+        if data is not None:
+            return data
+        lock_key = key + ":lock"
+        lock_timeout = conf.get("print:lock-timeout")
+        deadline = time.time() + lock_timeout
+        while not cache.add(lock_key, 1, lock_timeout):
+            # another process is building it.
+            time.sleep(LOCK_POLL)
+            data = cache.get(key)
+            if data is not None:
+                return data
+            if time.time() > deadline:
+                break  # the other build failed, or is stuck.
+        try:
+            data = build_pdf(src)
+            cache.set(key, data, conf.get("print:timeout"))
+        finally:
+            cache.delete(lock_key)
+    return data
+
+
+def prebuild(keys=None):
+    """
+    Build (if it is not already cached) the PDF of the whole directory.
+    ``keys`` are ignored; this is a deferred applier.
+    """
+    src = render_source()
+    if get_cache().get(pdf_key(src)) is None:
+        get_pdf(src)
+
+
+def start_prebuild(keys=None):
+    """
+    Hand the prebuild to celery.  ``keys`` are ignored.
+    """
+    from ..tasks import PrebuildPrintDirectory
+
+    PrebuildPrintDirectory.delay()
+
+
+def schedule_prebuild():
+    """
+    Rebuild the PDF of the whole directory in the background, once the
+    current transaction commits (once per transaction).
+    Does nothing unless ``print:prebuild`` is set.
+    """
+    from people.utils.deferred import defer
+
+    if conf.get("print:prebuild") and conf.get("print:cache"):
+        defer("directory.utils.printing.start_prebuild", ["all"])
+
+
+#######################################################################
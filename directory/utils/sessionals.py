@@ -0,0 +1,281 @@
+"""
+Set-based update of the sessional instructor directory entries.
+
+The instructors of the current sections are compared with the active
+academic and sessional entries, using a handful of aggregate queries;
+the resulting changes are applied with bulk updates.
+
+The changes are returned as a list of rows (a "diff"), which can be
+reported as tab separated values or JSON, e.g., for the
+``UpdateSessionals`` periodic task to email.
+"""
+###############
+from __future__ import print_function, unicode_literals
+
+import json
+
+from django.utils.timezone import now
+
+from people.models import Person, PersonFlag
+
+from .. import cache, conf
+from ..models import DirectoryEntry
+from ..signals import entries_changed
+from . import EMAIL, snapshot
+
+#######################################################################
+
+# diff actions
+DEACTIVATE = "deactivate"
+REACTIVATE = "reactivate"
+REACTIVATE_PERSON = "reactivate-person"
+NEED_ENTRY = "need-entry"
+
+DIFF_FIELDS = ["action", "entry", "type", "person", "cn"]
+
+#######################################################################
+
+
+def get_section_list(config=None):
+    """
+    The current sections with instructors, excluding the configured
+    section types.
+    """
+    from classes.models import Section
+
+    if config is None:
+        config = conf.get("update_sessionals")
+    section_list = Section.objects.get_current().filter(instructor__isnull=False)
+    section_type_exclude = config.get("section:type:exclude")
+    if section_type_exclude:
+        section_list = section_list.exclude(section_type__in=section_type_exclude)
+    return section_list
+
+
+def get_section_instructor_keys(section_list):
+    """
+    The person pks of every instructor, or additional instructor,
+    of the sections.
+    """
+    instructor_pks = set(section_list.values_list("instructor", flat=True))
+    addl = set(section_list.values_list("additional_instructors__id", flat=True))
+    addl.discard(None)
+    return instructor_pks.union(addl)
+
+
+def get_role_instructor_keys(section_list):
+    """
+    The person pks of everyone with a current instructor role
+    in the gradebook for the sections.
+    """
+    from gradebook import conf as gradebook_conf
+    from gradebook.models import Role, Ledger, LedgerViewport
+
+    # convert section_list to viewport_list...
+    viewport_from_section = gradebook_conf.get("viewport_from_section")
+    viewport_list = [
+        viewport_from_section(Ledger, LedgerViewport, section)
+        for section in section_list
+    ]
+    return set(
+        Role.objects.filter(
+            viewport__in=viewport_list,
+            role__in=["in", "co"],
+            dtstart__lte=now(),
+            dtend__gte=now(),
+        ).values_list("person", flat=True)
+    )
+
+
+#######################################################################
+
+
+def _diff_row(action, person_pk, person_cn, entry_pk=None, type_slug=None):
+    return {
+        "action": action,
+        "entry": entry_pk,
+        "type": type_slug,
+        "person": person_pk,
+        "cn": person_cn,
+    }
+
+
+def compute_changes(instructor_pks, section_instructor_pks, config=None):
+    """
+    Compute the changes to the sessional entries, without applying them.
+
+    ``instructor_pks`` are the people currently teaching;
+    ``section_instructor_pks`` are the people who are listed as
+    instructors of the sections: inactive sessional entries are only
+    reactivated for them.
+
+    Returns a list of diff rows (dictionaries, see ``DIFF_FIELDS``),
+    ordered by action and person.
+    """
+    if config is None:
+        config = conf.get("update_sessionals")
+    academic_slug_list = config.get("academic:type:slug_list", [])
+    sessional_slug_list = config.get("sessional:type:slug_list", [])
+    cn_blacklist = config.get("cn:blacklist", [])
+
+    entry_rows = (
+        DirectoryEntry.objects.filter(
+            type__slug__in=academic_slug_list + sessional_slug_list
+        )
+        .order_by()
+        .values_list("pk", "person_id", "type__slug", "active", "person__active")
+    )
+    # as DirectoryEntry.objects.active(): only active entries of active
+    # people count as academic or sessional.
+    academic_pks = set()
+    sessional_pks = set()
+    sessional_entries = {}  # {person_pk: [(entry_pk, type_slug, active), ...]}
+    for pk, person_pk, type_slug, active, person_active in entry_rows:
+        if type_slug in academic_slug_list:
+            if active and person_active:
+                academic_pks.add(person_pk)
+        else:
+            sessional_entries.setdefault(person_pk, []).append((pk, type_slug, active))
+            if active and person_active:
+                sessional_pks.add(person_pk)
+
+    non_academic_pks = set(instructor_pks).difference(academic_pks)
+    remove_pks = sessional_pks.difference(non_academic_pks)
+    add_pks = non_academic_pks.difference(sessional_pks)
+    missing_pks = set([pk for pk in add_pks if pk not in sessional_entries])
+
+    people = {
+        pk: (cn, active)
+        for pk, cn, active in Person.objects.filter(
+            pk__in=remove_pks | add_pks
+        ).values_list("pk", "cn", "active")
+    }
+
+    diff = []
+    for person_pk in remove_pks:
+        for entry_pk, type_slug, active in sessional_entries[person_pk]:
+            if active:
+                diff.append(
+                    _diff_row(
+                        DEACTIVATE,
+                        person_pk,
+                        people[person_pk][0],
+                        entry_pk,
+                        type_slug,
+                    )
+                )
+    for person_pk in add_pks.difference(missing_pks):
+        # only reactivate for *current* sections!
+        if person_pk not in section_instructor_pks:
+            continue
+        for entry_pk, type_slug, active in sessional_entries[person_pk]:
+            diff.append(
+                _diff_row(
+                    REACTIVATE, person_pk, people[person_pk][0], entry_pk, type_slug
+                )
+            )
+    for person_pk in missing_pks:
+        if person_pk not in people:
+            continue
+        cn, active = people[person_pk]
+        if cn in cn_blacklist:
+            continue
+        if not active:
+            diff.append(_diff_row(REACTIVATE_PERSON, person_pk, cn))
+        diff.append(_diff_row(NEED_ENTRY, person_pk, cn))
+
+    order = [DEACTIVATE, REACTIVATE, REACTIVATE_PERSON, NEED_ENTRY]
+    diff.sort(key=lambda row: (order.index(row["action"]), row["cn"], row["person"]))
+    return diff
+
+
+def apply_changes(diff):
+    """
+    Apply a list of diff rows, with one bulk query per kind of change.
+    People needing an entry get the ``directory`` flag.
+    """
+    timestamp = now()
+    by_action = {}
+    for row in diff:
+        by_action.setdefault(row["action"], []).append(row)
+
+    deactivate_pks = [row["entry"] for row in by_action.get(DEACTIVATE, [])]
+    if deactivate_pks:
+        DirectoryEntry.objects.filter(pk__in=deactivate_pks).update(
+            active=False, modified=timestamp
+        )
+    reactivate_pks = [row["entry"] for row in by_action.get(REACTIVATE, [])]
+    if reactivate_pks:
+        DirectoryEntry.objects.filter(pk__in=reactivate_pks).update(
+            active=True, modified=timestamp
+        )
+    person_pks = [row["person"] for row in by_action.get(REACTIVATE_PERSON, [])]
+    if person_pks:
+        Person.objects.filter(pk__in=person_pks).update(active=True, modified=timestamp)
+    flag_pks = [row["person"] for row in by_action.get(NEED_ENTRY, [])]
+    if flag_pks:
+        flag, created = PersonFlag.objects.get_or_create(
+            slug="directory", defaults={"verbose_name": "directory"}
+        )
+        # a single query for the existing memberships, and a single insert.
+        flag.person_set.add(*flag_pks)
+
+    changed = [row for row in diff if row["entry"] is not None]
+    # bulk updates send no signals, so refresh mailing lists and
+    # snapshot rows, and invalidate cached pages here.
+    EMAIL.schedule_refresh(set([row["type"] for row in changed]))
+    snapshot.schedule_refresh([row["entry"] for row in changed])
+    changed_person_pks = set([row["person"] for row in changed] + person_pks)
+    if changed_person_pks:
+        entries_changed.send(
+            sender=DirectoryEntry, person_pks=sorted(changed_person_pks)
+        )
+    if changed and conf.get("cache:enabled"):
+        person_slugs = Person.objects.filter(
+            pk__in=[row["person"] for row in changed]
+        ).values_list("slug", flat=True)
+        cache.invalidate([row["type"] for row in changed], person_slugs)
+
+
+def update_sessionals(use_role=False, dry_run=False, config=None):
+    """
+    Compute, and unless ``dry_run``, apply the changes to the
+    sessional entries.  Returns the diff.
+    """
+    if config is None:
+        config = conf.get("update_sessionals")
+    section_list = get_section_list(config)
+    section_instructor_pks = get_section_instructor_keys(section_list)
+    if use_role:
+        instructor_pks = get_role_instructor_keys(section_list)
+    else:
+        instructor_pks = section_instructor_pks
+    diff = compute_changes(instructor_pks, section_instructor_pks, config)
+    if not dry_run:
+        apply_changes(diff)
+    return diff
+
+
+#######################################################################
+
+
+def format_diff(diff, format="tsv"):
+    """
+    Format a diff as ``tsv`` (with a header line) or ``json``.
+    An empty diff is always the empty string.
+    """
+    if not diff:
+        return ""
+    if format == "json":
+        return json.dumps(diff, indent=2)
+    lines = ["\t".join(DIFF_FIELDS)]
+    for row in diff:
+        lines.append(
+            "\t".join(
+                ["" if row[f] is None else "{}".format(row[f]) for f in DIFF_FIELDS]
+            )
+        )
+    return "\n".join(lines)
+
+
+#######################################################################
@@ -0,0 +1,191 @@
+"""
+The directory snapshot: a flattened, display ready row for each active
+directory entry (of an active person), in the ``DirectorySnapshot``
+table, with a content hash.
+
+Signal handlers refresh the rows affected by an edit, once the
+transaction commits (see ``schedule_refresh()``); ``refresh_snapshot()``
+with no arguments rebuilds everything.  Only rows whose content changed
+are written.  Reading the snapshot for a page is a single query.
+"""
+from __future__ import print_function, unicode_literals
+
+import hashlib
+import json
+
+from django.db import transaction
+from django.utils import timezone
+
+from .. import conf
+from ..models import DirectoryEntry, DirectorySnapshot
+
+#######################################################################
+
+# the stored (hashed) columns, other than the keys.
+SNAPSHOT_FIELDS = [
+    "type_id",
+    "person_id",
+    "ordering",
+    "sn",
+    "given_name",
+    "name",
+    "url",
+    "title",
+    "office",
+    "phone",
+    "email",
+    "mugshot_url",
+    "mugshot_srcset",
+    "mugshot_webp_srcset",
+    "note",
+]
+
+#######################################################################
+
+
+def _text(value):
+    return "" if value is None else "{}".format(value)
+
+
+def snapshot_values(entry):
+    """
+    The snapshot values for a directory entry: {field: value}
+    These resolve the entry/person/office fallbacks of the templates.
+    """
+    person = entry.person
+    phone = entry.phone_number or person.phone
+    if not phone and entry.office is not None:
+        phone = entry.office.phone_number
+    email = person.email
+    return {
+        "type_id": entry.type_id,
+        "person_id": entry.person_id,
+        "ordering": entry.ordering,
+        "sn": person.sn,
+        "given_name": person.given_name,
+        "name": _text(person),
+        "url": _text(entry.get_absolute_url()),
+        "title": entry.title or person.title,
+        "office": _text(entry.office),
+        "phone": _text(phone),
+        "email": "" if email is None else email.address,
+        "mugshot_url": entry.mugshot_thumbnail_url,
+        "mugshot_srcset": entry.mugshot_srcset,
+        "mugshot_webp_srcset": entry.mugshot_webp_srcset,
+        "note": _text(entry.note),
+    }
+
+
+def content_hash(values):
+    data = json.dumps([values[f] for f in SNAPSHOT_FIELDS])
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def compute_rows(entry_pks=None):
+    """
+    Compute the snapshot values for the given directory entry pks
+    (default: all entries): {entry_pk: values}.
+    Only active entries of active people are included.
+    Three queries: the entries, with their type, person and office;
+    and the public phone numbers and email addresses.
+    """
+    from people.models import EmailAddress, PhoneNumber
+    from people.querysets import contact_info_prefetches
+
+    entries = DirectoryEntry.objects.active()
+    if entry_pks is not None:
+        entries = entries.filter(pk__in=list(entry_pks))
+    entries = entries.prefetch_related(None).prefetch_related(
+        *contact_info_prefetches("person__", types=[PhoneNumber, EmailAddress])
+    )
+    return {entry.pk: snapshot_values(entry) for entry in entries}
+
+
+#######################################################################
+
+
+def refresh_snapshot(entry_pks=None):
+    """
+    Bring the snapshot rows for the given directory entry pks
+    (default: all entries) up to date: rows are created, updated
+    (only when their content changed), or deleted.
+    Returns a triple (n_created, n_updated, n_deleted).
+    """
+    computed = compute_rows(entry_pks)
+    now = timezone.now()
+
+    with transaction.atomic():
+        stored = DirectorySnapshot.objects.select_for_update()
+        if entry_pks is not None:
+            stored = stored.filter(entry__in=list(entry_pks))
+        stored = {row.entry_id: row for row in stored}
+        delete = [pk for pk in stored if pk not in computed]
+        create, update = [], []
+        for entry_pk, values in computed.items():
+            digest = content_hash(values)
+            row = stored.get(entry_pk)
+            if row is None:
+                create.append(
+                    DirectorySnapshot(
+                        entry_id=entry_pk, content_hash=digest, modified=now, **values
+                    )
+                )
+            elif row.content_hash != digest:
+                for field, value in values.items():
+                    setattr(row, field, value)
+                row.content_hash, row.modified = digest, now
+                update.append(row)
+        if delete:
+            DirectorySnapshot.objects.filter(entry__in=delete).delete()
+        DirectorySnapshot.objects.bulk_create(create)
+        DirectorySnapshot.objects.bulk_update(
+            update, SNAPSHOT_FIELDS + ["content_hash", "modified"]
+        )
+    return len(create), len(update), len(delete)
+
+
+def schedule_refresh(entry_pks):
+    """
+    Refresh the snapshot rows for the directory entry pks when the
+    current transaction commits (coalesced with any other refreshes
+    scheduled in the transaction).  Does nothing unless the snapshot
+    is enabled.
+    """
+    from people.utils.deferred import defer
+
+    entry_pks = [pk for pk in entry_pks if pk is not None]
+    if entry_pks and conf.get("snapshot:enabled"):
+        defer("directory.utils.snapshot.refresh_snapshot", entry_pks)
+
+
+#######################################################################
+
+
+def get_rows(type_pks=None, offices_only=False):
+    """
+    The snapshot rows, in directory order, for the given entry types
+    (default: all types); a single query.
+    """
+    rows = DirectorySnapshot.objects.all()
+    if type_pks is not None:
+        rows = rows.filter(type__in=list(type_pks))
+    if offices_only:
+        rows = rows.exclude(office="")
+    return rows
+
+
+def attach_rows(type_list, offices_only=False):
+    """
+    Set ``snapshot_list``, the list of snapshot rows, on each of the
+    entry types; a single query.  Returns the list of entry types.
+    """
+    type_list = list(type_list)
+    rows = {}
+    for row in get_rows([t.pk for t in type_list], offices_only):
+        rows.setdefault(row.type_id, []).append(row)
+    for entrytype in type_list:
+        entrytype.snapshot_list = rows.get(entrytype.pk, [])
+    return type_list
+
+
+#######################################################################
@@ -0,0 +1,113 @@
+"""
+Set-based synchronization of person flags to directory entries.
+
+For entry types that correspond to (synchronized) person flags:
+a person with the flag has an active entry of that type, and
+a person without the flag has no active entry of that type.
+"""
+###############
+from __future__ import print_function, unicode_literals
+
+from django.utils.timezone import now
+from people.models import Person
+
+from .. import cache, conf
+from ..models import DirectoryEntry, EntryType
+from ..signals import entries_changed, should_sync
+from . import EMAIL, snapshot
+
+#######################################################################
+
+
+def sync_entries_from_flags(person_pks, slug_list=None):
+    """
+    Person flags ==> directory entries, for the given people.
+    ``slug_list`` restricts the flag/entry type slugs considered
+    (default: every synchronized entry type).
+    Entries are never deleted, only (de)activated.
+    Returns a pair (n_activated, n_deactivated).
+    """
+    type_qs = EntryType.objects.all()
+    if slug_list is not None:
+        type_qs = type_qs.filter(slug__in=slug_list)
+    type_map = {
+        slug: pk
+        for pk, slug in type_qs.order_by().values_list("pk", "slug")
+        if should_sync(slug)
+    }
+    if not type_map:
+        return 0, 0
+    person_pks = list(person_pks)
+
+    wanted = set(
+        Person.flags.through.objects.filter(
+            person_id__in=person_pks, personflag__slug__in=list(type_map)
+        ).values_list("person_id", "personflag__slug")
+    )
+    wanted = set([(person_pk, type_map[slug]) for person_pk, slug in wanted])
+    entries = {
+        (person_pk, type_pk): (pk, active)
+        for pk, person_pk, type_pk, active in DirectoryEntry.objects.filter(
+            person_id__in=person_pks, type_id__in=list(type_map.values())
+        )
+        .order_by()
+        .values_list("pk", "person_id", "type_id", "active")
+    }
+
+    create = [key for key in wanted if key not in entries]
+    activate = [
+        entries[key][0] for key in wanted if key in entries and not entries[key][1]
+    ]
+    deactivate = [
+        pk for key, (pk, active) in entries.items() if active and key not in wanted
+    ]
+
+    timestamp = now()
+    DirectoryEntry.objects.bulk_create(
+        [DirectoryEntry(person_id=p, type_id=t) for p, t in create]
+    )
+    if activate:
+        DirectoryEntry.objects.filter(pk__in=activate).update(
+            active=True, modified=timestamp
+        )
+    if deactivate:
+        DirectoryEntry.objects.filter(pk__in=deactivate).update(
+            active=False, modified=timestamp
+        )
+
+    changed = set(create)
+    changed |= set([key for key in entries if entries[key][0] in activate])
+    changed |= set([key for key in entries if entries[key][0] in deactivate])
+    if changed:
+        # bulk operations send no signals, so invalidate cached pages,
+        # and refresh mailing lists and snapshot rows here.
+        entry_pks = activate + deactivate
+        if create and conf.get("snapshot:enabled"):
+            # (bulk_create does not set pks on every database)
+            created = set(create)
+            entry_pks += [
+                pk
+                for pk, person_pk, type_pk in DirectoryEntry.objects.filter(
+                    person_id__in=set([p for p, t in created]),
+                    type_id__in=set([t for p, t in created]),
+                )
+                .order_by()
+                .values_list("pk", "person_id", "type_id")
+                if (person_pk, type_pk) in created
+            ]
+        snapshot.schedule_refresh(entry_pks)
+        entries_changed.send(
+            sender=DirectoryEntry, person_pks=sorted(set([p for p, t in changed]))
+        )
+        type_pks = set([t for p, t in changed])
+        type_slugs = [slug for slug, pk in type_map.items() if pk in type_pks]
+        EMAIL.schedule_refresh(type_slugs)
+        if conf.get("cache:enabled"):
+            person_slugs = Person.objects.filter(
+                pk__in=[p for p, t in changed]
+            ).values_list("slug", flat=True)
+            cache.invalidate(type_slugs, person_slugs)
+    return len(create) + len(activate), len(deactivate)
+
+
+#######################################################################
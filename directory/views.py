@@ -3,8 +3,10 @@ Views for the directory application.
 """
 
 from django.contrib import messages
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
 from django.template import TemplateDoesNotExist
+from django.template.loader import render_to_string
 from django.urls import reverse
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import UpdateView
@@ -12,8 +14,10 @@ from django.views.generic.list import ListView
 from latex.djangoviews import LaTeX_ListView
 
 from . import conf
+from .cache import cache_directory_page
 from .forms import DirectoryEntryForm
 from .models import DirectoryEntry, EntryType
+from .utils import printing, snapshot
 
 # #############################################################
 
@@ -56,7 +60,85 @@ class PrintDirectory(LaTeX_ListView):
         Augment the context.
         """
         context = super(PrintDirectory, self).get_context_data(*args, **kwargs)
-        context.update(conf.get("print_context"))
+        context.update(printing.get_context(context["directory_list"]))
+        return context
+
+    def render_to_response(self, context, **response_kwargs):
+        """
+        Serve the PDF from the build cache.
+        """
+        if not conf.get("print:cache"):
+            return super(PrintDirectory, self).render_to_response(
+                context, **response_kwargs
+            )
+        src = render_to_string(self.template_name, context, request=self.request)
+        type_pks = None
+        if "pk" in self.request.GET:
+            type_pks = self.request.GET.getlist("pk")
+        response = HttpResponse(
+            printing.get_pdf(src, type_pks), content_type="application/pdf"
+        )
+        response["Content-Disposition"] = '{}; filename="directory.pdf"'.format(
+            "attachment" if self.as_attachment else "inline"
+        )
+        return response
+
+
+# #############################################################
+
+
+class EntryTypeEntriesMixin(object):
+    """
+    Load the active entries of entry types once per request:
+    entry types are annotated with ``active_entry_count`` and,
+    when ``prefetch_entries`` is set, have an ``active_entry_list``.
+    Templates should use these rather than ``directoryentry_set.active``,
+    which is a new query every time it is used.
+    """
+
+    prefetch_entries = True
+
+    def get_queryset(self):
+        queryset = super(EntryTypeEntriesMixin, self).get_queryset()
+        queryset = queryset.with_entry_counts()
+        if self.prefetch_entries:
+            queryset = queryset.with_active_entries()
+        return queryset
+
+
+class EntryTypeListView(EntryTypeEntriesMixin, ListView):
+    """
+    List the active entry types, with their entry counts.
+    """
+
+    queryset = EntryType.objects.active()
+
+
+class EntryTypeDetailView(EntryTypeEntriesMixin, DetailView):
+    """
+    An entry type page; the context has the materialized ``entry_list``
+    and ``entry_count``.  With the snapshot enabled, ``entry_list`` is
+    snapshot rows, and ``use_snapshot`` is set.
+    """
+
+    queryset = EntryType.objects.active()
+
+    def get_queryset(self):
+        # the snapshot replaces the prefetched entries.
+        self.prefetch_entries = not conf.get("snapshot:enabled")
+        return super(EntryTypeDetailView, self).get_queryset()
+
+    def get_context_data(self, *args, **kwargs):
+        """
+        Augment the context.
+        """
+        context = super(EntryTypeDetailView, self).get_context_data(*args, **kwargs)
+        if self.prefetch_entries:
+            context["entry_list"] = self.object.active_entry_list
+        else:
+            context["entry_list"] = list(snapshot.get_rows([self.object.pk]))
+            context["use_snapshot"] = True
+        context["entry_count"] = len(context["entry_list"])
         return context
 
 
@@ -72,7 +154,7 @@ class ByPersonListView(ListView):
     template_name = "directory/person_list.html"
 
 
-by_person_list = ByPersonListView.as_view()
+by_person_list = cache_directory_page()(ByPersonListView.as_view())
 
 # #############################################################
 
@@ -86,7 +168,7 @@ class ByPersonDetailView(DetailView):
     template_name = "directory/person_detail.html"
 
 
-by_person_detail = ByPersonDetailView.as_view()
+by_person_detail = cache_directory_page("person:{slug}")(ByPersonDetailView.as_view())
 
 # #############################################################
 
@@ -18,6 +18,10 @@ class PeopleConfig(AppConfig):
         """
         from . import conf, handlers
         from .models import Person, EmailAddress, PersonFlag
+        from .utils import permalink
+
+        # compile the configured permalink once.
+        permalink.get_permalink()
 
         # Register configured synchronization signal handlers
         from django.contrib.auth.models import User, Group
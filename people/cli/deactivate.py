@@ -1,91 +1,113 @@
 """
-Do a cascade deactivate on a person.
+Do a cascade deactivate on people: the people, and everything
+that refers to them which can be deactivated.
+People are selected by search terms, flags, and/or a file of pks;
+with more than one, only people matching all of them are deactivated.
 """
 #######################
 from __future__ import print_function, unicode_literals
 
+import sys
+
 from people.models import Person
 
+from ..utils.deactivate import deactivate_people
+
 #######################
 
 HELP_TEXT = __doc__.strip()
 DJANGO_COMMAND = "main"
 USE_ARGPARSE = True
-OPTION_LIST = ()
+OPTION_LIST = (
+    (["term"], {"nargs": "*", "help": "Search constraints"}),
+    (
+        ["--flags"],
+        dict(help="Specify a comma delimited list of flag slugs to select people"),
+    ),
+    (
+        ["--pk-file"],
+        dict(
+            dest="pk_file",
+            help='A file with the pks of the people to deactivate, one per line ("-" for stdin)',
+        ),
+    ),
+    (
+        ["--dry-run"],
+        dict(
+            action="store_true",
+            dest="dry_run",
+            help="Report what would be deactivated, but do not change anything",
+        ),
+    ),
+    (
+        ["--noinput"],
+        dict(action="store_true", help="Suppress regular confirmation check"),
+    ),
+)
 ARGS_USAGE = "[search terms]"
 
+#######################################################################
 
-def get_object_tree(obj):
-    """
-    Return all objects that point to this object via *_set() attributes.
-    """
-    result = {}
-
-    my_key = obj.__class__.__name__
-    result[my_key] = [obj, []]
-
-    related_sets = [attr for attr in dir(obj) if attr.endswith("_set")]
-    for attr in related_sets:
-        related_set = getattr(obj, attr)
-        # magical field introspection...
-        fields = [f.name.lower() for f in related_set.model._meta.fields]
-        if "active" in fields:
-            for subobj in related_set.all():
-                result[my_key][1].append(get_object_tree(subobj))
-    return result
-
-
-def confirm_deactivate(tree, level=0):
-    for key in tree:
-        value, subtree_list = tree[key]
-        print(" " * (4 * level), key, ":", value)
-        for subtree in subtree_list:
-            confirm_deactivate(subtree, level + 1)
-    if level == 0:
-        print
-        user_input = input("Are you sure you want to deactivate? [Y/n] ")
-        if user_input == "Y":
-            print
-            return True
-    return False
-
-
-def do_deactivate(tree, level=0):
+
+def read_pk_file(filename):
+    if filename == "-":
+        lines = sys.stdin.readlines()
+    else:
+        with open(filename) as f:
+            lines = f.readlines()
+    return [int(line.split()[0]) for line in lines if line.split()]
+
+
+def get_people(options):
     """
-    Deactivate all objects in the given tree.
+    The people selected by the options, or None if nothing was given.
     """
-    for key in tree:
-        obj, subtree_list = tree[key]
-        print(" " * (4 * level), key, ":", obj, end=" ")
-        if hasattr(obj, "active"):
-            print("[active = False]")
-            obj.active = False
-        if hasattr(obj, "Active"):
-            print("[Active = False]")
-            obj.Active = False
-        obj.save()
-        for subtree in subtree_list:
-            do_deactivate(subtree, level + 1)
+    if not (options["term"] or options["flags"] or options["pk_file"]):
+        return None
+    queryset = Person.objects.active()
+    if options["term"]:
+        search = Person.objects.search(*options["term"])
+        queryset = queryset.filter(pk__in=list(search.values_list("pk", flat=True)))
+    if options["flags"]:
+        slug_list = options["flags"].split(",")
+        flagged = Person.flags.through.objects.filter(personflag__slug__in=slug_list)
+        queryset = queryset.filter(pk__in=flagged.values("person"))
+    if options["pk_file"]:
+        queryset = queryset.filter(pk__in=read_pk_file(options["pk_file"]))
+    return queryset
+
+
+def confirm_deactivate(plan):
+    for model, count in plan:
+        print(model._meta.verbose_name_plural, ":", count)
+    print()
+    user_input = input("Are you sure you want to deactivate? [Y/n] ")
+    return user_input == "Y"
 
 
 def main(options, args):
-    search = Person.objects.search(*args)
+    queryset = get_people(options)
+    if queryset is None:
+        print("[!!!] give search terms, --flags, or --pk-file")
+        return False
 
-    if search.count() == 0:
+    people = list(queryset.values_list("pk", "cn")[:21])
+    if not people:
         print("[!!!] no person found")
         return False
-
-    if search.count() == 1:
-        obj = search.get()
-        tree = get_object_tree(obj)
-        if confirm_deactivate(tree):
-            do_deactivate(tree)
-            return True
+    for pk, cn in people[:20]:
+        print(pk, ":", cn)
+    if len(people) > 20:
+        print("...")
+
+    plan = deactivate_people(queryset, dry_run=True)
+    if options["dry_run"]:
+        for model, count in plan:
+            print(model._meta.verbose_name_plural, ":", count)
         return False
-
-    if search.count() > 1:
-        print("[!!!] multiple result of search. Use narrower terms.")
+    if not options["noinput"] and not confirm_deactivate(plan):
         return False
 
-    # should never happen:
-    assert False, "search.count() == %d" % search.count()
+    for model, count in deactivate_people(queryset):
+        print(model._meta.verbose_name_plural, ":", count, "[active = False]")
+    return True
@@ -0,0 +1,89 @@
+"""
+Find probable duplicate person records, and suggest merges.
+
+People are only compared when they share a surname sound (and given name
+initial), an email address, or a phone number.  One line per suggestion:
+the difference between the names, the shared information, the merge
+command, and the two names.
+"""
+#######################
+from __future__ import print_function, unicode_literals
+
+import json
+
+from ..models import Person
+from ..utils.duplicates import find_duplicates
+
+#######################
+#######################################################################
+
+HELP_TEXT = __doc__.strip()
+DJANGO_COMMAND = "main"
+USE_ARGPARSE = True
+OPTION_LIST = (
+    (
+        ["--threshold"],
+        dict(
+            type=float,
+            default=0.35,
+            help="Maximum relative difference between names [default: %(default)s]",
+        ),
+    ),
+    (
+        ["--max-block-size"],
+        dict(
+            type=int,
+            default=1000,
+            dest="max_block_size",
+            help="Skip groups of people larger than this, e.g., a shared departmental phone number [default: %(default)s]",
+        ),
+    ),
+    (
+        ["--include-inactive"],
+        dict(
+            action="store_true",
+            dest="include_inactive",
+            help="Include inactive people",
+        ),
+    ),
+    (
+        ["--format"],
+        dict(
+            choices=["tsv", "json"],
+            default="tsv",
+            help="Output format [default: %(default)s]",
+        ),
+    ),
+)
+
+#######################################################################
+
+
+def main(options, args):
+    queryset = Person.objects.all()
+    if not options["include_inactive"]:
+        queryset = queryset.active()
+
+    suggestions = find_duplicates(
+        queryset,
+        threshold=options["threshold"],
+        max_block_size=options["max_block_size"],
+    )
+    if options["format"] == "json":
+        print(json.dumps(suggestions, indent=2))
+        return
+    for s in suggestions:
+        print(
+            "\t".join(
+                [
+                    "{:.2f}".format(s["difference"]),
+                    ",".join(s["reasons"]),
+                    "people merge {} {}".format(s["src"], s["dst"]),
+                    s["src_cn"],
+                    s["dst_cn"],
+                ]
+            )
+        )
+
+
+#######################################################################
@@ -10,8 +10,10 @@ python manage.py people list --flags alumni -f emailaddress_set.active.0,graduat
 #######################
 from __future__ import print_function, unicode_literals
 
+import sys
+
 from ..models import Person as Model
-from . import resolve_fields
+from ..utils.export import FORMATS, throughput_report, write_export
 
 #######################
 #######################################################################
@@ -32,6 +34,27 @@ OPTION_LIST = (
         ["--flags"],
         dict(help="Specify a comma delimited list of flag slugs to filter the list"),
     ),
+    (
+        ["--format"],
+        dict(
+            choices=FORMATS,
+            default="tsv",
+            help="Output format [default: %(default)s]",
+        ),
+    ),
+    (
+        ["--chunk-size"],
+        dict(
+            type=int,
+            default=500,
+            dest="chunk_size",
+            help="Number of objects loaded per chunk [default: %(default)s]",
+        ),
+    ),
+    (
+        ["--stats"],
+        dict(action="store_true", help="Report throughput on stderr when done"),
+    ),
 )
 
 #######################################################################
@@ -45,11 +68,14 @@ def main(options, args):
     if options["flags"]:
         queryset = queryset.filter(flags__slug__in=options["flags"].split(","))
 
-    for item in queryset.iterator():
-        value_list = ["{}".format(item.pk), "{}".format(item)]
-        if options["field_list"]:
-            value_list += resolve_fields(item, options["field_list"].split(","))
-        print("\t".join(value_list))
+    field_list = []
+    if options["field_list"]:
+        field_list = options["field_list"].split(",")
+    n, elapsed = write_export(
+        queryset, field_list, options["format"], chunk_size=options["chunk_size"]
+    )
+    if options["stats"]:
+        print(throughput_report(n, elapsed), file=sys.stderr)
 
 
 #######################################################################
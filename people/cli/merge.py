@@ -6,30 +6,92 @@ HELP_TEXT = "Merge two people, and remove "
 DJANGO_COMMAND = "main"
 USE_ARGPARSE = True
 OPTION_LIST = (
-    (["src_pk"], {"help": "Source person for merge, required"}),
-    (["dst_pk"], {"help": "Destination person for merge, required"}),
+    (["src_pk"], {"help": "Source person for merge, required", "nargs": "?"}),
+    (["dst_pk"], {"help": "Destination person for merge, required", "nargs": "?"}),
     (
         ["--noinput"],
         {"help": "Suppress regular confirmation check", "action": "store_true"},
     ),
+    (
+        ["--batch"],
+        {
+            "help": 'Merge every "src_pk dst_pk" pair listed in this file, one pair per line ("-" for stdin)'
+        },
+    ),
+    (
+        ["--dry-run"],
+        {
+            "help": "Plan and report the merge(s), but do not change anything",
+            "action": "store_true",
+            "dest": "dry_run",
+        },
+    ),
 )
 ARGS_USAGE = "dst_pk"
 
 
+def read_pairs(filename):
+    """
+    Return a list of (dst_pk, src_pk) from a file of "src_pk dst_pk" lines.
+    """
+    if filename == "-":
+        lines = sys.stdin.readlines()
+    else:
+        with open(filename) as f:
+            lines = f.readlines()
+    pair_list = []
+    for line in lines:
+        bits = line.split("#", 1)[0].split()
+        if not bits:
+            continue
+        src_pk, dst_pk = bits[:2]
+        pair_list.append((int(dst_pk), int(src_pk)))
+    return pair_list
+
+
 def main(options, args):
     verbosity = int(options["verbosity"])
-    from ..utils.merge import merge_people
+    from ..utils.merge import merge_people, merge_people_batch
     from ..models import Person
 
+    commit = not options.get("dry_run", False)
+    if options.get("batch"):
+        pair_list = read_pairs(options["batch"])
+        if not options["noinput"]:
+            print(
+                "Are you sure you want to merge {} pairs of people? [y/N] ".format(
+                    len(pair_list)
+                ),
+                end="",
+            )
+            sys.stdout.flush()
+            confirm = input()
+            if not confirm.lower() == "y":
+                sys.exit(0)
+        results = merge_people_batch(
+            pair_list, verbosity=max(verbosity, 1), commit=commit
+        )
+        failures = [r for r in results if r[2] is not None]
+        print(
+            "{} merged, {} failed".format(len(results) - len(failures), len(failures))
+        )
+        return
+
+    if not options["src_pk"] or not options["dst_pk"]:
+        print("Give the source and destination, or --batch")
+        sys.exit(1)
     if not options["noinput"]:
         src = Person.objects.get(pk=options["src_pk"])
         dst = Person.objects.get(pk=options["dst_pk"])
-        sys.stdout.write(
+        print(
             'Are you sure you want to merge "{}" into "{}"? [y/N] '.format(src, dst),
-            ending="",
+            end="",
         )
+        sys.stdout.flush()
         confirm = input()
         if not confirm.lower() == "y":
             sys.exit(0)
 
-    merge_people(options["dst_pk"], options["src_pk"], verbosity=verbosity)
+    merge_people(
+        options["dst_pk"], options["src_pk"], verbosity=verbosity, commit=commit
+    )
@@ -0,0 +1,28 @@
+#######################
+from __future__ import print_function, unicode_literals
+
+from ..search import reindex
+
+#######################
+
+HELP_TEXT = "Rebuild the person search column and index"
+DJANGO_COMMAND = "main"
+USE_ARGPARSE = True
+OPTION_LIST = (
+    (
+        ["--batch-size"],
+        dict(
+            type=int,
+            default=500,
+            help="Number of people to update per query [default: %(default)s]",
+        ),
+    ),
+)
+
+
+def main(options, args):
+    if args:
+        print("This management command takes no arguments.")
+
+    n = reindex(batch_size=options["batch_size"])
+    print("Reindexed {} people.".format(n))
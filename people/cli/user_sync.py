@@ -16,6 +16,13 @@ OPTION_LIST = (
             help="Update user names from corresponding person objects (default)",
         ),
     ),
+    (
+        ["--prune"],
+        dict(
+            action="store_true",
+            help="Also remove memberships with no corresponding flag or group",
+        ),
+    ),
 )
 
 from django.contrib.auth import get_user_model
@@ -23,6 +30,7 @@ from django.contrib.auth.models import Group
 
 from .. import conf, handlers
 from ..models import Person, PersonFlag
+from ..utils.sync import sync_flags_from_groups, sync_groups_from_flags
 
 
 def update_person_from_user(person, user):
@@ -38,13 +46,6 @@ def update_person_from_user(person, user):
     if conf.get("sync:person:user-email"):
         handlers.user_post_save_email_to_person(__name__, user, False, False)
 
-    if conf.get("sync:person-flags:user-groups"):
-        User = get_user_model()
-        pk_set = list(user.groups.all().values_list("pk", flat=True))
-        handlers.user_groups_m2m_changed_handler(
-            __name__, user, "post_add", False, User, pk_set
-        )
-
 
 def update_flags_from_groups():
     """
@@ -64,6 +65,26 @@ def update_groups_from_flags():
             handlers.personflag_pre_save_to_group(__name__, personflag, False)
 
 
+def update_group_membership(prune=False, quiet=False):
+    """
+    PersonFlag membership -> Group membership, for everyone at once.
+    """
+    if conf.get("sync:person-flags:user-groups"):
+        added, removed = sync_groups_from_flags(prune=prune)
+        if not quiet:
+            print("Group memberships: {} added, {} removed".format(added, removed))
+
+
+def update_flag_membership(prune=False, quiet=False):
+    """
+    Group membership -> PersonFlag membership, for everyone at once.
+    """
+    if conf.get("sync:person-flags:user-groups"):
+        added, removed = sync_flags_from_groups(prune=prune)
+        if not quiet:
+            print("Flag memberships: {} added, {} removed".format(added, removed))
+
+
 def update_user_from_person(person, user):
     """
     person -> user (update user)
@@ -81,12 +102,6 @@ def update_user_from_person(person, user):
                 __name__, emailaddress_qs[0], False, False
             )
 
-    if conf.get("sync:person-flags:user-groups"):
-        pk_set = list(person.flags.all().values_list("pk", flat=True))
-        handlers.person_flags_m2m_changed_handler(
-            __name__, person, "post_add", False, Person, pk_set
-        )
-
 
 def main(options, args):
 
@@ -117,6 +132,7 @@ def main(options, args):
             except User.DoesNotExist:
                 user = None
             flag = update(person, user)
+        update_group_membership(options["prune"], quiet)
 
     if update == update_person_from_user:
         update_flags_from_groups()
@@ -126,5 +142,6 @@ def main(options, args):
             except Person.DoesNotExist:
                 person = None
             flag = update(person, user)
+        update_flag_membership(options["prune"], quiet)
 
     ###
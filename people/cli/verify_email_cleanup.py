@@ -16,4 +16,7 @@ def main(options, args):
     if args:
         print("This management command takes no arguments.")
 
-    EmailConfirmation.objects.delete_expired()
+    counts = EmailConfirmation.objects.delete_expired()
+    for label in sorted(counts):
+        if counts[label]:
+            print("{}: {} deleted".format(label, counts[label]))
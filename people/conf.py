@@ -25,6 +25,9 @@ DEFAULT = {
     # The length of time (in hours) a user has from the time
     # the verification email is sent until it expires.
     "verification_timeout": 2 * 24,
+    # Should verification emails (start_verification_bulk) be sent
+    # by a celery task, rather than in the request?
+    "verification:celery": False,
     # A string or callable for guessing names with incomplete data.
     "name_guess:function": "people.utils.name_guess_helper",
     # Should slugs be created automatically, or not?
@@ -65,9 +68,22 @@ DEFAULT = {
     "sync:person-flags:user-groups": True,
     # a callable or other way of slugify people (see django-autoslug docs)
     "person:slug:populate_from": "cn",
+    # The person search backend (dotted path or class), see people/search.py.
+    #   None chooses a backend suitable for the database vendor;
+    #   'people.search.ORMSearchBackend' is the original icontains search.
+    "search:backend": None,
+    # Sync signal processing (people and directory):
+    #   None: handlers do their work immediately;
+    #   'on_commit': changes are buffered and applied once, on commit;
+    #   'celery': as 'on_commit', but applied by a celery task.
+    # See people/utils/deferred.py
+    "signals:deferred": None,
 }
 
-from django.conf import settings
+from directory.appconf import AppConf
+
+
+_conf = AppConf(CONFIG_NAME, DEFAULT)
 
 
 def get(setting):
@@ -75,11 +91,9 @@ def get(setting):
     get(setting) -> value
 
     setting should be a string representing the application settings to
-    retrieve.
+    retrieve.  Settings are resolved once, see directory.appconf
     """
-    assert setting in DEFAULT, "the setting %r has no default value" % setting
-    app_settings = getattr(settings, CONFIG_NAME, DEFAULT)
-    return app_settings.get(setting, DEFAULT[setting])
+    return _conf.get(setting)
 
 
 def set(setting, value):
@@ -88,17 +102,20 @@ def set(setting, value):
 
     Setting things programmatically should only ever happen in unit tests.
     """
-    assert setting in DEFAULT, "the setting %r has no default value" % setting
-    app_settings = getattr(settings, CONFIG_NAME, DEFAULT)
-    app_settings[setting] = value
-    return value
+    return _conf.set(setting, value)
 
 
 def get_all():
     """
     Return all current settings as a dictionary.
     """
-    app_settings = getattr(settings, CONFIG_NAME, DEFAULT)
-    return dict(
-        [(setting, app_settings.get(setting, DEFAULT[setting])) for setting in DEFAULT]
-    )
+    return _conf.get_all()
+
+
+def derived(name, func):
+    """
+    derived(name, func) -> func()
+
+    A value computed from the settings, memoized until they change.
+    """
+    return _conf.derived(name, func)
@@ -10,9 +10,11 @@ from django.utils.text import slugify
 
 from . import conf
 from .utils import (
+    deferred,
     get_person_user_pair,
     person2user_email,
     person2user_name,
+    person_search_text,
     user2person_name,
 )
 
@@ -48,6 +50,41 @@ def person_pre_save_set_slug(sender, instance, raw, **kwargs):
 ################################################################
 
 
+def person_pre_save_set_search_text(sender, instance, raw, **kwargs):
+    """
+    Keep the normalized search column in sync with the name fields.
+    This is derived data, so it is computed for raw saves also.
+    """
+    instance.search_text = person_search_text(instance)
+
+
+################################################################
+
+
+def person_post_save_update_search_index(sender, instance, raw, created, **kwargs):
+    """
+    Refresh any backend specific search index for this person.
+    """
+    from .search import get_backend
+
+    get_backend(kwargs.get("using") or "default").update_index([instance.pk])
+
+
+################################################################
+
+
+def person_post_delete_remove_search_index(sender, instance, **kwargs):
+    """
+    Remove this person from any backend specific search index.
+    """
+    from .search import get_backend
+
+    get_backend(kwargs.get("using") or "default").remove_from_index([instance.pk])
+
+
+################################################################
+
+
 def person_post_save_name_to_user(sender, instance, raw, created, **kwargs):
     """
     When a person's name changes, and there is a corresponding
@@ -55,6 +92,9 @@ def person_post_save_name_to_user(sender, instance, raw, created, **kwargs):
     """
     if raw:
         return  # do not change other fields in this case.
+    if deferred.is_deferred():
+        deferred.defer("people.utils.sync.sync_users_from_people", [instance.pk])
+        return
 
     person, user = get_person_user_pair(person=instance)
     if user is None:
@@ -118,6 +158,9 @@ def user_post_save_name_to_person(sender, instance, raw, created, **kwargs):
 
     if isinstance(instance, AnonymousUser):
         return
+    if deferred.is_deferred():
+        deferred.defer("people.utils.sync.sync_people_from_users", [instance.pk])
+        return
 
     person, user = get_person_user_pair(user=instance)
     if person is None:
@@ -179,6 +222,9 @@ def emailaddress_post_save_email_to_user(sender, instance, raw, created, **kwarg
         return  # do not change other fields in this case.
     if getattr(instance, "_sync_signal", False):
         return
+    if deferred.is_deferred():
+        deferred.defer("people.utils.sync.sync_users_from_people", [instance.person_id])
+        return
 
     person, user = get_person_user_pair(person=instance.person)
     if user is None:
@@ -355,37 +401,42 @@ def person_flags_m2m_changed_handler(
 ):
     """
     Push person flag changes to user groups.
+    This works for both person.flags and personflag.person_set changes.
     """
     if getattr(instance, "_sync_signal", False):
         return
-    person, user = get_person_user_pair(person=instance)
-    if user is None:
+    if action == "pre_clear":
+        # remember what is about to be cleared, for post_clear.
+        field = "personflag_id" if reverse else "person_id"
+        other = "person_id" if reverse else "personflag_id"
+        instance._sync_cleared = set(
+            sender.objects.filter(**{field: instance.pk}).values_list(other, flat=True)
+        )
         return
-    if action not in ["post_add", "post_remove", "pre_clear"]:
+    if action == "post_clear":
+        pk_set = instance.__dict__.pop("_sync_cleared", set())
+    elif action not in ["post_add", "post_remove"]:
         return
 
-    from django.contrib.auth.models import Group
     from .models import PersonFlag
+    from .utils.sync import change_keys, sync_groups_from_flags
 
-    name_list = []
-    if pk_set is not None:
-        name_list = PersonFlag.objects.filter(pk__in=pk_set).values_list(
-            "verbose_name", flat=True
+    if reverse:
+        person_pks, flag_pks = pk_set, [instance.pk]
+    else:
+        person_pks, flag_pks = [instance.pk], pk_set
+    if not person_pks or not flag_pks:
+        return
+    if deferred.is_deferred():
+        deferred.defer(
+            "people.utils.sync.sync_groups_from_flag_changes",
+            change_keys(person_pks, flag_pks),
         )
-    if action == "pre_clear":
-        name_list = person.flags.all().values_list("verbose_name", flat=True)
-
-    user._sync_signal = True
-    if action in ["pre_clear", "post_remove"]:
-        group_list = list(user.groups.filter(name__in=name_list))
-        user.groups.remove(*group_list)
-
-    if action == "post_add":
-        group_list = []
-        for name in name_list:
-            group, created = Group.objects.get_or_create(name=name)
-            group_list.append(group)
-        user.groups.add(*group_list)
+        return
+    name_list = PersonFlag.objects.filter(pk__in=flag_pks).values_list(
+        "verbose_name", flat=True
+    )
+    sync_groups_from_flags(person_pks=person_pks, name_list=list(name_list))
 
 
 ################################################################
@@ -396,6 +447,7 @@ def user_groups_m2m_changed_handler(
 ):
     """
     Push user group changes to person flags.
+    This works for both user.groups and group.user_set changes.
     """
     from django.contrib.auth.models import AnonymousUser
 
@@ -403,35 +455,36 @@ def user_groups_m2m_changed_handler(
         return
     if getattr(instance, "_sync_signal", False):
         return
-    person, user = get_person_user_pair(user=instance)
-    if person is None:
+    if action == "pre_clear":
+        # remember what is about to be cleared, for post_clear.
+        field = "group_id" if reverse else "user_id"
+        other = "user_id" if reverse else "group_id"
+        instance._sync_cleared = set(
+            sender.objects.filter(**{field: instance.pk}).values_list(other, flat=True)
+        )
         return
-    if action not in ["post_add", "post_remove", "pre_clear"]:
+    if action == "post_clear":
+        pk_set = instance.__dict__.pop("_sync_cleared", set())
+    elif action not in ["post_add", "post_remove"]:
         return
 
     from django.contrib.auth.models import Group
-    from .models import PersonFlag
+    from .utils.sync import change_keys, sync_flags_from_groups
 
-    name_list = []
-    if pk_set is not None:
-        name_list = Group.objects.filter(pk__in=pk_set).values_list("name", flat=True)
-    if action == "pre_clear":
-        name_list = user.groups.all().values_list("name", flat=True)
-
-    person._sync_signal = True
-    if action in ["pre_clear", "post_remove"]:
-        personflag_list = list(person.flags.filter(verbose_name__in=name_list))
-        person.flags.remove(*personflag_list)
-
-    if action == "post_add":
-        personflag_list = []
-        for name in name_list:
-            slug = slugify(name)
-            personflag, created = PersonFlag.objects.get_or_create(
-                verbose_name=name, defaults={"slug": slug}
-            )
-            personflag_list.append(personflag)
-        person.flags.add(*personflag_list)
+    if reverse:
+        user_pks, group_pks = pk_set, [instance.pk]
+    else:
+        user_pks, group_pks = [instance.pk], pk_set
+    if not user_pks or not group_pks:
+        return
+    if deferred.is_deferred():
+        deferred.defer(
+            "people.utils.sync.sync_flags_from_group_changes",
+            change_keys(user_pks, group_pks),
+        )
+        return
+    name_list = Group.objects.filter(pk__in=group_pks).values_list("name", flat=True)
+    sync_flags_from_groups(user_pks=user_pks, name_list=list(name_list))
 
 
 ################################################################
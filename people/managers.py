@@ -6,12 +6,14 @@ e.g., phone numbers, addresses, etc.
 from __future__ import print_function, unicode_literals
 
 #######################
+import datetime
 import hashlib
 import random
 import re
 from importlib import import_module
 
 from django.db import models
+from django.utils import timezone
 
 from . import conf, handlers
 from .querysets import BaseContactInfoQuerySet, PersonFlagQuerySet, PersonQuerySet
@@ -229,6 +231,14 @@ class EmailConfirmationManager(CustomQuerySetManager):
 
     SHA1_RE = re.compile("^[a-f0-9]{40}$")
 
+    def make_key(self, email):
+        """
+        A new (random) confirmation key for an email address.
+        """
+        salt = "{}".format(random.random())[2:8]
+        value = salt + "{}".format(email)
+        return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
     def start_verification(
         self,
         email,
@@ -243,9 +253,7 @@ class EmailConfirmationManager(CustomQuerySetManager):
         """
         Begin the verification process
         """
-        salt = "{}".format(random.random())[2:8]
-        value = salt + "{}".format(email)
-        key = hashlib.sha1(value.encode("utf-8")).hexdigest()
+        key = self.make_key(email)
 
         verification, created = self.get_or_create(
             email=email, defaults={"key": key, "redirect_url": redirect_url}
@@ -262,6 +270,130 @@ class EmailConfirmationManager(CustomQuerySetManager):
                 extra_email_context=extra_email_context,
             )
 
+    def start_verification_bulk(
+        self,
+        email_qs,
+        site=None,
+        send_email=True,
+        redirect_url=None,
+        delete_unverified=False,
+        subject_template=DEFAULT_CONFIRM_SUBJECT_TEMPLATE,
+        body_template=DEFAULT_CONFIRM_BODY_TEMPLATE,
+        extra_email_context=None,
+        use_celery=None,
+    ):
+        """
+        Begin the verification process for a queryset of email addresses.
+        Missing confirmations are created with a single insert, and the
+        emails are sent with ``send_emails()``.
+        With ``use_celery`` (default: the ``verification:celery`` setting)
+        the emails are sent by a celery task, once the current transaction
+        commits; ``extra_email_context`` must then be serializable.
+        Returns the list of confirmation pks.
+        """
+        from django.contrib.sites.models import Site
+        from django.db import transaction
+
+        addresses = dict(email_qs.order_by().values_list("pk", "address"))
+        existing = dict(
+            self.filter(email__in=list(addresses)).values_list("email", "pk")
+        )
+        self.bulk_create(
+            [
+                self.model(
+                    email_id=email_pk,
+                    key=self.make_key(address),
+                    redirect_url=redirect_url or "",
+                    delete_unverified=delete_unverified,
+                    active=True,
+                )
+                for email_pk, address in addresses.items()
+                if email_pk not in existing
+            ]
+        )
+        pk_list = list(
+            self.filter(email__in=list(addresses))
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        if not send_email or not pk_list:
+            return pk_list
+
+        if site is None:
+            site = Site.objects.get_current()
+        if use_celery is None:
+            use_celery = conf.get("verification:celery")
+        kwargs = {
+            "subject_template": subject_template,
+            "body_template": body_template,
+            "extra_email_context": extra_email_context,
+        }
+        if use_celery:
+            from .tasks import SendConfirmationEmails
+
+            transaction.on_commit(
+                lambda: SendConfirmationEmails.delay(pk_list, site.pk, **kwargs)
+            )
+        else:
+            self.send_emails(pk_list, site, **kwargs)
+        return pk_list
+
+    def send_emails(
+        self,
+        pk_list,
+        site=None,
+        subject_template=DEFAULT_CONFIRM_SUBJECT_TEMPLATE,
+        body_template=DEFAULT_CONFIRM_BODY_TEMPLATE,
+        extra_email_context=None,
+        chunk_size=100,
+    ):
+        """
+        Send the confirmation emails for the given confirmation pks
+        (which are not already verified).
+        The templates are loaded once, and the messages are sent over
+        a single connection, ``chunk_size`` at a time; the send time
+        of each chunk is saved after it goes out.
+        Returns the number of emails sent.
+        """
+        from django.contrib.sites.models import Site
+        from django.core.mail import get_connection
+
+        from .models import load_template
+
+        if site is None:
+            site = Site.objects.get_current()
+        subject_template = load_template(subject_template)
+        body_template = load_template(body_template)
+        confirmations = (
+            self.filter(pk__in=pk_list)
+            .exclude(key=self.model.VERIFIED)
+            .select_related("email__person")
+            .order_by("pk")
+        )
+        confirmations = list(confirmations)
+        sent = 0
+        with get_connection() as connection:
+            for start in range(0, len(confirmations), chunk_size):
+                chunk = confirmations[start : start + chunk_size]
+                now = timezone.now()
+                messages = [
+                    verification.build_email(
+                        site,
+                        subject_template,
+                        body_template,
+                        extra_email_context,
+                        now,
+                    )
+                    for verification in chunk
+                ]
+                connection.send_messages(messages)
+                # save AFTER the emails go out.
+                self.filter(pk__in=[v.pk for v in chunk]).update(
+                    email_send_time=now, modified=now
+                )
+                sent += len(chunk)
+        return sent
+
     def verify(key):
         """
         Returns the pair None, None if things don't work out,
@@ -282,7 +414,15 @@ class EmailConfirmationManager(CustomQuerySetManager):
         verification.set_verified(set_email=True)
         return verification.email, verification.redirect_url
 
-    def delete_expired(self):
+    def expired(self):
+        """
+        Active confirmations whose email was sent longer ago than
+        the verification timeout.
+        """
+        timeout = datetime.timedelta(hours=conf.get("verification_timeout"))
+        return self.filter(active=True, email_send_time__lt=timezone.now() - timeout)
+
+    def delete_expired(self, chunk_size=500):
         """
         A troublesome user/email can be dealt with by setting
         the email_send_time to None, which will never delete.
@@ -290,18 +430,43 @@ class EmailConfirmationManager(CustomQuerySetManager):
         EmailAddresses & People will only be deleted when
         the verify record has the delete_unverified flag set
         and the email is marked as unverified.
+
+        Expired confirmations are found, and deleted, in the database
+        in chunks of ``chunk_size``.
+        Returns a dictionary of the number of objects deleted, by model
+        label (as ``QuerySet.delete()``); this includes objects deleted
+        along with the people.
         """
-        # note: may need  a try...except self.model.DoesNotExist
-        for verify in self.all():
-            if not verify.is_valid() and verify.email_send_time is not None:
-                delete = verify.delete_unverified
-                if delete:
-                    email = verify.email
-                verify.delete()
-                if delete and not email.verified:
-                    person = email.person
-                    email.delete()
-                    person.delete()
+        from .models import Person
+
+        counts = {}
+
+        def _count(result):
+            for label, n in result[1].items():
+                counts[label] = counts.get(label, 0) + n
+
+        rows = self.expired().order_by("pk")
+        rows = rows.values_list(
+            "pk", "delete_unverified", "key", "email__verified", "email__person"
+        )
+        last_pk = None
+        while True:
+            chunk = rows if last_pk is None else rows.filter(pk__gt=last_pk)
+            chunk = list(chunk[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1][0]
+            person_pks = set(
+                [
+                    person_pk
+                    for pk, delete, key, verified, person_pk in chunk
+                    if delete and not verified and key != self.model.VERIFIED
+                ]
+            )
+            _count(self.filter(pk__in=[row[0] for row in chunk]).delete())
+            if person_pks:
+                _count(Person.objects.filter(pk__in=person_pks).delete())
+        return counts
 
 
 ###############################################################
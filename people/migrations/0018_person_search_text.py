@@ -0,0 +1,101 @@
+# Generated by Django 2.2.28 on 2026-10-18 09:00
+
+import unicodedata
+
+from django.db import DatabaseError, migrations, models, transaction
+
+FTS_TABLE = "people_person_fts"
+TRGM_INDEX = "people_person_search_text_trgm"
+
+# a copy of people.utils.person_search_text, as it was for this migration.
+SEARCH_TEXT_FIELDS = ["cn", "sn", "given_name"]
+SEARCH_TEXT_SEPARATOR = "|"
+
+
+def normalize_search_text(value):
+    if value is None:
+        return ""
+    value = unicodedata.normalize("NFKD", "{}".format(value))
+    value = "".join([c for c in value if not unicodedata.combining(c)])
+    value = value.replace(SEARCH_TEXT_SEPARATOR, " ")
+    return " ".join(value.casefold().split())
+
+
+def person_search_text(person):
+    values = [
+        normalize_search_text(getattr(person, field_name, ""))
+        for field_name in SEARCH_TEXT_FIELDS
+    ]
+    sep = SEARCH_TEXT_SEPARATOR
+    return sep + sep.join(values) + sep
+
+
+def populate_search_text(apps, schema_editor):
+    Person = apps.get_model("people", "Person")
+    db_alias = schema_editor.connection.alias
+    batch = []
+    for person in Person.objects.using(db_alias).only("pk", "cn", "sn", "given_name"):
+        person.search_text = person_search_text(person)
+        batch.append(person)
+    Person.objects.using(db_alias).bulk_update(batch, ["search_text"], batch_size=500)
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Vendor specific search indexes.  These are optional: if they cannot be
+    created, searches fall back to plain matching on the search column.
+    """
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        statements = [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            "CREATE INDEX {} ON people_person USING gin (search_text gin_trgm_ops)".format(
+                TRGM_INDEX
+            ),
+        ]
+    elif connection.vendor == "sqlite":
+        statements = [
+            "CREATE VIRTUAL TABLE {} USING fts5(search_text, tokenize='trigram')".format(
+                FTS_TABLE
+            ),
+            "INSERT INTO {} (rowid, search_text) SELECT id, search_text FROM people_person".format(
+                FTS_TABLE
+            ),
+        ]
+    else:
+        return
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+    except DatabaseError:
+        pass
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        sql = "DROP INDEX IF EXISTS {}".format(TRGM_INDEX)
+    elif connection.vendor == "sqlite":
+        sql = "DROP TABLE IF EXISTS {}".format(FTS_TABLE)
+    else:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    dependencies = [("people", "0017_auto_20190604_0947")]
+
+    operations = [
+        migrations.AddField(
+            model_name="person",
+            name="search_text",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.RunPython(populate_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("people", "0018_person_search_text")]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="emailconfirmation",
+            index=models.Index(
+                fields=["active", "email_send_time"],
+                name="people_emai_active_f5356d_idx",
+            ),
+        )
+    ]
@@ -8,7 +8,6 @@ from __future__ import print_function, unicode_literals
 ###############
 import datetime
 import re
-from importlib import import_module
 
 from autoslug.fields import AutoSlugField
 from directory import PhoneNumberField, PostalCodeField, RegionField
@@ -18,8 +17,9 @@ from django.contrib.sites.models import Site
 from django.core import validators
 from django.core.mail import EmailMessage
 from django.db import models
-from django.template.loader import render_to_string
+from django.template.loader import get_template, select_template
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.encoding import python_2_unicode_compatible
 
 from . import conf, handlers
@@ -31,7 +31,8 @@ from .managers import (
     PersonFlagManager,
     PersonManager,
 )
-from .querysets import PersonKeyQuerySet, PersonKeyValueQuerySet
+from .querysets import PersonKeyQuerySet, PersonKeyValueQuerySet, contact_info_attr
+from .utils import permalink
 
 #######################################################################
 
@@ -155,6 +156,11 @@ class Person(PeopleBaseModel):
 
     note = models.TextField(blank=True)
 
+    # normalized names, maintained by a signal handler; see people.search
+    search_text = models.CharField(
+        max_length=255, blank=True, default="", editable=False
+    )
+
     objects = PersonManager()
 
     class Meta:
@@ -186,24 +192,11 @@ class Person(PeopleBaseModel):
             personal pages.
             Note that personal pages are not guaranteed to exist when a person
             exists; even when they have a slug.
+            The configured permalink is compiled once, see
+            people.utils.permalink; PersonQuerySet.with_urls()
+            precomputes the url.
             """
-            if isinstance(PERSON_PERMALINK, (tuple, list)):
-                view_name, arg_callable_string = PERSON_PERMALINK
-                if callable(arg_callable_string):
-                    arg_callable = arg_callable_string
-                else:
-                    mod_name, f_name = arg_callable_string.rsplit(".", 1)
-                    arg_callable = getattr(import_module(mod_name), f_name)
-                args = arg_callable(self)
-                if args is not None:
-                    return reverse(view_name, args=args)
-            elif callable(PERSON_PERMALINK):
-                return PERSON_PERMALINK(self)
-            elif isinstance(PERSON_PERMALINK, str):
-                mod_name, f_name = arg_callable_string.rsplit(".", 1)
-                f = getattr(import_module(mod_name), f_name)
-                return f(self)
-            return None
+            return permalink.resolve(self)
 
     ##################
     ## The following methods deal with changing a person's flags
@@ -301,15 +294,39 @@ class Person(PeopleBaseModel):
             StreetAddress, type_slug, preferred=preferred, **data
         )
 
+    def _get_cached_contact_info(self, type_, ci_type_slug=None):
+        """
+        Return the public contact information of type ``type_`` from
+        prefetched data, or None when it was not prefetched.
+        This is either ``PersonQuerySet.with_contact_info()`` data,
+        or a plain ``prefetch_related('phonenumber_set')`` (etc.)
+        """
+        info = getattr(self, contact_info_attr(type_), None)
+        if info is None:
+            cache_name = type_._meta.get_field("person").remote_field.get_cache_name()
+            prefetched = getattr(self, "_prefetched_objects_cache", {})
+            if cache_name not in prefetched:
+                return None
+            info = [i for i in prefetched[cache_name] if i.active and i.public]
+        if ci_type_slug is not None:
+            type_field = type_._meta.get_field("type")
+            if not all([type_field.is_cached(i) for i in info]):
+                return None  # avoid a query per item.
+            info = [i for i in info if i.type.slug == ci_type_slug]
+        return info
+
     def get_contact_info(self, type_, ci_type_slug=None):
         """
         This method *only* returns items that are public.
+        Prefetched contact information is used, when available.
         """
-        qs = type_.objects.filter(active=True, person=self, public=True)
-        if ci_type_slug is not None:
-            qs = qs.filter(type__slug=ci_type_slug)
+        info = self._get_cached_contact_info(type_, ci_type_slug)
+        if info is None:
+            qs = type_.objects.filter(active=True, person=self, public=True)
+            if ci_type_slug is not None:
+                qs = qs.filter(type__slug=ci_type_slug)
 
-        info = list(qs)  # force evalutation: 1 query.
+            info = list(qs)  # force evalutation: 1 query.
         if not info:
             return None
         if any([i.preferred for i in info]):
@@ -354,6 +371,14 @@ class Person(PeopleBaseModel):
 if conf.get("autoslug"):
     models.signals.pre_save.connect(handlers.person_pre_save_set_slug, sender=Person)
 
+models.signals.pre_save.connect(handlers.person_pre_save_set_search_text, sender=Person)
+models.signals.post_save.connect(
+    handlers.person_post_save_update_search_index, sender=Person
+)
+models.signals.post_delete.connect(
+    handlers.person_post_delete_remove_search_index, sender=Person
+)
+
 ###############################################################
 
 
@@ -499,6 +524,20 @@ class StreetAddress(BaseContactInfo):
 ###############################################################
 
 
+def load_template(template):
+    """
+    A loaded template, from a template name, or a list of names.
+    """
+    if hasattr(template, "render"):
+        return template
+    if isinstance(template, (list, tuple)):
+        return select_template(template)
+    return get_template(template)
+
+
+###############################################################
+
+
 @python_2_unicode_compatible
 class EmailConfirmation(PeopleBaseModel):
     """
@@ -523,6 +562,9 @@ class EmailConfirmation(PeopleBaseModel):
 
     objects = EmailConfirmationManager()
 
+    class Meta:
+        indexes = [models.Index(fields=["active", "email_send_time"])]
+
     def __str__(self):
         return "{}".format(self.email) + ": " + self.key
 
@@ -548,26 +590,26 @@ class EmailConfirmation(PeopleBaseModel):
         timeout_hours = conf.get("verification_timeout")
         if self.email_send_time is None:
             return False  # no email sent: this is expired
-        now = datetime.datetime.now()
-        expiration_dt = now + datetime.timedelta(hours=timeout_hours)
-        return expiration_dt <= now
+        expiration_dt = self.email_send_time + datetime.timedelta(hours=timeout_hours)
+        return timezone.now() <= expiration_dt
 
-    def send_email(
+    def build_email(
         self,
         site,
         subject_template=DEFAULT_CONFIRM_SUBJECT_TEMPLATE,
         body_template=DEFAULT_CONFIRM_BODY_TEMPLATE,
         extra_email_context=None,
+        now=None,
     ):
         """
-        Note that the templates can be lists, as in render();
-        extra_email_context, if given, should be a dictionary like object.
+        Return the (unsent) confirmation email message.
+        The templates can be names, lists of names (as in render()),
+        or loaded templates, so a batch only loads them once.
         """
-
         timeout_hours = conf.get("verification_timeout")
-        now = datetime.datetime.now()
+        if now is None:
+            now = timezone.now()
         expiration_dt = now + datetime.timedelta(hours=timeout_hours)
-        self.email_send_time = now
 
         if extra_email_context is None:
             extra_email_context = {}
@@ -578,7 +620,7 @@ class EmailConfirmation(PeopleBaseModel):
         context = {"site": site, "expiration_dt": expiration_dt, "verify": self}
         context.update(extra_email_context)
 
-        subject = render_to_string(subject_template, context)
+        subject = load_template(subject_template).render(context)
         # the subject must not contain multiple lines
         subject = " ".join(subject.splitlines())
         # also, trim whitespace:
@@ -586,9 +628,26 @@ class EmailConfirmation(PeopleBaseModel):
         while "  " in subject:
             subject = subject.replace("  ", " ")
 
-        body = render_to_string(body_template, context)
+        body = load_template(body_template).render(context)
+
+        return EmailMessage(subject=subject, body=body, to=[self.email.address])
 
-        email = EmailMessage(subject=subject, body=body, to=[self.email.address])
+    def send_email(
+        self,
+        site,
+        subject_template=DEFAULT_CONFIRM_SUBJECT_TEMPLATE,
+        body_template=DEFAULT_CONFIRM_BODY_TEMPLATE,
+        extra_email_context=None,
+    ):
+        """
+        Note that the templates can be lists, as in render();
+        extra_email_context, if given, should be a dictionary like object.
+        """
+        now = timezone.now()
+        self.email_send_time = now
+        email = self.build_email(
+            site, subject_template, body_template, extra_email_context, now
+        )
         email.send()
         self.save()  # save AFTER the email goes out.
         return True  # email sent!
@@ -5,11 +5,6 @@ e.g., phone numbers, addresses, etc.
 #######################
 from __future__ import print_function, unicode_literals
 
-import operator
-
-#######################
-from functools import reduce
-
 from django.db import models
 
 #######################################################################
@@ -45,6 +40,51 @@ class PersonFlagQuerySet(CustomQuerySet):
 #######################################################################
 
 
+def contact_info_attr(type_):
+    """
+    The attribute ``PersonQuerySet.with_contact_info()`` uses to
+    store the public contact information of type ``type_``
+    (e.g., PhoneNumber) on each person.
+    """
+    return "_public_{}_list".format(type_._meta.model_name)
+
+
+def contact_info_prefetches(prefix="", types=None):
+    """
+    Return a list of Prefetch objects for public contact information.
+    ``prefix`` is the lookup path to the person, e.g., 'person__',
+    when prefetching through another model.
+    """
+    from .models import EmailAddress, PhoneNumber, StreetAddress
+
+    if types is None:
+        types = [PhoneNumber, EmailAddress, StreetAddress]
+    return [
+        models.Prefetch(
+            prefix + type_._meta.get_field("person").remote_field.get_accessor_name(),
+            queryset=type_.objects.public().select_related("type"),
+            to_attr=contact_info_attr(type_),
+        )
+        for type_ in types
+    ]
+
+
+#######################################################################
+
+
+class PermalinkIterable(models.query.ModelIterable):
+    """
+    Yields people with their url attached; see
+    ``PersonQuerySet.with_urls()``.
+    """
+
+    def __iter__(self):
+        from .utils.permalink import attach_urls
+
+        for person in super(PermalinkIterable, self).__iter__():
+            yield attach_urls([person])[0]
+
+
 class PersonQuerySet(CustomQuerySet):
     """
     QuerySet for person records
@@ -53,37 +93,36 @@ class PersonQuerySet(CustomQuerySet):
     def search(self, *criteria):
         """
         Magic search for people.
-        This is heavily modelled after the way the Django Admin handles
-        search queries.
-        See: django.contrib.admin.views.main.py:ChangeList.get_query_set
+        Each whitespace separated term must match one of the name fields;
+        terms may be prefixed with ``^`` (starts with), ``=`` (exact),
+        or ``@`` (full text).
+        The work is done by the configured search backend,
+        see ``people.search`` and the ``search:backend`` setting.
         """
         if len(criteria) == 0:
             assert False, "Supply search criteria"
 
-        search_fields = ["cn", "sn", "given_name"]
-        terms = ["{}".format(c) for c in criteria]
-        if len(terms) == 1:
-            terms = terms[0].split()
-
-        def construct_search(field_name):
-            if field_name.startswith("^"):
-                return "%s__istartswith" % field_name[1:]
-            elif field_name.startswith("="):
-                return "%s__iexact" % field_name[1:]
-            elif field_name.startswith("@"):
-                return "%s__search" % field_name[1:]
-            else:
-                return "%s__icontains" % field_name
-
-        qs = self.filter(active=True)
-        orm_lookups = [
-            construct_search(str(search_field)) for search_field in search_fields
-        ]
-        for bit in terms:
-            or_queries = [models.Q(**{orm_lookup: bit}) for orm_lookup in orm_lookups]
-            qs = qs.filter(reduce(operator.or_, or_queries))
+        from .search import get_backend
 
-        return qs.distinct()
+        return get_backend(self.db).search(self, *criteria)
+
+    def with_contact_info(self, *types):
+        """
+        Prefetch the public contact information (default: phone numbers,
+        email and street addresses) for every person; one query per type.
+        ``person.phone``, ``person.email``, etc. then do not query.
+        """
+        return self.prefetch_related(*contact_info_prefetches(types=types or None))
+
+    def with_urls(self):
+        """
+        Compute ``get_absolute_url()`` for every person as the queryset
+        is evaluated, e.g., for a page of a listing, so templates
+        can use it any number of times.
+        """
+        clone = self._chain()
+        clone._iterable_class = PermalinkIterable
+        return clone
 
 
 ###############################################################
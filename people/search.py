@@ -0,0 +1,391 @@
+"""
+Pluggable search backends for person records.
+
+Backends search the precomputed, normalized ``Person.search_text`` column
+(see ``people.utils.person_search_text``), rather than doing an
+``icontains`` scan over every name field.
+
+The backend is selected with the ``search:backend`` setting; when that is
+``None`` a backend is chosen for the database vendor:
+
+* PostgreSQL: trigram (``pg_trgm``) GIN index, ranked by similarity.
+* SQLite: an FTS5 trigram table, ranked by ``bm25``.
+* Everything else: plain matching against the search column.
+
+Search terms keep the usual admin-style semantics:
+``^term`` (starts with), ``=term`` (exact), ``@term`` (full text/fuzzy);
+anything else is a "contains" match.  Every term must match.
+"""
+#######################
+from __future__ import print_function, unicode_literals
+
+import operator
+from functools import reduce
+from importlib import import_module
+
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
+
+from . import conf
+from .utils import SEARCH_TEXT_SEPARATOR, normalize_search_text, person_search_text
+
+#######################################################################
+
+SEARCH_COLUMN = "search_text"
+SQLITE_FTS_TABLE = "people_person_fts"
+
+# Cache for whether the FTS5 table exists, by database alias.
+_sqlite_fts_available = {}
+
+#######################################################################
+
+
+def split_terms(criteria):
+    """
+    Split search criteria into terms, the same way as
+    ``PersonQuerySet.search`` always has.
+    """
+    if len(criteria) == 0:
+        assert False, "Supply search criteria"
+    terms = ["{}".format(c) for c in criteria]
+    if len(terms) == 1:
+        terms = terms[0].split()
+    return terms
+
+
+def parse_term(term):
+    """
+    Return a (mode, normalized_value) pair for a search term.
+    ``mode`` is one of '^', '=', '@', or '' (contains).
+    """
+    mode = ""
+    if term[:1] in ("^", "=", "@"):
+        mode, term = term[0], term[1:]
+    return mode, normalize_search_text(term)
+
+
+#######################################################################
+
+
+class BaseSearchBackend(object):
+    """
+    Base class for person search backends.
+    """
+
+    def __init__(self, using):
+        self.using = using
+
+    def search(self, queryset, *criteria):
+        """
+        Return ``queryset`` restricted to active people matching
+        the criteria.
+        """
+        raise NotImplementedError
+
+    def update_index(self, pk_list):
+        """
+        Refresh any backend specific index for the given people.
+        """
+
+    def remove_from_index(self, pk_list):
+        """
+        Remove the given people from any backend specific index.
+        """
+
+    def rebuild_index(self):
+        """
+        Rebuild any backend specific index from scratch.
+        """
+
+
+#######################################################################
+
+
+class ORMSearchBackend(BaseSearchBackend):
+    """
+    The original search: an ``OR`` of lookups on each name field,
+    for every term.
+    This is heavily modelled after the way the Django Admin handles
+    search queries.
+    See: django.contrib.admin.views.main.py:ChangeList.get_query_set
+    """
+
+    search_fields = ["cn", "sn", "given_name"]
+
+    def construct_search(self, field_name):
+        if field_name.startswith("^"):
+            return "%s__istartswith" % field_name[1:]
+        elif field_name.startswith("="):
+            return "%s__iexact" % field_name[1:]
+        elif field_name.startswith("@"):
+            return "%s__search" % field_name[1:]
+        else:
+            return "%s__icontains" % field_name
+
+    def search(self, queryset, *criteria):
+        terms = split_terms(criteria)
+        qs = queryset.filter(active=True)
+        orm_lookups = [
+            self.construct_search(str(search_field))
+            for search_field in self.search_fields
+        ]
+        for bit in terms:
+            or_queries = [models.Q(**{orm_lookup: bit}) for orm_lookup in orm_lookups]
+            qs = qs.filter(reduce(operator.or_, or_queries))
+        return qs.distinct()
+
+
+#######################################################################
+
+
+class IndexedSearchBackend(BaseSearchBackend):
+    """
+    Search against the precomputed search column.
+    One lookup per term, no joins, no DISTINCT.
+    """
+
+    def term_filter(self, mode, value):
+        """
+        Return a Q object for a single parsed term.
+        """
+        sep = SEARCH_TEXT_SEPARATOR
+        if mode == "^":
+            value = sep + value
+        elif mode == "=":
+            value = sep + value + sep
+        return models.Q(**{SEARCH_COLUMN + "__contains": value})
+
+    def rank(self, queryset, terms):
+        """
+        Order the results by relevance; the default is no ranking.
+        """
+        return queryset
+
+    def search(self, queryset, *criteria):
+        terms = [parse_term(t) for t in split_terms(criteria)]
+        terms = [(mode, value) for mode, value in terms if value]
+        qs = queryset.filter(active=True)
+        for mode, value in terms:
+            qs = qs.filter(self.term_filter(mode, value))
+        return self.rank(qs, terms)
+
+
+#######################################################################
+
+
+class PostgreSQLSearchBackend(IndexedSearchBackend):
+    """
+    The search column has a ``gin_trgm_ops`` index, which is used
+    for the ``LIKE '%...%'`` queries of every term.
+    ``@term`` is a fuzzy (trigram similarity) match.
+    Results are ranked by trigram similarity to the search terms.
+    """
+
+    similarity_threshold = 0.3
+
+    def search(self, queryset, *criteria):
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        terms = [parse_term(t) for t in split_terms(criteria)]
+        terms = [(mode, value) for mode, value in terms if value]
+        qs = queryset.filter(active=True)
+        for n, (mode, value) in enumerate(terms):
+            if mode == "@":
+                name = "_search_similarity_{}".format(n)
+                qs = qs.annotate(**{name: TrigramSimilarity(SEARCH_COLUMN, value)})
+                qs = qs.filter(**{name + "__gt": self.similarity_threshold})
+            else:
+                qs = qs.filter(self.term_filter(mode, value))
+        return self.rank(qs, terms)
+
+    def rank(self, queryset, terms):
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        if not terms:
+            return queryset
+        text = " ".join([value for mode, value in terms])
+        ordering = queryset.model._meta.ordering
+        queryset = queryset.annotate(search_rank=TrigramSimilarity(SEARCH_COLUMN, text))
+        return queryset.order_by("-search_rank", *ordering)
+
+
+#######################################################################
+
+
+class SQLiteFTSSearchBackend(IndexedSearchBackend):
+    """
+    Uses an FTS5 table with the trigram tokenizer, which supports
+    substring matching for terms of three or more characters.
+    Shorter terms, and the ``^``/``=`` modes, use the search column.
+    Results are ranked by FTS5 ``rank`` (bm25).
+
+    If FTS5 (or the trigram tokenizer) is not available, this behaves
+    exactly as the ``IndexedSearchBackend``.
+    """
+
+    def fts_available(self):
+        if self.using not in _sqlite_fts_available:
+            with connections[self.using].cursor() as cursor:
+                cursor.execute(
+                    "SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name=%s",
+                    [SQLITE_FTS_TABLE],
+                )
+                (count,) = cursor.fetchone()
+            _sqlite_fts_available[self.using] = count > 0
+        return _sqlite_fts_available[self.using]
+
+    def match_expression(self, terms):
+        """
+        Build an FTS5 MATCH expression for the terms the FTS table can handle.
+        """
+        phrases = [
+            '"{}"'.format(value.replace('"', '""'))
+            for mode, value in terms
+            if mode in ("", "@") and len(value) >= 3
+        ]
+        return " AND ".join(phrases)
+
+    def search(self, queryset, *criteria):
+        if not self.fts_available():
+            return super(SQLiteFTSSearchBackend, self).search(queryset, *criteria)
+
+        terms = [parse_term(t) for t in split_terms(criteria)]
+        terms = [(mode, value) for mode, value in terms if value]
+        match = self.match_expression(terms)
+        qs = queryset.filter(active=True)
+        for mode, value in terms:
+            if match and mode in ("", "@") and len(value) >= 3:
+                continue  # handled by the FTS MATCH.
+            qs = qs.filter(self.term_filter(mode, value))
+        if not match:
+            return qs
+
+        table = queryset.model._meta.db_table
+        # Not pk__in=RawSQL(...): that is rendered as "IN ((SELECT ...))",
+        # which SQLite treats as a scalar subquery.
+        qs = qs.extra(
+            where=[
+                "{table}.id IN (SELECT rowid FROM {fts} WHERE {fts} MATCH %s)".format(
+                    fts=SQLITE_FTS_TABLE, table=table
+                )
+            ],
+            params=[match],
+        )
+        qs = qs.annotate(
+            search_rank=RawSQL(
+                "SELECT rank FROM {fts} WHERE {fts} MATCH %s AND rowid = {table}.id".format(
+                    fts=SQLITE_FTS_TABLE, table=table
+                ),
+                [match],
+            )
+        )
+        return qs.order_by("search_rank", *queryset.model._meta.ordering)
+
+    def update_index(self, pk_list):
+        if not pk_list or not self.fts_available():
+            return
+        from .models import Person
+
+        rows = Person.objects.using(self.using).filter(pk__in=pk_list)
+        rows = rows.values_list("pk", SEARCH_COLUMN)
+        with connections[self.using].cursor() as cursor:
+            self._delete_rows(cursor, pk_list)
+            cursor.executemany(
+                "INSERT INTO {} (rowid, search_text) VALUES (%s, %s)".format(
+                    SQLITE_FTS_TABLE
+                ),
+                list(rows),
+            )
+
+    def remove_from_index(self, pk_list):
+        if not pk_list or not self.fts_available():
+            return
+        with connections[self.using].cursor() as cursor:
+            self._delete_rows(cursor, pk_list)
+
+    def rebuild_index(self):
+        if not self.fts_available():
+            return
+        from .models import Person
+
+        table = Person._meta.db_table
+        with connections[self.using].cursor() as cursor:
+            cursor.execute("DELETE FROM {}".format(SQLITE_FTS_TABLE))
+            cursor.execute(
+                "INSERT INTO {} (rowid, search_text) SELECT id, search_text FROM {}".format(
+                    SQLITE_FTS_TABLE, table
+                )
+            )
+
+    def _delete_rows(self, cursor, pk_list):
+        pk_list = list(pk_list)
+        placeholders = ", ".join(["%s"] * len(pk_list))
+        cursor.execute(
+            "DELETE FROM {} WHERE rowid IN ({})".format(SQLITE_FTS_TABLE, placeholders),
+            pk_list,
+        )
+
+
+#######################################################################
+
+VENDOR_BACKENDS = {
+    "postgresql": PostgreSQLSearchBackend,
+    "sqlite": SQLiteFTSSearchBackend,
+}
+
+
+def get_backend_class(using="default"):
+    """
+    Return the configured search backend class.
+    """
+    backend = conf.get("search:backend")
+    if backend is None:
+        vendor = connections[using].vendor
+        return VENDOR_BACKENDS.get(vendor, IndexedSearchBackend)
+    if isinstance(backend, str):
+        mod_name, cls_name = backend.rsplit(".", 1)
+        backend = getattr(import_module(mod_name), cls_name)
+    return backend
+
+
+def get_backend(using="default"):
+    """
+    Return a search backend instance for the given database alias.
+    """
+    return get_backend_class(using)(using)
+
+
+#######################################################################
+
+
+def reindex(queryset=None, batch_size=500):
+    """
+    Recompute the search column for the given people (default: everyone)
+    and refresh the backend index.  Returns the number of people updated.
+    """
+    from .models import Person
+
+    rebuild = queryset is None
+    if queryset is None:
+        queryset = Person.objects.all()
+    n = 0
+    batch = []
+    for person in queryset.only("pk", "cn", "sn", "given_name").iterator():
+        person.search_text = person_search_text(person)
+        batch.append(person)
+        if len(batch) >= batch_size:
+            Person.objects.using(queryset.db).bulk_update(batch, [SEARCH_COLUMN])
+            n += len(batch)
+            batch = []
+    if batch:
+        Person.objects.using(queryset.db).bulk_update(batch, [SEARCH_COLUMN])
+        n += len(batch)
+    backend = get_backend(queryset.db)
+    if rebuild:
+        backend.rebuild_index()
+    else:
+        backend.update_index(list(queryset.values_list("pk", flat=True)))
+    return n
+
+
+#######################################################################
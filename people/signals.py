@@ -0,0 +1,16 @@
+"""
+Signals sent by the people application.
+"""
+#######################
+from __future__ import print_function, unicode_literals
+
+from django.dispatch import Signal
+
+#######################################################################
+
+# Sent after people are deactivated in bulk (QuerySet.update(), which
+#   sends no post_save signals), e.g., by ``people.utils.deactivate``.
+#   ``sender`` is the Person model; ``pk_list`` the people deactivated.
+people_deactivated = Signal(providing_args=["pk_list"])
+
+#######################################################################
@@ -5,9 +5,10 @@ from io import StringIO
 from django.conf import settings
 from django.core.mail import mail_admins
 
-from celery.task import PeriodicTask
+from celery.task import PeriodicTask, Task
 
 from .cli.verify_email_cleanup import main as verify_email_cleanup
+from .utils.deferred import apply as apply_deferred
 
 ###############################################################
 
@@ -40,3 +41,38 @@ class VerifyEmailCleanup(PeriodicTask):
 
 
 ###############################################################
+
+
+class ApplyDeferredSync(Task):
+    """
+    Apply deferred sync signal work; see people.utils.deferred
+    """
+
+    def run(self, applier, keys, **kwargs):
+        apply_deferred(applier, keys)
+
+
+###############################################################
+
+
+class SendConfirmationEmails(Task):
+    """
+    Send email confirmations; see
+    EmailConfirmation.objects.start_verification_bulk()
+    """
+
+    def run(self, pk_list, site_pk, **kwargs):
+        from django.contrib.sites.models import Site
+
+        from .models import EmailConfirmation
+
+        email_kwargs = {
+            k: kwargs[k]
+            for k in ["subject_template", "body_template", "extra_email_context"]
+            if k in kwargs
+        }
+        site = Site.objects.get(pk=site_pk)
+        EmailConfirmation.objects.send_emails(pk_list, site, **email_kwargs)
+
+
+###############################################################
@@ -2,14 +2,26 @@
 Tests for the people application.
 """
 #######################################################################
+import datetime
+import json
+from io import StringIO
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
-from django.db import models
-from django.test import TestCase
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
 
 from . import conf, handlers
-from .models import EmailAddress, Person, PersonFlag
+from .cli import resolve_fields
+from .models import EmailAddress, EmailConfirmation, Person, PersonFlag
+from .signals import people_deactivated
+from .utils import normalize_search_text
+from .utils.deactivate import deactivate_people, deactivation_graph
+from .utils.duplicates import find_duplicates, soundex
+from .utils.export import compile_plan, write_export
+from .utils.merge import damerau_levenshtein_distance, merge_people, merge_people_batch
 
 #######################################################################
 
@@ -746,5 +758,724 @@ class SyncSignals(TestCase):
         user.groups.clear()
         self.assertFalse(person.flags.exists())
 
+    def test_personflag_members_to_user_groups(self):
+        """
+        Changing the people of a flag ==> Change of groups for users.
+        """
+        UserModel = get_user_model()
+        UserModel.objects.create(username="person2")
+        personflag = PersonFlag.objects.get(verbose_name="Test Group")
+        group = Group.objects.get(name="Test Group")
+
+        personflag.person_set.add(self.person1_pk, self.person2_pk, self.person3_pk)
+        self.assertEqual(
+            set(group.user_set.values_list("username", flat=True)),
+            {"user1", "person2"},
+        )
+
+        personflag.person_set.remove(self.person2_pk)
+        self.assertEqual(
+            set(group.user_set.values_list("username", flat=True)), {"user1"}
+        )
+
+        personflag.person_set.clear()
+        self.assertFalse(group.user_set.exists())
+
+    def test_bulk_sync_queries(self):
+        """
+        The sync engine uses a fixed number of queries, however many
+        people change.
+        """
+        from .utils.sync import sync_groups_from_flags
+
+        UserModel = get_user_model()
+        self.unregister_signal_handlers()
+        personflag = PersonFlag.objects.get(verbose_name="Test Group")
+        for n in range(20):
+            username = "bulk{}".format(n)
+            UserModel.objects.create(username=username)
+            person = Person.objects.create(
+                given_name="Bulk", sn="{}".format(n), cn="Bulk", username=username
+            )
+            person.flags.add(personflag)
+
+        with self.assertNumQueries(10):
+            added, removed = sync_groups_from_flags()
+        self.assertEqual((added, removed), (20, 0))
+        group = Group.objects.get(name="Test Group")
+        self.assertEqual(group.user_set.count(), 20)
+
+        personflag.person_set.remove(*Person.objects.filter(sn__in=["0", "1"]))
+        added, removed = sync_groups_from_flags()
+        self.assertEqual((added, removed), (0, 2))
+
+    def test_sync_without_prune(self):
+        """
+        Without ``prune``, the sync engine only adds memberships.
+        """
+        from .utils.sync import sync_flags_from_groups, sync_groups_from_flags
+
+        UserModel = get_user_model()
+        self.unregister_signal_handlers()
+        personflag = PersonFlag.objects.get(verbose_name="Test Group")
+        group = Group.objects.get(name="Test Group")
+        personflag.person_set.add(self.person1_pk)
+        UserModel.objects.create(username="person2").groups.add(group)
+
+        self.assertEqual(sync_flags_from_groups(prune=False), (1, 0))
+        self.assertEqual(
+            set(personflag.person_set.values_list("pk", flat=True)),
+            {self.person1_pk, self.person2_pk},
+        )
+
+        personflag.person_set.remove(self.person2_pk)
+        self.assertEqual(sync_groups_from_flags(prune=False), (1, 0))
+        self.assertEqual(
+            set(group.user_set.values_list("username", flat=True)),
+            {"user1", "person2"},
+        )
+
 
 #######################################################################
+
+
+class PersonSearch(TestCase):
+    """
+    Test the person search backends.
+    """
+
+    def setUp(self):
+        Person.objects.create(given_name="Zoë", sn="Smith", cn="Zoë Smith")
+        Person.objects.create(given_name="John", sn="Smithers", cn="John Smithers")
+        Person.objects.create(given_name="Ann", sn="Jones", cn="Ann Jones")
+        Person.objects.create(
+            given_name="Old", sn="Smith", cn="Old Smith", active=False
+        )
+
+    def _search(self, *criteria):
+        return sorted(Person.objects.search(*criteria).values_list("cn", flat=True))
+
+    def test_search_text_maintained(self):
+        """
+        The search column is normalized and follows name changes.
+        """
+        person = Person.objects.get(cn="Zoë Smith")
+        self.assertEqual(person.search_text, "|zoe smith|smith|zoe|")
+        person.sn = "Smyth"
+        person.cn = "Zoë Smyth"
+        person.save()
+        self.assertEqual(self._search("smyth"), ["Zoë Smyth"])
+        self.assertEqual(self._search("smith"), ["John Smithers"])
+
+    def test_search_contains(self):
+        """
+        Every term must match; inactive people are never returned.
+        """
+        self.assertEqual(self._search("smith"), ["John Smithers", "Zoë Smith"])
+        self.assertEqual(self._search("smith zo"), ["Zoë Smith"])
+        self.assertEqual(self._search("smith", "john"), ["John Smithers"])
+        self.assertEqual(self._search("nobody"), [])
+
+    def test_search_accents(self):
+        """
+        Search is accent and case insensitive.
+        """
+        self.assertEqual(self._search("ZOE"), ["Zoë Smith"])
+        self.assertEqual(self._search("zoë"), ["Zoë Smith"])
+
+    def test_search_modes(self):
+        """
+        ^ (starts with) and = (exact) modifiers.
+        """
+        self.assertEqual(self._search("^smi"), ["John Smithers", "Zoë Smith"])
+        self.assertEqual(self._search("^mith"), [])
+        self.assertEqual(self._search("=smith"), ["Zoë Smith"])
+
+    def test_search_deleted(self):
+        """
+        Deleted people are removed from the index.
+        """
+        Person.objects.filter(cn="Zoë Smith").delete()
+        self.assertEqual(self._search("smith"), ["John Smithers"])
+
+    def test_orm_backend(self):
+        """
+        The original backend gives the same results.
+        """
+        conf.set("search:backend", "people.search.ORMSearchBackend")
+        try:
+            self.assertEqual(self._search("smith"), ["John Smithers", "Zoë Smith"])
+            self.assertEqual(self._search("smith", "john"), ["John Smithers"])
+        finally:
+            conf.set("search:backend", None)
+
+
+#######################################################################
+
+
+class ContactInfoAccessors(TestCase):
+    """
+    Test that contact information accessors use prefetched data.
+    """
+
+    def setUp(self):
+        ci_type = conf.get("default_contact_info_type")
+        for n in range(3):
+            person = Person.objects.create(
+                given_name="Given{}".format(n),
+                sn="Person",
+                cn="Given{} Person".format(n),
+            )
+            person.add_email("hidden{}@example.com".format(n), ci_type)
+            person.add_email(
+                "public{}@example.com".format(n), ci_type, preferred=True, public=True
+            )
+            person.add_phone("+1204555010{}".format(n), ci_type)
+
+    def test_contact_info_no_prefetch(self):
+        """
+        Without prefetching, only public information is returned.
+        """
+        person = Person.objects.get(given_name="Given0")
+        self.assertEqual(person.email.address, "public0@example.com")
+        self.assertIsNone(person.phone)
+
+    def test_with_contact_info(self):
+        """
+        with_contact_info() loads a whole list in a constant number of queries.
+        """
+        with self.assertNumQueries(4):
+            people = list(Person.objects.with_contact_info())
+            emails = [p.email.address for p in people]
+            phones = [p.phone for p in people]
+            addresses = [p.address for p in people]
+        self.assertEqual(emails, ["public{}@example.com".format(n) for n in range(3)])
+        self.assertEqual(phones, [None, None, None])
+        self.assertEqual(addresses, [None, None, None])
+
+        ci_type = conf.get("default_contact_info_type")
+        with self.assertNumQueries(0):
+            emails = [p.get_email_address(ci_type) for p in people]
+        self.assertEqual(emails[0].address, "public0@example.com")
+        with self.assertNumQueries(0):
+            self.assertIsNone(people[0].get_email_address("no-such-type"))
+
+    def test_prefetch_related(self):
+        """
+        A plain prefetch_related() of the reverse relation is also used.
+        """
+        with self.assertNumQueries(2):
+            people = list(Person.objects.prefetch_related("emailaddress_set"))
+            emails = [p.email.address for p in people]
+        self.assertEqual(emails, ["public{}@example.com".format(n) for n in range(3)])
+
+
+#######################################################################
+
+
+class DeferredSync(TransactionTestCase):
+    """
+    Test the deferred (on commit) sync signal mode.
+    """
+
+    def setUp(self):
+        conf.set("signals:deferred", "on_commit")
+        UserModel = get_user_model()
+        self.handlers = [
+            (models.signals.post_save, handlers.person_post_save_name_to_user, Person),
+            (
+                models.signals.pre_save,
+                handlers.personflag_pre_save_to_group,
+                PersonFlag,
+            ),
+            (
+                models.signals.m2m_changed,
+                handlers.person_flags_m2m_changed_handler,
+                Person.flags.through,
+            ),
+        ]
+        for signal, handler, sender in self.handlers:
+            signal.connect(handler, sender=sender)
+        for n in range(5):
+            username = "user{}".format(n)
+            UserModel.objects.create(username=username)
+            Person.objects.create(
+                given_name="Given", sn="{}".format(n), cn="Given", username=username
+            )
+        PersonFlag.objects.create(verbose_name="Test Group", slug="test-group")
+
+    def tearDown(self):
+        conf.set("signals:deferred", None)
+        for signal, handler, sender in self.handlers:
+            signal.disconnect(handler, sender=sender)
+
+    def test_flags_to_groups_on_commit(self):
+        """
+        Flag changes are applied to groups once, when the transaction commits.
+        """
+        personflag = PersonFlag.objects.get(slug="test-group")
+        group = Group.objects.get(name="Test Group")
+        with transaction.atomic():
+            for person in Person.objects.all():
+                person.flags.add(personflag)
+            self.assertFalse(group.user_set.exists())
+        self.assertEqual(group.user_set.count(), 5)
+
+        with transaction.atomic():
+            personflag.person_set.remove(*Person.objects.filter(sn__in=["0", "1"]))
+            self.assertEqual(group.user_set.count(), 5)
+        self.assertEqual(group.user_set.count(), 3)
+
+    def test_rollback(self):
+        """
+        Nothing is applied when the transaction is rolled back.
+        """
+        personflag = PersonFlag.objects.get(slug="test-group")
+        try:
+            with transaction.atomic():
+                Person.objects.get(sn="0").flags.add(personflag)
+                raise ValueError
+        except ValueError:
+            pass
+        with transaction.atomic():
+            Person.objects.get(sn="1").flags.add(personflag)
+        group = Group.objects.get(name="Test Group")
+        self.assertEqual(
+            list(group.user_set.values_list("username", flat=True)), ["user1"]
+        )
+
+    def test_savepoint_rollback(self):
+        """
+        Changes after a rolled back savepoint are still applied.
+        """
+        personflag = PersonFlag.objects.get(slug="test-group")
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    Person.objects.get(sn="0").flags.add(personflag)
+                    raise ValueError
+            except ValueError:
+                pass
+            Person.objects.get(sn="1").flags.add(personflag)
+        group = Group.objects.get(name="Test Group")
+        self.assertEqual(
+            list(group.user_set.values_list("username", flat=True)), ["user1"]
+        )
+
+    def test_only_changed_flags(self):
+        """
+        Only the changed flags are synchronized, as in immediate mode.
+        """
+        PersonFlag.objects.create(verbose_name="Other Group", slug="other-group")
+        user = get_user_model().objects.get(username="user0")
+        user.groups.add(Group.objects.get(name="Other Group"))
+        with transaction.atomic():
+            Person.objects.get(sn="0").flags.add(
+                PersonFlag.objects.get(slug="test-group")
+            )
+        self.assertEqual(
+            sorted(user.groups.values_list("name", flat=True)),
+            ["Other Group", "Test Group"],
+        )
+
+    def test_name_to_user_on_commit(self):
+        """
+        Person name changes are applied to users on commit.
+        """
+        with transaction.atomic():
+            person = Person.objects.get(username="user0")
+            person.given_name = "Changed"
+            person.save()
+            person.sn = "Name"
+            person.save()
+        user = get_user_model().objects.get(username="user0")
+        self.assertEqual((user.first_name, user.last_name), ("Changed", "Name"))
+
+
+#######################################################################
+
+
+#######################################################################
+
+
+class Export(TestCase):
+    """
+    Test the streaming export engine used by ``people list``.
+    """
+
+    field_list = [
+        "emailaddress_set.active.0",
+        "email",
+        "flags.all.0.slug",
+        "emailaddress_set.active.1",
+    ]
+
+    def setUp(self):
+        flag = PersonFlag.objects.create(slug="alumni", verbose_name="Alumni")
+        for n in range(7):
+            person = Person.objects.create(
+                cn="Person {}".format(n), sn="Person", given_name="{}".format(n)
+            )
+            person.add_email("p{}@example.com".format(n), "work", public=True)
+            person.flags.add(flag)
+
+    def test_plan(self):
+        plan = compile_plan(Person, self.field_list)
+        self.assertEqual(
+            plan.paths,
+            ["_export_0.0", "email", "_export_1.0.slug", "_export_0.1"],
+        )
+        self.assertEqual(len(plan.prefetch_related), 3)
+
+    def test_bounded_queries(self):
+        """
+        The number of queries depends on the number of chunks, not people.
+        """
+        queryset = Person.objects.active().filter(flags__slug__in=["alumni"])
+        expected = [
+            "\t".join(
+                ["{}".format(p.pk), "{}".format(p)]
+                + list(resolve_fields(p, self.field_list))
+            )
+            for p in queryset
+        ]
+        output = StringIO()
+        # pks, then 2 chunks of: people, emails, flags, public emails.
+        with self.assertNumQueries(9):
+            n, elapsed = write_export(
+                queryset, self.field_list, stream=output, chunk_size=4
+            )
+        self.assertEqual(n, 7)
+        self.assertEqual(output.getvalue().splitlines(), expected)
+
+    def test_jsonl(self):
+        output = StringIO()
+        write_export(Person.objects.all(), ["email"], "jsonl", stream=output)
+        rows = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(rows[0]["email"], "p0@example.com")
+        self.assertEqual(set(rows[0]), set(["pk", "object", "email"]))
+
+
+#######################################################################
+
+
+class Duplicates(TestCase):
+    """
+    Test the edit distance and duplicate detection.
+    """
+
+    def test_distance(self):
+        self.assertEqual(damerau_levenshtein_distance("", ""), 0)
+        self.assertEqual(damerau_levenshtein_distance("abc", ""), 3)
+        self.assertEqual(damerau_levenshtein_distance("smith", "smtih"), 1)
+        self.assertEqual(damerau_levenshtein_distance("kitten", "sitting"), 3)
+        self.assertEqual(damerau_levenshtein_distance("ca", "abc"), 3)
+        self.assertEqual(damerau_levenshtein_distance("kitten", "sitting", 1), 2)
+        self.assertEqual(damerau_levenshtein_distance("a", "abcdef", 2), 3)
+
+    def test_soundex(self):
+        self.assertEqual(soundex("robert"), "r163")
+        self.assertEqual(soundex("rupert"), "r163")
+        self.assertEqual(soundex("ashcraft"), "a261")
+        self.assertEqual(soundex("tymczak"), "t522")
+
+    def test_find_duplicates(self):
+        def person(cn, given_name, sn, email=None):
+            p = Person.objects.create(cn=cn, given_name=given_name, sn=sn)
+            if email:
+                p.add_email(email, "work")
+            return p
+
+        jon = person("Jon Smith", "Jon", "Smith")
+        john = person("John Smyth", "John", "Smyth")
+        person("Alice Smith", "Alice", "Smith")
+        mary = person("Mary Jones", "Mary", "Jones", "mjones@example.com")
+        marie = person("Marie Jones", "Marie", "", "MJones@example.com")
+
+        with self.assertNumQueries(3):
+            suggestions = find_duplicates()
+        self.assertEqual(
+            [(s["dst"], s["src"], s["reasons"]) for s in suggestions],
+            [(mary.pk, marie.pk, ["address"]), (jon.pk, john.pk, ["name"])],
+        )
+        self.assertEqual(find_duplicates(threshold=0.1), [])
+
+
+#######################################################################
+
+
+class MergePeople(TestCase):
+    """
+    Test merging person records.
+    """
+
+    def setUp(self):
+        self.flags = [
+            PersonFlag.objects.create(
+                slug="f{}".format(n), verbose_name="F{}".format(n)
+            )
+            for n in range(3)
+        ]
+        self.dst = Person.objects.create(cn="Jon Smith", given_name="Jon", sn="Smith")
+        self.src = Person.objects.create(
+            cn="John Smith", given_name="John", sn="Smith", title="Dr."
+        )
+        self.dst.add_email("jon@example.com", "work")
+        self.src.add_email("jon@example.com", "work")
+        self.src.add_email("john@example.com", "home")
+        self.dst.flags.add(self.flags[0], self.flags[1])
+        self.src.flags.add(self.flags[1], self.flags[2])
+
+    def test_merge(self):
+        plan = merge_people(self.dst.pk, self.src.pk)
+        self.assertEqual(
+            sorted([(p.model._meta.model_name, len(p.duplicate_pks)) for p in plan]),
+            [("emailaddress", 1), ("person_flags", 1)],
+        )
+        self.assertFalse(Person.objects.filter(pk=self.src.pk).exists())
+        dst = Person.objects.get(pk=self.dst.pk)
+        self.assertEqual(dst.title, "Dr.")
+        self.assertEqual(
+            sorted(dst.emailaddress_set.values_list("address", flat=True)),
+            ["john@example.com", "jon@example.com"],
+        )
+        self.assertEqual(
+            sorted(dst.flags.values_list("slug", flat=True)), ["f0", "f1", "f2"]
+        )
+
+    def test_dry_run(self):
+        merge_people(self.dst.pk, self.src.pk, commit=False)
+        self.assertEqual(self.src.emailaddress_set.count(), 2)
+        self.assertTrue(Person.objects.filter(pk=self.src.pk).exists())
+
+    def test_batch(self):
+        other = Person.objects.create(cn="Jonn Smith", given_name="Jonn", sn="Smith")
+        other.add_email("jon@example.com", "work")
+        stranger = Person.objects.create(
+            cn="Alice Jones", given_name="Alice", sn="Jones"
+        )
+        results = merge_people_batch(
+            [
+                (self.dst.pk, self.src.pk),
+                (self.src.pk, other.pk),  # src was merged into dst
+                (self.dst.pk, stranger.pk),
+            ]
+        )
+        self.assertEqual(
+            [(dst, src, error is None) for dst, src, error in results],
+            [
+                (self.dst.pk, self.src.pk, True),
+                (self.dst.pk, other.pk, True),
+                (self.dst.pk, stranger.pk, False),
+            ],
+        )
+        self.assertEqual(
+            list(Person.objects.order_by("pk").values_list("pk", flat=True)),
+            [self.dst.pk, stranger.pk],
+        )
+        self.assertEqual(self.dst.emailaddress_set.count(), 2)
+
+
+#######################################################################
+
+
+class DeactivatePeople(TestCase):
+    """
+    Test the bulk cascade deactivation of people.
+    """
+
+    def setUp(self):
+        flag = PersonFlag.objects.create(slug="graduated", verbose_name="Graduated")
+        for n in range(5):
+            person = Person.objects.create(
+                cn="Grad {}".format(n), given_name="Grad", sn="{}".format(n)
+            )
+            person.add_email("grad{}@example.com".format(n), "work")
+            person.add_phone("+1204555010{}".format(n), "work")
+            if n < 3:
+                person.flags.add(flag)
+
+    def test_graph(self):
+        graph = dict(
+            [(model._meta.model_name, lookup) for model, lookup in deactivation_graph()]
+        )
+        self.assertEqual(graph["emailaddress"], "person")
+        self.assertEqual(graph["emailconfirmation"], "email__person")
+        self.assertNotIn("personflag", graph)
+
+    def test_deactivate(self):
+        queryset = Person.objects.active().filter(flags__slug="graduated")
+        plan = dict(deactivate_people(queryset, dry_run=True))
+        self.assertEqual(plan[Person], 3)
+        self.assertEqual(plan[EmailAddress], 3)
+        self.assertEqual(Person.objects.active().count(), 5)
+
+        received = []
+
+        def receiver(sender, pk_list, **kwargs):
+            received.extend(pk_list)
+
+        people_deactivated.connect(receiver)
+        try:
+            results = dict(deactivate_people(queryset))
+        finally:
+            people_deactivated.disconnect(receiver)
+        self.assertEqual(results[Person], 3)
+        self.assertEqual(results[EmailAddress], 3)
+        self.assertEqual(len(received), 3)
+        self.assertEqual(
+            sorted(Person.objects.active().values_list("cn", flat=True)),
+            ["Grad 3", "Grad 4"],
+        )
+        self.assertEqual(EmailAddress.objects.filter(active=True).count(), 2)
+        self.assertEqual(dict(deactivate_people(queryset))[Person], 0)
+
+
+#######################################################################
+
+
+class EmailConfirmationExpiry(TestCase):
+    """
+    Test the expired email confirmation sweep.
+    """
+
+    def confirmation(self, n, hours_ago, delete_unverified=False, verified=False):
+        person = Person.objects.create(
+            cn="Person {}".format(n), given_name="Person", sn="{}".format(n)
+        )
+        email = person.add_email("p{}@example.com".format(n), "work")
+        send_time = None
+        if hours_ago is not None:
+            send_time = timezone.now() - datetime.timedelta(hours=hours_ago)
+        return EmailConfirmation.objects.create(
+            email=email,
+            key=EmailConfirmation.VERIFIED if verified else "k{}".format(n),
+            email_send_time=send_time,
+            delete_unverified=delete_unverified,
+        )
+
+    def test_delete_expired(self):
+        timeout = conf.get("verification_timeout")
+        recent = self.confirmation(0, 1, delete_unverified=True)
+        self.confirmation(1, timeout + 1)
+        self.confirmation(2, timeout + 1, delete_unverified=True)
+        self.confirmation(3, timeout + 1, delete_unverified=True, verified=True)
+        never = self.confirmation(4, None, delete_unverified=True)
+        self.assertTrue(recent.is_valid())
+        self.assertFalse(never.is_valid())
+
+        counts = EmailConfirmation.objects.delete_expired(chunk_size=2)
+        self.assertEqual(counts["people.EmailConfirmation"], 3)
+        self.assertEqual(counts["people.Person"], 1)
+        self.assertEqual(
+            sorted(Person.objects.values_list("cn", flat=True)),
+            ["Person 0", "Person 1", "Person 3", "Person 4"],
+        )
+        self.assertEqual(
+            sorted(EmailConfirmation.objects.values_list("pk", flat=True)),
+            [recent.pk, never.pk],
+        )
+        self.assertEqual(EmailConfirmation.objects.delete_expired(), {})
+
+
+@override_settings(ROOT_URLCONF="people.urls")
+class BulkVerification(TestCase):
+    """
+    Test sending email confirmations in bulk.
+    """
+
+    def setUp(self):
+        self.emails = []
+        for n in range(3):
+            person = Person.objects.create(
+                cn="Person {}".format(n), given_name="Given{}".format(n), sn="Sn"
+            )
+            self.emails.append(person.add_email("bulk{}@example.com".format(n), "work"))
+
+    def test_start_verification_bulk(self):
+        from django.core import mail
+
+        email_qs = EmailAddress.objects.filter(address__startswith="bulk")
+        with self.assertNumQueries(7):
+            pk_list = EmailConfirmation.objects.start_verification_bulk(
+                email_qs, use_celery=False
+            )
+        self.assertEqual(len(pk_list), 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(
+            sorted([m.to[0] for m in mail.outbox]),
+            ["bulk0@example.com", "bulk1@example.com", "bulk2@example.com"],
+        )
+        for verification in EmailConfirmation.objects.filter(pk__in=pk_list):
+            self.assertIsNotNone(verification.email_send_time)
+            self.assertTrue(verification.is_valid())
+            message = [m for m in mail.outbox if m.to == [verification.email.address]]
+            self.assertIn(verification.key, message[0].body)
+            self.assertIn(verification.email.person.given_name, message[0].body)
+
+        # existing confirmations are reused; verified ones are not sent.
+        EmailConfirmation.objects.get(pk=pk_list[0]).set_verified()
+        again = EmailConfirmation.objects.start_verification_bulk(
+            email_qs, use_celery=False
+        )
+        self.assertEqual(again, pk_list)
+        self.assertEqual(len(mail.outbox), 5)
+
+
+def _permalink_args(person):
+    return [person.pk] if person.slug else None
+
+
+@override_settings(
+    ROOT_URLCONF="people.urls",
+    PEOPLE_CONFIG={"permalink": ("people-admin-person-detail", _permalink_args)},
+)
+class Permalinks(TestCase):
+    """
+    Test the compiled person permalinks.
+    """
+
+    def setUp(self):
+        for n in range(3):
+            Person.objects.create(
+                cn="Link {}".format(n), given_name="Link", sn="{}".format(n)
+            )
+
+    def test_compile_permalink(self):
+        from .utils import permalink
+
+        self.assertIsNone(permalink.compile_permalink(None))
+        self.assertEqual(
+            permalink.compile_permalink("people.utils.normalize_search_text"),
+            normalize_search_text,
+        )
+        self.assertEqual(permalink.compile_permalink(len), len)
+        with self.assertRaises(ImproperlyConfigured):
+            permalink.compile_permalink(42)
+        f = permalink.compile_permalink(
+            ["people-admin-person-detail", "people.tests._permalink_args"]
+        )
+        person = Person.objects.first()
+        self.assertEqual(f(person), "/_detail/{}/".format(person.pk))
+
+    def test_with_urls(self):
+        from .utils import permalink
+
+        people = list(Person.objects.order_by("pk").with_urls())
+        for person in people:
+            self.assertEqual(
+                permalink.resolve(person), "/_detail/{}/".format(person.pk)
+            )
+        with self.assertNumQueries(0):
+            for person in people:
+                permalink.resolve(person)
+        person = Person.objects.with_urls().get(pk=people[0].pk)
+        self.assertEqual(permalink.resolve(person), "/_detail/{}/".format(person.pk))
+
+    def test_settings_changed(self):
+        from .utils import permalink
+
+        person = Person.objects.first()
+        with self.settings(PEOPLE_CONFIG={"permalink": None}):
+            self.assertIsNone(permalink.resolve(person))
+        self.assertEqual(permalink.resolve(person), "/_detail/{}/".format(person.pk))
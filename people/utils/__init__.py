@@ -4,6 +4,8 @@ Some utility functions for the people application.
 #######################
 from __future__ import print_function, unicode_literals
 
+import unicodedata
+
 from django.contrib.auth import get_user_model
 
 from .. import conf
@@ -15,6 +17,10 @@ from .. import conf
 SN_BIAS = conf.get("name_guess:sn_bias")
 SN_MARK_LIST = conf.get("name_guess:sn_mark_list")
 
+# The fields (in order) which make up the precomputed person search text.
+SEARCH_TEXT_FIELDS = ["cn", "sn", "given_name"]
+SEARCH_TEXT_SEPARATOR = "|"
+
 #######################################################################
 
 
@@ -148,7 +154,7 @@ def person2user_name(person, user):
 
 def person2user_email(person, user):
     """
-    Given a person and a user object, apply the person preferred email 
+    Given a person and a user object, apply the person preferred email
     address to the user.
     """
 
@@ -199,3 +205,38 @@ def user2person_name(person, user):
 
 
 ################################################################
+
+
+def normalize_search_text(value):
+    """
+    Normalize a string for searching: accents are stripped, the
+    result is case folded, and whitespace is collapsed.
+    The search separator is never part of a normalized value.
+    """
+    if value is None:
+        return ""
+    value = unicodedata.normalize("NFKD", "{}".format(value))
+    value = "".join([c for c in value if not unicodedata.combining(c)])
+    value = value.replace(SEARCH_TEXT_SEPARATOR, " ")
+    return " ".join(value.casefold().split())
+
+
+################################################################
+
+
+def person_search_text(person):
+    """
+    Compute the precomputed search text for a person.
+    Each name field is normalized and bracketed by the search separator,
+    e.g., ``|jane q. doe|doe|jane q.|``, which allows "starts with"
+    and "exact" term matching against a single column.
+    """
+    values = [
+        normalize_search_text(getattr(person, field_name, ""))
+        for field_name in SEARCH_TEXT_FIELDS
+    ]
+    sep = SEARCH_TEXT_SEPARATOR
+    return sep + sep.join(values) + sep
+
+
+################################################################
@@ -0,0 +1,103 @@
+"""
+Cascade deactivation of people.
+
+The models which refer to a person (directly, or through other
+models, e.g., an email confirmation through its email address) and
+have an ``active`` field are found from the model metadata, once.
+Each of them is then deactivated with a single ``QuerySet.update()``,
+for any number of people.
+"""
+#######################
+from __future__ import print_function, unicode_literals
+
+from django.db import transaction
+from django.utils.timezone import now
+
+from ..signals import people_deactivated
+
+BATCH_SIZE = 500
+
+#######################################################################
+
+
+def _has_field(model, name):
+    return name in [f.name for f in model._meta.concrete_fields]
+
+
+def deactivation_graph(model=None):
+    """
+    Return a list of (model, lookup) pairs, for the models which should
+    be deactivated with ``model`` (default: Person); ``lookup`` is the
+    query lookup from the model to ``model``, e.g., ``email__person``.
+    Models are found through reverse foreign key (and one-to-one)
+    relations only: many-to-many related objects are shared.
+    """
+    if model is None:
+        from ..models import Person
+
+        model = Person
+
+    graph = []
+    pending = [(model, "", (model,))]
+    while pending:
+        parent, prefix, path = pending.pop(0)
+        for rel in parent._meta.related_objects:
+            if not (rel.one_to_many or rel.one_to_one):
+                continue
+            child = rel.related_model
+            if child in path or not _has_field(child, "active"):
+                continue
+            lookup = rel.field.name + ("__" + prefix if prefix else "")
+            graph.append((child, lookup))
+            pending.append((child, lookup, path + (child,)))
+    return graph
+
+
+def plan_deactivation(person_qs):
+    """
+    Return a list of (model, queryset) of the active objects which would
+    be deactivated with the people in ``person_qs`` (the people first).
+    """
+    plan = [(person_qs.model, person_qs.filter(active=True))]
+    for model, lookup in deactivation_graph(person_qs.model):
+        queryset = model._base_manager.filter(
+            **{lookup + "__in": person_qs.values("pk")}
+        )
+        plan.append((model, queryset.filter(active=True)))
+    return plan
+
+
+def deactivate_people(person_qs, dry_run=False):
+    """
+    Deactivate the people in ``person_qs``, and everything that refers
+    to them, with one update per model.
+    Returns a list of (model, number deactivated) pairs; with
+    ``dry_run`` the numbers that would be deactivated.
+    """
+    plan = plan_deactivation(person_qs)
+    if dry_run:
+        return [(model, queryset.count()) for model, queryset in plan]
+
+    timestamp = now()
+    results = []
+    with transaction.atomic():
+        pk_list = list(plan[0][1].values_list("pk", flat=True))
+        # dependent objects first: their querysets select through the people.
+        for model, queryset in reversed(plan[1:]):
+            values = {"active": False}
+            if _has_field(model, "modified"):
+                values["modified"] = timestamp
+            results.insert(0, (model, queryset.update(**values)))
+        # by pk: some databases cannot update a table selected in a subquery.
+        manager = person_qs.model._base_manager
+        for start in range(0, len(pk_list), BATCH_SIZE):
+            manager.filter(pk__in=pk_list[start : start + BATCH_SIZE]).update(
+                active=False, modified=timestamp
+            )
+        results.insert(0, (person_qs.model, len(pk_list)))
+        if pk_list:
+            people_deactivated.send(sender=person_qs.model, pk_list=pk_list)
+    return results
+
+
+#######################################################################
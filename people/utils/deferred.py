@@ -0,0 +1,97 @@
+"""
+Deferred, transaction-batched signal processing.
+
+When the ``signals:deferred`` setting is ``"on_commit"`` (or ``"celery"``),
+sync signal handlers do not do their work immediately.  Instead they
+record the keys (e.g., person pks) that need synchronizing, in a buffer
+for the current transaction.  When the transaction commits the buffer is
+coalesced, and each "applier" is called once with all of its keys;
+or, with ``"celery"``, the appliers are run by a celery task.
+
+An applier is the dotted path of a function taking a list of keys,
+which brings those keys up to date from the current database state,
+e.g., ``people.utils.sync.sync_users_from_people``.  Since appliers
+reconcile state, applying a key more than once is harmless.
+
+Outside of a transaction, on_commit runs immediately, so each
+change is applied as it happens.
+"""
+#######################
+from __future__ import print_function, unicode_literals
+
+from importlib import import_module
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .. import conf
+
+#######################################################################
+
+
+def is_deferred():
+    """
+    Should sync signal handlers defer their work?
+    """
+    return conf.get("signals:deferred") in ("on_commit", "celery")
+
+
+def defer(applier, keys, using=None):
+    """
+    Record ``keys`` as dirty for ``applier`` in the current transaction.
+
+    The buffer is kept on the connection; every call registers an
+    on_commit flush of it, so that it is flushed even when the block in
+    which it was first scheduled rolls back to a savepoint.  The first
+    flush to run takes the whole buffer; the rest find nothing to do.
+    (Keys left by a transaction which rolled back are flushed with the
+    next one, which is harmless: appliers reconcile.)
+    """
+    if using is None:
+        using = DEFAULT_DB_ALIAS
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        # anything buffered was left by a rolled back transaction.
+        connection._people_deferred_sync = None
+        flush({applier: set(keys)})
+        return
+
+    buffer = getattr(connection, "_people_deferred_sync", None)
+    if buffer is None:
+        buffer = connection._people_deferred_sync = {}
+    buffer.setdefault(applier, set()).update(keys)
+
+    def callback():
+        pending = getattr(connection, "_people_deferred_sync", None)
+        connection._people_deferred_sync = None
+        if pending:
+            flush(pending)
+
+    transaction.on_commit(callback, using=using)
+
+
+def flush(buffer):
+    """
+    Apply (or hand to celery) a coalesced buffer: {applier: set(keys)}
+    """
+    for applier, keys in buffer.items():
+        keys = sorted(keys)
+        if not keys:
+            continue
+        if conf.get("signals:deferred") == "celery":
+            from ..tasks import ApplyDeferredSync
+
+            ApplyDeferredSync.delay(applier, keys)
+        else:
+            apply(applier, keys)
+
+
+def apply(applier, keys):
+    """
+    Run an applier (a dotted path) for the keys.
+    """
+    mod_name, f_name = applier.rsplit(".", 1)
+    func = getattr(import_module(mod_name), f_name)
+    return func(keys)
+
+
+#######################################################################
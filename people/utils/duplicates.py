@@ -0,0 +1,163 @@
+"""
+Find (probable) duplicate person records.
+
+Rather than comparing every pair of people, people are grouped into
+"blocks" which likely duplicates share:
+
+* the phonetic (Soundex) key of the normalized surname,
+  and the initial of the given name;
+* an email address;
+* a phone number.
+
+Only pairs within a block are scored, with the (early exit)
+Damerau-Levenshtein distance between the normalized common names;
+see ``merge.name_check``.  Every table is read once.
+"""
+#######################
+from __future__ import print_function, unicode_literals
+
+from itertools import combinations
+
+from . import normalize_search_text
+from .merge import name_difference
+
+#######################################################################
+
+SOUNDEX_CODES = {}
+for _letters, _code in [
+    ("bfpv", "1"),
+    ("cgjkqsxz", "2"),
+    ("dt", "3"),
+    ("l", "4"),
+    ("mn", "5"),
+    ("r", "6"),
+]:
+    for _c in _letters:
+        SOUNDEX_CODES[_c] = _code
+
+#######################################################################
+
+
+def soundex(value):
+    """
+    The (American) Soundex code of a normalized value, e.g.,
+    ``soundex("robert") == "r163"``; "" if there are no letters.
+    """
+    letters = [c for c in value if "a" <= c <= "z"]
+    if not letters:
+        return ""
+    result = letters[0]
+    last = SOUNDEX_CODES.get(letters[0], "")
+    for c in letters[1:]:
+        code = SOUNDEX_CODES.get(c, "")
+        if code and code != last:
+            result += code
+        if c not in "hw":  # h and w do not separate equal codes.
+            last = code
+    return (result + "000")[:4]
+
+
+def name_block_key(sn, given_name):
+    """
+    The name block for a person: the Soundex of the surname,
+    and the given name initial.
+    """
+    sn = normalize_search_text(sn)
+    if not sn:
+        return None
+    given_name = normalize_search_text(given_name)
+    return "name:{}:{}".format(soundex(sn), given_name[:1])
+
+
+#######################################################################
+
+
+def find_blocks(queryset=None, names=None):
+    """
+    Return a dictionary {block key: set(person pks)} for the people in
+    queryset (default: all active people).
+    If given, the dictionary ``names`` is filled with {pk: cn}.
+    Three queries: people, email addresses, phone numbers.
+    """
+    from ..models import EmailAddress, Person, PhoneNumber
+
+    if queryset is None:
+        queryset = Person.objects.active()
+    blocks = {}
+    pk_set = set()
+    rows = queryset.order_by().values_list("pk", "cn", "sn", "given_name")
+    for pk, cn, sn, given_name in rows.iterator():
+        pk_set.add(pk)
+        if names is not None:
+            names[pk] = cn
+        key = name_block_key(sn, given_name)
+        if key is not None:
+            blocks.setdefault(key, set()).add(pk)
+    for model, field in [(EmailAddress, "address"), (PhoneNumber, "number")]:
+        rows = model.objects.filter(active=True, person__in=queryset)
+        for person_pk, value in rows.values_list("person", field).iterator():
+            value = "{}".format(value).strip().lower()
+            if value and person_pk in pk_set:
+                key = "{}:{}".format(field, value)
+                blocks.setdefault(key, set()).add(person_pk)
+    return blocks
+
+
+def candidate_pairs(blocks, max_block_size=None):
+    """
+    Return a dictionary {(pk1, pk2): set(block kinds)}, pk1 < pk2,
+    of the pairs of people which share a block.
+    Blocks larger than ``max_block_size`` are skipped.
+    """
+    pairs = {}
+    for key, pk_set in blocks.items():
+        if len(pk_set) < 2:
+            continue
+        if max_block_size is not None and len(pk_set) > max_block_size:
+            continue
+        kind = key.split(":", 1)[0]
+        for pair in combinations(sorted(pk_set), 2):
+            pairs.setdefault(pair, set()).add(kind)
+    return pairs
+
+
+def find_duplicates(queryset=None, threshold=0.35, max_block_size=None):
+    """
+    Score the candidate pairs, and return a list of merge suggestions
+    (dictionaries), best first:
+    ``dst`` and ``src`` person pks (the older record is kept),
+    their common names, the name ``difference`` and the shared blocks
+    (``reasons``).
+    A pair is suggested when the name difference is at most
+    ``threshold`` (the ``merge_people`` sanity check).
+    """
+    names = {}
+    pairs = candidate_pairs(find_blocks(queryset, names), max_block_size)
+    normalized = {}
+
+    suggestions = []
+    for (pk1, pk2), reasons in pairs.items():
+        cn1, cn2 = names[pk1], names[pk2]
+        for cn in (cn1, cn2):
+            if cn not in normalized:
+                normalized[cn] = normalize_search_text(cn)
+        difference = name_difference(normalized[cn1], normalized[cn2], threshold)
+        if difference > threshold:
+            continue
+        suggestions.append(
+            {
+                "dst": pk1,
+                "src": pk2,
+                "dst_cn": cn1,
+                "src_cn": cn2,
+                "difference": difference,
+                "reasons": sorted(reasons),
+            }
+        )
+    suggestions.sort(
+        key=lambda s: (-len(s["reasons"]), s["difference"], s["dst"], s["src"])
+    )
+    return suggestions
+
+
+#######################################################################
@@ -0,0 +1,271 @@
+"""
+A streaming export engine for the ``list`` command line scripts.
+
+A list of dotted field paths (the ``-f`` option), e.g.,
+``emailaddress_set.active.0.address``, is compiled once into an
+``ExportPlan``: forward foreign keys become ``select_related()``, and
+``<related>_set.<queryset method>.<index>`` becomes a
+``Prefetch(..., to_attr=...)``, so resolving the fields of each object
+does not query the database.  Anything the plan cannot follow
+is resolved (lazily) exactly as before.
+
+Objects are loaded in chunks, so the number of queries depends on the
+number of chunks and fields, not on the number of objects,
+and memory use is bounded by the chunk size.
+Rows are written as TSV, CSV, or JSON Lines.
+"""
+#######################
+from __future__ import print_function, unicode_literals
+
+import csv
+import json
+import sys
+import time
+
+from django.db import models
+
+#######################################################################
+
+FORMATS = ["tsv", "csv", "jsonl"]
+
+#######################################################################
+
+
+def _person_contact_info(type_name):
+    def prefetches(prefix):
+        from .. import models as people_models
+        from ..querysets import contact_info_prefetches
+
+        return contact_info_prefetches(
+            prefix, types=[getattr(people_models, type_name)]
+        )
+
+    return prefetches
+
+
+# {(app_label.model_name, attribute): callable(lookup_prefix) -> [prefetches]}
+# for properties which can use prefetched data.
+ATTRIBUTE_PREFETCHES = {
+    ("people.person", "phone"): _person_contact_info("PhoneNumber"),
+    ("people.person", "email"): _person_contact_info("EmailAddress"),
+    ("people.person", "address"): _person_contact_info("StreetAddress"),
+}
+
+#######################################################################
+
+
+def _relations(model):
+    """
+    Return a dictionary {attribute name: field} for the relations of model.
+    """
+    result = {}
+    for field in model._meta.get_fields():
+        if not field.is_relation or field.related_model is None:
+            continue
+        if field.auto_created and not field.concrete:
+            name = field.get_accessor_name()
+            if name is None:
+                continue  # e.g., a hidden related name.
+        else:
+            name = field.name
+        result[name] = field
+    return result
+
+
+def _queryset_method(model, name):
+    """
+    Return ``model._default_manager.<name>()`` if that is a queryset
+    for ``model`` (e.g., ``active``), otherwise None.
+    """
+    if name.startswith("_") or name.isdigit():
+        return None
+    method = getattr(model._default_manager, name, None)
+    if not callable(method) or getattr(method, "alters_data", False):
+        return None
+    try:
+        queryset = method()
+    except TypeError:  # arguments required.
+        return None
+    if isinstance(queryset, models.QuerySet) and queryset.model is model:
+        return queryset
+    return None
+
+
+class ExportPlan(object):
+    """
+    The compiled form of a field list for a model.
+    ``paths`` are the field paths to resolve on each object, which
+    may refer to ``to_attr`` lists of prefetched objects.
+    """
+
+    def __init__(self, model, field_list):
+        self.model = model
+        self.field_list = list(field_list)
+        self.select_related = []
+        self.prefetch_related = []
+        # {(lookup, method): [to_attr, queryset, select_related]}
+        self._planned = {}
+        self.paths = [self._compile(field) for field in self.field_list]
+        for (lookup, method), (to_attr, queryset, related) in self._planned.items():
+            if related:
+                queryset = queryset.select_related(*related)
+            self.prefetch_related.append(
+                models.Prefetch(lookup, queryset=queryset, to_attr=to_attr)
+            )
+
+    def _add_select_related(self, lookup):
+        if lookup and "__".join(lookup) not in self.select_related:
+            self.select_related.append("__".join(lookup))
+
+    def _add_prefetches(self, prefetches):
+        seen = [p.prefetch_to for p in self.prefetch_related]
+        for prefetch in prefetches:
+            if prefetch.prefetch_to not in seen:
+                self.prefetch_related.append(prefetch)
+
+    def _compile(self, field):
+        bits = field.split(".")
+        model = self.model
+        lookup = []  # the select_related path to model.
+        planned = None  # the prefetch this path goes through.
+        inner = []  # the select_related path within the prefetch.
+        n = 0
+        while n < len(bits):
+            bit = bits[n]
+            key = (model._meta.label_lower, bit)
+            if key in ATTRIBUTE_PREFETCHES and planned is None:
+                prefix = "__".join(lookup) + "__" if lookup else ""
+                self._add_prefetches(ATTRIBUTE_PREFETCHES[key](prefix))
+                break
+            rel = _relations(model).get(bit)
+            if rel is None:
+                break
+            if rel.many_to_one or rel.one_to_one:
+                if planned is None:
+                    lookup.append(bit)
+                else:
+                    inner.append(bit)
+                model = rel.related_model
+                n += 1
+                continue
+            # a to-many relation: only planned when used as
+            # <related>.<queryset method>.<index>
+            if planned is not None:
+                break
+            target = rel.related_model
+            if n + 2 >= len(bits) or not bits[n + 2].isdigit():
+                break
+            method = bits[n + 1]
+            queryset = _queryset_method(target, method)
+            if queryset is None:
+                break
+            index = n + 2
+            key = ("__".join(lookup + [bit]), method)
+            if key not in self._planned:
+                to_attr = "_export_{}".format(len(self._planned))
+                self._planned[key] = [to_attr, queryset, []]
+            planned = self._planned[key]
+            bits = bits[:n] + [planned[0]] + bits[index:]
+            model = target
+            n += 2  # the to_attr and the index.
+
+        self._add_select_related(lookup)
+        if inner and "__".join(inner) not in planned[2]:
+            planned[2].append("__".join(inner))
+        return ".".join(bits)
+
+    def apply(self, queryset):
+        """
+        Add the planned related object loading to the queryset.
+        """
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        return queryset
+
+
+def compile_plan(model, field_list):
+    """
+    Compile a list of dotted field paths for the model.
+    """
+    return ExportPlan(model, field_list)
+
+
+#######################################################################
+
+
+def iter_chunks(queryset, chunk_size=500):
+    """
+    Yield the objects of queryset in lists of (at most) ``chunk_size``,
+    in the queryset's order, with ``select_related``/``prefetch_related``
+    applied to each chunk.
+    Only the primary keys of the queryset are held in memory.
+    """
+    pk_list = []
+    seen = set()
+    pk_qs = queryset.prefetch_related(None).values_list("pk", flat=True)
+    for pk in pk_qs.iterator():
+        if pk not in seen:
+            seen.add(pk)
+            pk_list.append(pk)
+    for start in range(0, len(pk_list), chunk_size):
+        chunk_pks = pk_list[start : start + chunk_size]
+        objects = queryset.in_bulk(chunk_pks)
+        yield [objects[pk] for pk in chunk_pks if pk in objects]
+
+
+def export_rows(queryset, field_list, chunk_size=500):
+    """
+    Yield a list of string values for each object:
+    the pk, the object, and the resolved fields.
+    """
+    from ..cli import resolve_fields
+
+    plan = compile_plan(queryset.model, field_list)
+    for chunk in iter_chunks(plan.apply(queryset), chunk_size):
+        for item in chunk:
+            values = ["{}".format(item.pk), "{}".format(item)]
+            values += resolve_fields(item, plan.paths)
+            yield values
+
+
+def write_export(queryset, field_list, format="tsv", stream=None, chunk_size=500):
+    """
+    Write the export of queryset to ``stream`` (default: stdout),
+    in the given format.
+    Returns a pair (number of rows, elapsed seconds).
+    """
+    if stream is None:
+        stream = sys.stdout
+    field_list = list(field_list or [])
+    header = ["pk", "object"] + field_list
+    writer = None
+    if format == "csv":
+        writer = csv.writer(stream)
+        writer.writerow(header)
+    elif format not in FORMATS:
+        raise ValueError("Unknown export format: {!r}".format(format))
+
+    n = 0
+    start = time.time()
+    for values in export_rows(queryset, field_list, chunk_size):
+        if format == "tsv":
+            stream.write("\t".join(values) + "\n")
+        elif format == "csv":
+            writer.writerow(values)
+        else:
+            stream.write(json.dumps(dict(zip(header, values))) + "\n")
+        n += 1
+    return n, time.time() - start
+
+
+def throughput_report(n, elapsed):
+    """
+    A one line summary of export throughput.
+    """
+    rate = n / elapsed if elapsed > 0 else float(n)
+    return "{} rows in {:.2f}s ({:.0f} rows/s)".format(n, elapsed, rate)
+
+
+#######################################################################
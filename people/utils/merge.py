@@ -5,7 +5,8 @@ Utility function to allow to different person records to be merged.
 
 from __future__ import print_function, unicode_literals
 
-from django.contrib.admin.utils import NestedObjects
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import DatabaseError, transaction
 
 
 ###############################################################
@@ -13,36 +14,53 @@ from django.contrib.admin.utils import NestedObjects
 Compute the Damerau-Levenshtein distance between two given
 strings (s1 and s2).
 
+This is the "optimal string alignment" variant (no substring is edited
+more than once), computed row by row: only the last three rows are kept,
+so memory is O(m).  With ``max_distance``, the computation stops as soon
+as the distance must exceed it, and ``max_distance + 1`` is returned.
+
 Reference: https://en.wikipedia.org/wiki/Damerau%E2%80%93Levenshtein_distance
-Source: https://www.guyrutenberg.com/2008/12/15/damerau-levenshtein-distance-in-python/
-Date retrieved: 2016-Sept-20
 """
 
 
-def damerau_levenshtein_distance(s1, s2):
-    d = {}
+def damerau_levenshtein_distance(s1, s2, max_distance=None):
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1  # rows are the length of the shorter string.
     lenstr1 = len(s1)
     lenstr2 = len(s2)
-    for i in range(-1, lenstr1 + 1):
-        d[(i, -1)] = i + 1
-    for j in range(-1, lenstr2 + 1):
-        d[(-1, j)] = j + 1
-
-    for i in range(lenstr1):
-        for j in range(lenstr2):
-            if s1[i] == s2[j]:
-                cost = 0
-            else:
-                cost = 1
-            d[(i, j)] = min(
-                d[(i - 1, j)] + 1,  # deletion
-                d[(i, j - 1)] + 1,  # insertion
-                d[(i - 1, j - 1)] + cost,  # substitution
+    if max_distance is not None and lenstr1 - lenstr2 > max_distance:
+        return max_distance + 1
+    if lenstr2 == 0:
+        return lenstr1
+
+    before = None
+    previous = list(range(lenstr2 + 1))
+    for i in range(1, lenstr1 + 1):
+        current = [i] + [0] * lenstr2
+        c1 = s1[i - 1]
+        for j in range(1, lenstr2 + 1):
+            cost = 0 if c1 == s2[j - 1] else 1
+            value = min(
+                previous[j] + 1,  # deletion
+                current[j - 1] + 1,  # insertion
+                previous[j - 1] + cost,  # substitution
             )
-            if i and j and s1[i] == s2[j - 1] and s1[i - 1] == s2[j]:
-                d[(i, j)] = min(d[(i, j)], d[i - 2, j - 2] + cost)  # transposition
+            if (
+                i > 1
+                and j > 1
+                and c1 == s2[j - 2]
+                and s1[i - 2] == s2[j - 1]
+                and before[j - 2] + cost < value
+            ):
+                value = before[j - 2] + cost  # transposition
+            current[j] = value
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        before, previous = previous, current
 
-    return d[lenstr1 - 1, lenstr2 - 1]
+    if max_distance is not None and previous[lenstr2] > max_distance:
+        return max_distance + 1
+    return previous[lenstr2]
 
 
 ###############################################################
@@ -52,14 +70,136 @@ def name_check(p1, p2):
     """
     Returns a percentage difference between the names of two people
     """
-    d = damerau_levenshtein_distance(p1.cn, p2.cn)
-    n = min([len(p1.cn), len(p2.cn)])
+    return name_difference(p1.cn, p2.cn)
+
+
+def name_difference(cn1, cn2, threshold=None):
+    """
+    The distance between two names, relative to the shorter name.
+    With ``threshold``, any difference larger than the threshold may be
+    reported as ``threshold`` plus a little (the computation stops early).
+    """
+    n = min([len(cn1), len(cn2)])
+    if n == 0:
+        return float(max([len(cn1), len(cn2)]) > 0)
+    max_distance = None
+    if threshold is not None:
+        max_distance = int(threshold * n)
+    d = damerau_levenshtein_distance(cn1, cn2, max_distance)
     return float(d) / float(n)
 
 
 ###############################################################
 
 
+class RelationPlan(object):
+    """
+    The planned relink of one relation from the source person to the
+    destination person: one ``UPDATE`` of ``field`` on ``model``.
+    ``duplicate_pks`` are the source rows which would violate a unique
+    constraint (the destination already has an equivalent row);
+    they are deleted instead.
+    """
+
+    def __init__(self, model, field, duplicate_pks, count):
+        self.model = model
+        self.field = field
+        self.duplicate_pks = duplicate_pks
+        self.count = count
+
+    def __str__(self):
+        return "{}.{}".format(self.model._meta.verbose_name, self.field)
+
+
+def _unique_sets(model, field_name):
+    """
+    The other fields of each unique constraint of ``model`` which
+    includes ``field_name``.  An empty set means ``field_name`` is unique.
+    """
+    result = []
+    if model._meta.get_field(field_name).unique:
+        result.append(())
+    for fields in model._meta.unique_together:
+        if field_name in fields:
+            result.append(tuple([f for f in fields if f != field_name]))
+    return result
+
+
+def _plan_relation(model, field_name, pk1, pk2, using):
+    """
+    Plan relinking ``model.field_name`` from pk2 to pk1.
+    """
+    manager = model._base_manager.using(using)
+    src_rows = manager.filter(**{field_name: pk2})
+    count = src_rows.count()
+    duplicate_pks = set()
+    if count:
+        for other in _unique_sets(model, field_name):
+            if not other:
+                if manager.filter(**{field_name: pk1}).exists():
+                    duplicate_pks |= set(src_rows.values_list("pk", flat=True))
+                continue
+            dst_values = set(manager.filter(**{field_name: pk1}).values_list(*other))
+            for row in src_rows.values_list("pk", *other):
+                if tuple(row[1:]) in dst_values:
+                    duplicate_pks.add(row[0])
+    return RelationPlan(model, field_name, sorted(duplicate_pks), count)
+
+
+def plan_merge(pk1, pk2, using=None):
+    """
+    Plan the relink of everything that refers to person ``pk2``
+    to person ``pk1``: one ``RelationPlan`` for each reverse relation
+    of ``Person._meta.related_objects``, and each many-to-many table,
+    which has rows for ``pk2``.
+    """
+    from ..models import Person
+
+    if using is None:
+        using = "default"
+
+    plan = []
+    for rel in Person._meta.related_objects:
+        if rel.many_to_many:
+            through = rel.field.remote_field.through
+            if not through._meta.auto_created:
+                continue  # the through model's foreign key is planned.
+            field_name = rel.field.m2m_reverse_field_name()
+            plan.append(_plan_relation(through, field_name, pk1, pk2, using))
+        else:
+            plan.append(
+                _plan_relation(rel.related_model, rel.field.name, pk1, pk2, using)
+            )
+    for field in Person._meta.many_to_many:
+        through = field.remote_field.through
+        if not through._meta.auto_created:
+            continue
+        plan.append(_plan_relation(through, field.m2m_field_name(), pk1, pk2, using))
+    return [p for p in plan if p.count]
+
+
+def execute_plan(plan, pk1, pk2, using=None, verbosity=0):
+    """
+    Carry out a merge plan: delete the duplicate rows, and relink
+    each relation with a single ``UPDATE``.
+    Use inside ``transaction.atomic()``.
+    """
+    if using is None:
+        using = "default"
+    for p in plan:
+        manager = p.model._base_manager.using(using)
+        if p.duplicate_pks:
+            manager.filter(pk__in=p.duplicate_pks).delete()
+            if verbosity > 1:
+                print("{}: {} duplicate(s) removed".format(p, len(p.duplicate_pks)))
+        n = manager.filter(**{p.field: pk2}).update(**{p.field: pk1})
+        if verbosity > 1:
+            msg = "{} updated".format(p)
+            if verbosity > 2:
+                msg += " :: {} row(s) {} -> {}".format(n, pk2, pk1)
+            print(msg)
+
+
 def merge_people(
     p1_pk,
     p2_pk,
@@ -73,6 +213,9 @@ def merge_people(
 ):
     """
     Merge values of ``p2`` into ``p1``, and (usually) delete ``p2``.
+    Everything happens in a single transaction.
+    With ``commit=False``, the merge is planned (and reported) only.
+    Returns the merge plan.
     """
 
     def _get_person(pk_or_obj):
@@ -81,18 +224,18 @@ def merge_people(
         if isinstance(pk_or_obj, Person):
             obj = pk_or_obj
             pk = obj.pk
-            qs = Person.objects.filter(pk=pk)
         else:
             pk = pk_or_obj
-            qs = Person.objects.filter(pk=pk)
-            obj = qs.get()
-        return pk, obj, qs
+            obj = Person.objects.using(using).get(pk=pk)
+        return pk, obj
 
     if using is None:
         using = "default"
 
-    pk1, obj1, qs1 = _get_person(p1_pk)
-    pk2, obj2, qs2 = _get_person(p2_pk)
+    pk1, obj1 = _get_person(p1_pk)
+    pk2, obj2 = _get_person(p2_pk)
+    if pk1 == pk2:
+        raise ValueError("Cannot merge a person into themselves")
 
     if verbosity > 0:
         print("Merging {} [{}] -> {} [{}]".format(obj2, pk2, obj1, pk1))
@@ -110,59 +253,82 @@ def merge_people(
     elif verbosity > 2:
         print("Skipped name check")
 
-    if verbosity > 2:
-        print(":: Updated related objects ::")
-    # set related objects from obj2 to obj1::
-    while True:
-        # continue to recollect each object since updating this
-        #   can have side effects.
-        c2 = NestedObjects(using=using)
-        c2.collect(qs2)
-        if obj2 not in c2.edges:
-            break
-        o = c2.edges[obj2][0]  # list of subobject of obj to modify, do the first one
+    with transaction.atomic(using=using):
+        plan = plan_merge(pk1, pk2, using=using)
         if verbosity > 2:
-            print("{}: {}".format(o._meta.verbose_name, o))
-        # f_list is the list of field objects in o that point back to obj2
-        f_list = [f for f in o._meta.fields if f.rel and f.rel.to == obj2._meta.model]
-        for f in f_list:
-            if verbosity > 1:
-                msg = "{}.{} updated".format(o._meta.verbose_name, f.name)
-                if verbosity > 2:
-                    msg += " :: {} -> {}".format(obj2, obj1)
-                print(msg)
-            setattr(o, f.name, obj1)
+            print(":: Updated related objects ::")
         if commit:
-            o.save(using=using)
-
-    if verbosity > 2:
-        print(":: Updated local fields objects ::")
-
-    # set attributes on the obj1::
-    for f_name in [f.name for f in obj1._meta.fields if f.rel is None]:
-        if f_name in ["id", "created", "modified"]:
-            continue
-        value1 = getattr(obj1, f_name)
-        if overwrite_p1 or not value1:
-            value2 = getattr(obj2, f_name)
-            if verbosity > 1:
-                msg = ".{} updated".format(f_name)
-                if verbosity > 2:
-                    msg += " :: {!r} -> {!r}".format(value1, value2)
-                print(msg)
-            if f_name == "slug" and value2 and not delete_p2:
+            execute_plan(plan, pk1, pk2, using=using, verbosity=verbosity)
+        elif verbosity > 1:
+            for p in plan:
                 print(
-                    'Will not update destination slug field:: value "{}", as this would violate uniqueness'.format(
-                        value2
+                    "{}: {} row(s), {} duplicate(s)".format(
+                        p, p.count, len(p.duplicate_pks)
                     )
                 )
-            else:
-                setattr(obj1, f_name, value2)
-    if commit:
-        # delete p2, if asked.
-        if delete_p2:
-            obj2.delete(using=using)
-        obj1.save(using=using)
+
+        if verbosity > 2:
+            print(":: Updated local fields objects ::")
+
+        # set attributes on the obj1::
+        for f_name in [f.name for f in obj1._meta.fields if not f.is_relation]:
+            if f_name in ["id", "created", "modified"]:
+                continue
+            value1 = getattr(obj1, f_name)
+            if overwrite_p1 or not value1:
+                value2 = getattr(obj2, f_name)
+                if verbosity > 1:
+                    msg = ".{} updated".format(f_name)
+                    if verbosity > 2:
+                        msg += " :: {!r} -> {!r}".format(value1, value2)
+                    print(msg)
+                if f_name == "slug" and value2 and not delete_p2:
+                    print(
+                        'Will not update destination slug field:: value "{}", as this would violate uniqueness'.format(
+                            value2
+                        )
+                    )
+                else:
+                    setattr(obj1, f_name, value2)
+        if commit:
+            # delete p2, if asked.
+            if delete_p2:
+                obj2.delete(using=using)
+            obj1.save(using=using)
+    return plan
+
+
+def merge_people_batch(pair_list, verbosity=0, **kwargs):
+    """
+    Merge a list of (dst_pk, src_pk) pairs, each in its own transaction.
+    A destination which was merged away earlier in the batch is
+    followed to its own destination.
+    Returns a list of (dst_pk, src_pk, error) triples, where error is
+    None on success; a failed merge does not stop the batch.
+    """
+    merged_into = {}
+
+    def resolve(pk):
+        seen = set()
+        while pk in merged_into and pk not in seen:
+            seen.add(pk)
+            pk = merged_into[pk]
+        return pk
+
+    results = []
+    for dst_pk, src_pk in pair_list:
+        dst_pk, src_pk = resolve(dst_pk), resolve(src_pk)
+        try:
+            merge_people(dst_pk, src_pk, verbosity=verbosity, **kwargs)
+        except (ValueError, ObjectDoesNotExist, DatabaseError) as e:
+            results.append((dst_pk, src_pk, e))
+            if verbosity > 0:
+                print("Merge {} -> {} failed: {}".format(src_pk, dst_pk, e))
+            continue
+        if kwargs.get("delete_p2", True) and kwargs.get("commit", True):
+            merged_into[src_pk] = dst_pk
+        results.append((dst_pk, src_pk, None))
+    return results
 
 
 ###############################################################
@@ -0,0 +1,129 @@
+"""
+Compiled person permalinks; see the ``permalink`` setting.
+
+The setting is resolved to a single function once (when the people app
+is ready, and again if the settings change), rather than on every call
+to ``Person.get_absolute_url()``.  For the ``(view name, arg map)`` form,
+reversed URLs are memoized by URL configuration, view name and
+arguments, so rendering the same people again does not repeat the
+reverses.  ``PersonQuerySet.with_urls()`` attaches the URL to each
+person as the queryset is evaluated.
+"""
+#######################
+from __future__ import print_function, unicode_literals
+
+from functools import lru_cache
+from importlib import import_module
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import get_script_prefix, get_urlconf, reverse
+
+from .. import conf
+
+#######################################################################
+
+# the attribute used by with_urls() to store the url on each person.
+URL_ATTR = "_permalink_url"
+
+_permalink = []  # [compiled function], once compiled.
+
+#######################################################################
+
+
+def _import(dotted_path):
+    mod_name, f_name = dotted_path.rsplit(".", 1)
+    return getattr(import_module(mod_name), f_name)
+
+
+@lru_cache(maxsize=4096)
+def _cached_reverse(urlconf, prefix, view_name, args):
+    return reverse(view_name, urlconf=urlconf, args=args)
+
+
+def reverse_permalink(view_name, args):
+    """
+    ``reverse(view_name, args=args)``, memoized.
+    """
+    try:
+        args = tuple(args)
+        hash(args)
+    except TypeError:
+        return reverse(view_name, args=args)
+    return _cached_reverse(get_urlconf(), get_script_prefix(), view_name, args)
+
+
+def compile_permalink(setting):
+    """
+    Return a function mapping a person to their url (or None),
+    for a value of the ``permalink`` setting; or None when there are
+    no personal pages.
+    """
+    if setting is None:
+        return None
+    if isinstance(setting, (tuple, list)):
+        view_name, arg_callable = setting
+        if not callable(arg_callable):
+            arg_callable = _import(arg_callable)
+
+        def permalink(person):
+            args = arg_callable(person)
+            if args is None:
+                return None
+            return reverse_permalink(view_name, args)
+
+        return permalink
+    if callable(setting):
+        return setting
+    if isinstance(setting, str):
+        return _import(setting)
+    raise ImproperlyConfigured(
+        "The people 'permalink' setting must be None, a (view name, arg map) "
+        "pair, a callable, or a dotted path; not {!r}".format(setting)
+    )
+
+
+def get_permalink():
+    """
+    The compiled ``permalink`` setting (see ``compile_permalink()``).
+    """
+    if not _permalink:
+        _permalink.append(compile_permalink(conf.get("permalink")))
+    return _permalink[0]
+
+
+def resolve(person):
+    """
+    The url of the person's page, or None.
+    """
+    if URL_ATTR in person.__dict__:
+        return person.__dict__[URL_ATTR]
+    permalink = get_permalink()
+    if permalink is None:
+        return None
+    return permalink(person)
+
+
+def attach_urls(people):
+    """
+    Store the url on each person (used by ``get_absolute_url()``).
+    """
+    permalink = get_permalink()
+    for person in people:
+        person.__dict__[URL_ATTR] = None if permalink is None else permalink(person)
+    return people
+
+
+@receiver(setting_changed)
+def reset(setting=None, **kwargs):
+    """
+    Recompile when the people settings, or the urls, change.
+    """
+    if setting in (None, conf.CONFIG_NAME):
+        del _permalink[:]
+    if setting in (None, conf.CONFIG_NAME, "ROOT_URLCONF"):
+        _cached_reverse.cache_clear()
+
+
+#######################################################################
@@ -0,0 +1,355 @@
+"""
+Set-based synchronization of person flags and user groups.
+
+Flags and groups correspond by name (``PersonFlag.verbose_name`` and
+``Group.name``); people and users correspond by username.
+
+Rather than working one membership at a time, each side is read once,
+the memberships are diffed in memory, and the differences are written
+with bulk inserts and deletes on the m2m through tables.
+m2m_changed signals are still sent, once per changed person or user,
+so other apps (e.g., the directory) see the changes.
+"""
+#######################
+from __future__ import print_function, unicode_literals
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import models, transaction
+from django.utils.text import slugify
+
+from .. import conf
+from . import person2user_email, person2user_name, user2person_name
+
+#######################################################################
+
+
+def _username_map(person_pks=None, usernames=None):
+    """
+    Return a dictionary {person_pk: user_pk} for people with users.
+    """
+    from ..models import Person
+
+    UserModel = get_user_model()
+    person_qs = Person.objects.filter(username__isnull=False)
+    if person_pks is not None:
+        person_qs = person_qs.filter(pk__in=person_pks)
+    if usernames is not None:
+        person_qs = person_qs.filter(username__in=usernames)
+    person_by_username = dict(person_qs.order_by().values_list("username", "pk"))
+    user_qs = UserModel.objects.filter(
+        **{UserModel.USERNAME_FIELD + "__in": list(person_by_username)}
+    )
+    return {
+        person_by_username[username]: user_pk
+        for user_pk, username in user_qs.values_list("pk", UserModel.USERNAME_FIELD)
+    }
+
+
+def ensure_groups(name_list):
+    """
+    Return a dictionary {name: group_pk}, creating any missing groups.
+    """
+    name_set = set(name_list)
+    found = dict(Group.objects.filter(name__in=name_set).values_list("name", "pk"))
+    missing = name_set - set(found)
+    if missing:
+        # bulk_create sends no signals: the flags already exist.
+        Group.objects.bulk_create([Group(name=n) for n in missing])
+        found = dict(Group.objects.filter(name__in=name_set).values_list("name", "pk"))
+    return found
+
+
+def ensure_flags(name_list):
+    """
+    Return a dictionary {verbose_name: personflag_pk}, creating any missing
+    person flags.
+    New flags are saved normally (not bulk created), since other apps
+    may need to see them created, e.g., directory entry types.
+    """
+    from ..models import PersonFlag
+
+    name_set = set(name_list)
+    found = dict(
+        PersonFlag.objects.filter(verbose_name__in=name_set).values_list(
+            "verbose_name", "pk"
+        )
+    )
+    for name in name_set - set(found):
+        personflag = PersonFlag(verbose_name=name, slug=slugify(name))
+        personflag._sync_signal = True
+        personflag.save()
+        found[name] = personflag.pk
+    return found
+
+
+#######################################################################
+
+
+def _apply_membership(
+    through, owner_field, target_field, desired, owner_model, target_model, prune
+):
+    """
+    Make the m2m ``through`` table match ``desired``:
+    a dictionary of {owner_pk: set(target_pk)}.
+    Memberships are only removed when ``prune`` (a collection of
+    target pks) is given, and then only for target pks which appear
+    somewhere in ``desired``, or in ``prune``; otherwise memberships
+    are only added.
+    Returns a pair (n_added, n_removed).
+    """
+    owner_attname = owner_field + "_id"
+    target_attname = target_field + "_id"
+    managed = set(prune or [])
+    for pk_set in desired.values():
+        managed |= pk_set
+
+    current = {pk: set() for pk in desired}
+    current_qs = through.objects.filter(
+        **{owner_attname + "__in": list(desired), target_attname + "__in": managed}
+    ).values_list(owner_attname, target_attname)
+    for owner_pk, target_pk in current_qs:
+        current[owner_pk].add(target_pk)
+
+    added, removed = {}, {}
+    for owner_pk, pk_set in desired.items():
+        if pk_set - current[owner_pk]:
+            added[owner_pk] = pk_set - current[owner_pk]
+        if prune is not None and current[owner_pk] - pk_set:
+            removed[owner_pk] = current[owner_pk] - pk_set
+
+    with transaction.atomic():
+        if removed:
+            q = models.Q()
+            for owner_pk, pk_set in removed.items():
+                q |= models.Q(
+                    **{owner_attname: owner_pk, target_attname + "__in": pk_set}
+                )
+            through.objects.filter(q).delete()
+        through.objects.bulk_create(
+            [
+                through(**{owner_attname: owner_pk, target_attname: target_pk})
+                for owner_pk, pk_set in added.items()
+                for target_pk in pk_set
+            ]
+        )
+    _send_m2m_changed(through, owner_model, target_model, "post_remove", removed)
+    _send_m2m_changed(through, owner_model, target_model, "post_add", added)
+    return (
+        sum([len(s) for s in added.values()]),
+        sum([len(s) for s in removed.values()]),
+    )
+
+
+def _send_m2m_changed(through, owner_model, target_model, action, changes):
+    """
+    Send the m2m_changed signal for each changed owner, as though
+    ``owner.<m2m>.add()`` (or ``.remove()``) was used.
+    The owners are marked with ``_sync_signal`` to avoid loops.
+    """
+    if not changes or not models.signals.m2m_changed.has_listeners(through):
+        return
+    for owner in owner_model._default_manager.filter(pk__in=list(changes)):
+        owner._sync_signal = True
+        models.signals.m2m_changed.send(
+            sender=through,
+            instance=owner,
+            action=action,
+            reverse=False,
+            model=target_model,
+            pk_set=changes[owner.pk],
+            using=through.objects.db,
+        )
+
+
+#######################################################################
+
+
+def sync_groups_from_flags(person_pks=None, name_list=None, prune=True):
+    """
+    Person flags ==> user groups.
+    ``person_pks`` restricts the people (default: everyone with a user);
+    ``name_list`` restricts the flag/group names (default: all flags).
+    With ``prune``, users lose groups corresponding to flags
+    the person does not have.
+    Returns a pair (n_added, n_removed).
+    """
+    from ..models import Person, PersonFlag
+
+    UserModel = get_user_model()
+    user_map = _username_map(person_pks=person_pks)
+    flag_qs = PersonFlag.objects.all()
+    if name_list is not None:
+        flag_qs = flag_qs.filter(verbose_name__in=name_list)
+    flag_names = dict(flag_qs.order_by().values_list("pk", "verbose_name"))
+
+    membership = Person.flags.through.objects.filter(
+        person_id__in=list(user_map), personflag_id__in=list(flag_names)
+    ).values_list("person_id", "personflag_id")
+    wanted = {user_pk: set() for user_pk in user_map.values()}
+    for person_pk, flag_pk in membership:
+        wanted[user_map[person_pk]].add(flag_names[flag_pk])
+
+    group_pks = ensure_groups(set().union(*wanted.values()) if wanted else set())
+    prune_pks = None
+    if prune:
+        prune_pks = Group.objects.filter(name__in=flag_names.values())
+        prune_pks = prune_pks.values_list("pk", flat=True)
+    desired = {
+        user_pk: set([group_pks[name] for name in names])
+        for user_pk, names in wanted.items()
+    }
+    return _apply_membership(
+        UserModel.groups.through,
+        "user",
+        "group",
+        desired,
+        UserModel,
+        Group,
+        prune_pks,
+    )
+
+
+def sync_flags_from_groups(user_pks=None, name_list=None, prune=True):
+    """
+    User groups ==> person flags.
+    ``user_pks`` restricts the users (default: every user with a person);
+    ``name_list`` restricts the group/flag names (default: all groups).
+    With ``prune``, people lose flags corresponding to groups
+    the user does not have.
+    Returns a pair (n_added, n_removed).
+    """
+    from ..models import Person, PersonFlag
+
+    UserModel = get_user_model()
+    usernames = None
+    if user_pks is not None:
+        usernames = UserModel.objects.filter(pk__in=user_pks)
+        usernames = list(usernames.values_list(UserModel.USERNAME_FIELD, flat=True))
+    person_map = {v: k for k, v in _username_map(usernames=usernames).items()}
+    group_qs = Group.objects.all()
+    if name_list is not None:
+        group_qs = group_qs.filter(name__in=name_list)
+    group_names = dict(group_qs.order_by().values_list("pk", "name"))
+
+    membership = UserModel.groups.through.objects.filter(
+        user_id__in=list(person_map), group_id__in=list(group_names)
+    ).values_list("user_id", "group_id")
+    wanted = {person_pk: set() for person_pk in person_map.values()}
+    for user_pk, group_pk in membership:
+        wanted[person_map[user_pk]].add(group_names[group_pk])
+
+    flag_pks = ensure_flags(set().union(*wanted.values()) if wanted else set())
+    prune_pks = None
+    if prune:
+        prune_pks = PersonFlag.objects.filter(verbose_name__in=group_names.values())
+        prune_pks = prune_pks.values_list("pk", flat=True)
+    desired = {
+        person_pk: set([flag_pks[name] for name in names])
+        for person_pk, names in wanted.items()
+    }
+    return _apply_membership(
+        Person.flags.through,
+        "person",
+        "personflag",
+        desired,
+        Person,
+        PersonFlag,
+        prune_pks,
+    )
+
+
+def change_keys(owner_pks, target_pks):
+    """
+    Deferred sync keys for m2m changes: ``"<owner pk>:<target pk>"``.
+    """
+    return ["{}:{}".format(o, t) for o in owner_pks for t in target_pks]
+
+
+def _split_change_keys(keys):
+    pairs = [key.split(":") for key in keys]
+    return (
+        set([int(owner) for owner, target in pairs]),
+        set([int(target) for owner, target in pairs]),
+    )
+
+
+def sync_groups_from_flag_changes(keys):
+    """
+    The deferred applier for person flag changes (see ``change_keys``):
+    as in immediate mode, only the changed flags are synchronized
+    for the changed people.
+    """
+    from ..models import PersonFlag
+
+    person_pks, flag_pks = _split_change_keys(keys)
+    name_list = PersonFlag.objects.filter(pk__in=flag_pks).values_list(
+        "verbose_name", flat=True
+    )
+    return sync_groups_from_flags(person_pks=person_pks, name_list=list(name_list))
+
+
+def sync_flags_from_group_changes(keys):
+    """
+    The deferred applier for user group changes (see ``change_keys``):
+    as in immediate mode, only the changed groups are synchronized
+    for the changed users.
+    """
+    user_pks, group_pks = _split_change_keys(keys)
+    name_list = Group.objects.filter(pk__in=group_pks).values_list("name", flat=True)
+    return sync_flags_from_groups(user_pks=user_pks, name_list=list(name_list))
+
+
+#######################################################################
+
+
+def sync_users_from_people(person_pks):
+    """
+    Person name and email ==> user, for the given people,
+    as configured.  Users are read in one query.
+    """
+    from ..models import Person
+
+    UserModel = get_user_model()
+    person_list = list(Person.objects.filter(pk__in=person_pks, username__isnull=False))
+    user_qs = UserModel.objects.filter(
+        **{
+            UserModel.USERNAME_FIELD
+            + "__in": [person.username for person in person_list]
+        }
+    )
+    users = {user.get_username(): user for user in user_qs}
+    for person in person_list:
+        user = users.get(person.username)
+        if user is None:
+            continue
+        changed = False
+        if conf.get("sync:person:user-name"):
+            changed = person2user_name(person, user) or changed
+        if conf.get("sync:person:user-email"):
+            changed = person2user_email(person, user) or changed
+        if changed:
+            user._sync_signal = True
+            user.save()
+
+
+def sync_people_from_users(user_pks):
+    """
+    User name ==> person, for the given users, as configured.
+    People are read in one query.
+    """
+    from ..models import Person
+
+    if not conf.get("sync:person:user-name"):
+        return
+    UserModel = get_user_model()
+    users = {
+        user.get_username(): user for user in UserModel.objects.filter(pk__in=user_pks)
+    }
+    for person in Person.objects.filter(username__in=list(users)):
+        if user2person_name(person, users[person.username]):
+            person._sync_signal = True
+            person.save()
+
+
+#######################################################################
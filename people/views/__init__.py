@@ -37,9 +37,10 @@ class RequestConfirmationEmail_View(DetailView):
             raise Http404
 
         # passed all the checks. Do it!
+        # (the email is sent by a celery task, if so configured.)
         redirect_to = self.request.GET.get(self.redirect_field_name, "")
-        EmailConfirmation.objects.start_verification(
-            self.object, redirect_url=redirect_to
+        EmailConfirmation.objects.start_verification_bulk(
+            EmailAddress.objects.filter(pk=self.object.pk), redirect_url=redirect_to
         )
 
         return response
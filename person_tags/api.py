@@ -0,0 +1,84 @@
+"""
+JSON API for the person tags; see directory.api
+"""
+from __future__ import print_function, unicode_literals
+
+from directory.api import APIListView
+from directory.mixins import LabelAutocompleteJsonView
+from django.contrib import admin
+from django.contrib.auth.decorators import login_required
+from django.template.defaultfilters import truncatechars
+
+from .models import PersonTag, PersonTaggedEntry
+
+#######################################################################
+
+
+class PersonTaggedEntryAPIView(APIListView):
+    """
+    The tagged entries (``PersonTaggedEntry.objects.default()``);
+    ``?person=<slug>`` and ``?tag=<slug>`` restrict them.
+    """
+
+    field_names = ["id", "person", "tag", "tag_slug", "ordering"]
+    modified_lookups = ["modified", "person__modified", "tag__modified"]
+
+    def get_queryset(self):
+        queryset = PersonTaggedEntry.objects.default()
+        if self.request.GET.get("person"):
+            queryset = queryset.filter(person__slug=self.request.GET["person"])
+        if self.request.GET.get("tag"):
+            queryset = queryset.filter(tag__slug=self.request.GET["tag"])
+        return queryset
+
+    def serialize(self, obj):
+        return {
+            "id": obj.pk,
+            "person": obj.person.slug,
+            "tag": obj.tag.tag,
+            "tag_slug": obj.tag.slug,
+            "ordering": obj.ordering,
+        }
+
+
+#######################################################################
+
+
+class PersonTagSearchAdmin(admin.ModelAdmin):
+    """
+    The search for the tag autocomplete view: active tags, by name.
+    (Not registered with the admin site.)
+    """
+
+    search_fields = ["tag", "slug"]
+
+    def get_queryset(self, request):
+        return super(PersonTagSearchAdmin, self).get_queryset(request).active()
+
+
+class PersonTagAutocompleteJsonView(LabelAutocompleteJsonView):
+    """
+    Tags matching ``?term=``, for the tag select of the personal tag
+    editing form (``person_tags.forms.TagAutocompleteSelect``).
+    """
+
+    def has_perm(self, request, obj=None):
+        # anyone who can edit their own tags can choose from all of them.
+        return request.user.is_authenticated
+
+
+def tag_autocomplete_text(obj):
+    return truncatechars(obj.tag, 100)
+
+
+#######################################################################
+
+persontaggedentry_list = PersonTaggedEntryAPIView.as_view()
+tag_autocomplete = login_required(
+    PersonTagAutocompleteJsonView.as_view(
+        model_admin=PersonTagSearchAdmin(PersonTag, admin.site),
+        autocomplete_text=tag_autocomplete_text,
+    )
+)
+
+#######################################################################
@@ -1,6 +1,7 @@
 #########################################################################
 
 from django.apps import AppConfig
+from django.db import models
 from django.utils.translation import ugettext_lazy as _
 
 #########################################################################
@@ -15,6 +16,36 @@ class PersonTagsConfig(AppConfig):
         Any app specific startup code, e.g., register signals,
         should go here.
         """
+        from directory.models import DirectoryEntry
+        from directory.signals import entries_changed
+        from people.models import Person
+        from people.signals import people_deactivated
+
+        from . import signals
+        from .models import PersonTag, PersonTaggedEntry, TagGroup
+
+        # Keep the tag index up to date.
+        models.signals.pre_save.connect(
+            signals.taggedentry_pre_save_remember, sender=PersonTaggedEntry
+        )
+        for sender in [PersonTaggedEntry, Person, DirectoryEntry]:
+            models.signals.post_save.connect(signals.index_post_change, sender=sender)
+            models.signals.post_delete.connect(signals.index_post_change, sender=sender)
+        models.signals.m2m_changed.connect(
+            signals.index_flags_changed, sender=Person.flags.through
+        )
+        people_deactivated.connect(signals.index_people_deactivated)
+        entries_changed.connect(signals.index_entries_changed)
+
+        # Invalidate the cached sitemaps.
+        for sender in [PersonTag, TagGroup]:
+            models.signals.post_save.connect(signals.sitemap_post_change, sender=sender)
+            models.signals.post_delete.connect(
+                signals.sitemap_post_change, sender=sender
+            )
+        models.signals.m2m_changed.connect(
+            signals.sitemap_post_change, sender=TagGroup.tags.through
+        )
 
 
 #########################################################################
@@ -0,0 +1,3 @@
+"""
+Command line interface management scripts for the person tags.
+"""
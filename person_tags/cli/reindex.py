@@ -0,0 +1,40 @@
+"""
+Rebuild the tag index (the people shown on the tag and tag group pages),
+and report the changes.
+"""
+#######################
+from __future__ import print_function, unicode_literals
+
+from ..index import reindex
+
+#######################
+#######################################################################
+
+HELP_TEXT = __doc__.strip()
+DJANGO_COMMAND = "main"
+USE_ARGPARSE = True
+OPTION_LIST = (
+    (
+        ["person_pk"],
+        dict(
+            nargs="*",
+            type=int,
+            help="Only reindex these people [default: everyone]",
+        ),
+    ),
+    (
+        ["--quiet"],
+        dict(action="store_true", help="Only report changes"),
+    ),
+)
+
+#######################################################################
+
+
+def main(options, args):
+    created, deleted = reindex(options["person_pk"] or None)
+    if created or deleted or not options["quiet"]:
+        print("Tag index: {} created, {} deleted.".format(created, deleted))
+
+
+#######################################################################
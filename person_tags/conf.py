@@ -6,9 +6,10 @@ All valid application settings must have a default value.
 """
 from __future__ import unicode_literals
 
-from django.conf import settings
 from django.core.files.storage import default_storage
 
+from directory.appconf import AppConf
+
 CONFIG_NAME = "PERSON_TAGS_CONFIG"  # must be uppercase!
 
 #############################################################
@@ -20,28 +21,37 @@ DEFAULT = {
     # 'upload_to' is the variable portion of the path where files are stored.
     # (optional)
     "upload_to": "person-tags/%Y/%m",
+    # the number of urls on each page of the sitemaps (see sitemap.py).
+    "sitemap:limit": 1000,
 }
 
 #############################################################
 
 
+_conf = AppConf(CONFIG_NAME, DEFAULT)
+
+
 def get(setting):
     """
     get(setting) -> value
 
     setting should be a string representing the application settings to
-    retrieve.
+    retrieve.  Settings are resolved once, see directory.appconf
     """
-    assert setting in DEFAULT, "the setting %r has no default value" % setting
-    app_settings = getattr(settings, CONFIG_NAME, DEFAULT)
-    return app_settings.get(setting, DEFAULT[setting])
+    return _conf.get(setting)
 
 
 def get_all():
     """
     Return all current settings as a dictionary.
     """
-    app_settings = getattr(settings, CONFIG_NAME, DEFAULT)
-    return dict(
-        [(setting, app_settings.get(setting, DEFAULT[setting])) for setting in DEFAULT]
-    )
+    return _conf.get_all()
+
+
+def derived(name, func):
+    """
+    derived(name, func) -> func()
+
+    A value computed from the settings, memoized until they change.
+    """
+    return _conf.derived(name, func)
@@ -1,8 +1,12 @@
 from django import forms
 from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.contrib.staticfiles.storage import staticfiles_storage
 from django.forms.models import inlineformset_factory
 from django.template.defaultfilters import slugify, truncatechars
+from django.urls import reverse
+from django.utils.functional import cached_property
 from markuphelpers.forms import LinedTextareaWidget, ReStructuredTextFormMixin
 from people.models import Person
 
@@ -29,10 +33,63 @@ class PersonForm(forms.ModelForm):
 ## ######################################################### ##
 
 
+class TagAutocompleteSelect(AutocompleteSelect):
+    """
+    A tag select which renders only the selected tag; the others are
+    searched for (with the admin's select2) as the user types, from the
+    ``persontag-tag-autocomplete`` view.
+    """
+
+    def __init__(self, attrs=None, choices=(), using=None):
+        rel = PersonTaggedEntry._meta.get_field("tag").remote_field
+        super(TagAutocompleteSelect, self).__init__(
+            rel, admin.site, attrs=attrs, choices=choices, using=using
+        )
+
+    def get_url(self):
+        return reverse("persontag-tag-autocomplete")
+
+    def optgroups(self, name, value, attr=None):
+        field = self.choices.field
+        if field.tags is None:
+            return super(TagAutocompleteSelect, self).optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, "", "", False, 0))
+        for pk in value:
+            tag = field.tags.get("{}".format(pk))
+            if tag is not None:
+                label = field.label_from_instance(tag)
+                options.append(
+                    self.create_option(name, tag.pk, label, True, len(options))
+                )
+                break
+        return [(None, options, 0)]
+
+
 class TagModelChoiceField(forms.ModelChoiceField):
+    """
+    When ``tags`` is set (by ``BasePersonTaggedEntryFormSet``), it is a
+    dictionary of the tags the form may show or accept, by pk (as text);
+    those are used, rather than a query for each form.
+    """
+
+    widget = TagAutocompleteSelect
+    tags = None
+
     def label_from_instance(self, obj):
         return truncatechars(obj.tag, 100)
 
+    def to_python(self, value):
+        if self.tags is None or value in self.empty_values:
+            return super(TagModelChoiceField, self).to_python(value)
+        try:
+            return self.tags["{}".format(value)]
+        except KeyError:
+            raise forms.ValidationError(
+                self.error_messages["invalid_choice"], code="invalid_choice"
+            )
+
 
 class PersonTaggedEntryFormSet(forms.ModelForm):
     tag = TagModelChoiceField(queryset=PersonTag.objects.active())
@@ -43,11 +100,40 @@ class PersonTaggedEntryFormSet(forms.ModelForm):
         widgets = {"ordering": forms.TextInput(attrs={"size": 8})}
 
 
+class BasePersonTaggedEntryFormSet(forms.BaseInlineFormSet):
+    """
+    Loads the tags for every form in one query: those of the existing
+    entries, and those submitted.
+    """
+
+    def submitted_tag_pks(self):
+        if not self.is_bound:
+            return []
+        pks = []
+        for i in range(self.total_form_count()):
+            value = self.data.get("{}-tag".format(self.add_prefix(i)), "")
+            if value.isdigit():
+                pks.append(value)
+        return pks
+
+    @cached_property
+    def tags(self):
+        pks = set("{}".format(entry.tag_id) for entry in self.get_queryset())
+        pks.update(self.submitted_tag_pks())
+        queryset = self.form.base_fields["tag"].queryset
+        return dict(("{}".format(tag.pk), tag) for tag in queryset.filter(pk__in=pks))
+
+    def add_fields(self, form, index):
+        super(BasePersonTaggedEntryFormSet, self).add_fields(form, index)
+        if "tag" in form.fields:
+            form.fields["tag"].tags = self.tags
+
+
 #######################################################################
 
 
 def get_persontaggedentry_formset_class(
-    form=PersonTaggedEntryFormSet, formset=forms.BaseInlineFormSet, **kwargs
+    form=PersonTaggedEntryFormSet, formset=BasePersonTaggedEntryFormSet, **kwargs
 ):
     return forms.inlineformset_factory(
         Person, PersonTaggedEntry, form, formset, **kwargs
@@ -0,0 +1,93 @@
+"""
+The tag index: a ``TagPersonIndex`` row for each active tagged entry of
+an eligible person (active, with the "directory" flag, and an active
+directory entry), so the tag and tag group pages find their people with
+one indexed lookup, rather than joining flags and directory entries.
+
+Signal handlers (see ``person_tags.signals``) reindex the people affected
+by an edit, once the transaction commits; ``reindex()`` with no
+arguments (or the ``person_tags reindex`` command) rebuilds everything,
+e.g., after bulk edits which send no signals.
+"""
+from __future__ import print_function, unicode_literals
+
+from django.db import transaction
+
+#######################################################################
+
+DIRECTORY_FLAG = "directory"
+
+#######################################################################
+
+
+def eligible_people():
+    """
+    A queryset of the pks of the people shown on tag pages.
+    """
+    from people.models import Person
+
+    return (
+        Person.objects.filter(
+            active=True,
+            flags__slug=DIRECTORY_FLAG,
+            directoryentry__active=True,
+        )
+        .order_by()
+        .values("pk")
+    )
+
+
+def reindex(person_pks=None):
+    """
+    Bring the index rows of the given person pks (default: everyone)
+    up to date.  Returns the pair (n_created, n_deleted).
+    """
+    from .models import PersonTaggedEntry, TagPersonIndex
+
+    entries = PersonTaggedEntry.objects.filter(
+        active=True, person__in=eligible_people()
+    )
+    stored = TagPersonIndex.objects.all()
+    if person_pks is not None:
+        person_pks = list(person_pks)
+        entries = entries.filter(person__in=person_pks)
+        stored = stored.filter(person__in=person_pks)
+    wanted = dict(
+        (pk, (tag_pk, person_pk))
+        for pk, tag_pk, person_pk in entries.order_by().values_list(
+            "pk", "tag", "person"
+        )
+    )
+
+    with transaction.atomic():
+        stored = dict(
+            (pk, (tag_pk, person_pk))
+            for pk, tag_pk, person_pk in stored.order_by().values_list(
+                "entry", "tag", "person"
+            )
+        )
+        delete = [pk for pk, row in stored.items() if wanted.get(pk) != row]
+        create = [
+            TagPersonIndex(entry_id=pk, tag_id=tag_pk, person_id=person_pk)
+            for pk, (tag_pk, person_pk) in wanted.items()
+            if stored.get(pk) != (tag_pk, person_pk)
+        ]
+        if delete:
+            TagPersonIndex.objects.filter(entry__in=delete).delete()
+        TagPersonIndex.objects.bulk_create(create)
+    return len(create), len(delete)
+
+
+def schedule_reindex(person_pks):
+    """
+    Reindex the people once the current transaction commits
+    (coalesced with any other reindexing scheduled in the transaction).
+    """
+    from people.utils.deferred import defer
+
+    person_pks = [pk for pk in person_pks if pk is not None]
+    if person_pks:
+        defer("person_tags.index.reindex", person_pks)
+
+
+#######################################################################
@@ -0,0 +1,72 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_index(apps, schema_editor):
+    """
+    Index the tagged entries of the people listed in the directory.
+    """
+    Person = apps.get_model("people", "Person")
+    PersonTaggedEntry = apps.get_model("person_tags", "PersonTaggedEntry")
+    TagPersonIndex = apps.get_model("person_tags", "TagPersonIndex")
+
+    eligible = Person.objects.filter(
+        active=True, flags__slug="directory", directoryentry__active=True
+    ).values("pk")
+    entries = PersonTaggedEntry.objects.filter(active=True, person__in=eligible)
+    TagPersonIndex.objects.bulk_create(
+        [
+            TagPersonIndex(entry_id=pk, tag_id=tag_pk, person_id=person_pk)
+            for pk, tag_pk, person_pk in entries.values_list("pk", "tag", "person")
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("directory", "0001_initial"),
+        ("people", "0001_initial"),
+        ("person_tags", "0008_auto_20190604_0955"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TagPersonIndex",
+            fields=[
+                (
+                    "entry",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="+",
+                        serialize=False,
+                        to="person_tags.PersonTaggedEntry",
+                    ),
+                ),
+                (
+                    "person",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="people.Person",
+                    ),
+                ),
+                (
+                    "tag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="person_tags.PersonTag",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "tag index row",
+                "index_together": {("tag", "person")},
+            },
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
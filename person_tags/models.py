@@ -10,6 +10,8 @@ from __future__ import print_function, unicode_literals
 import os
 
 from django.db import models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.utils.encoding import python_2_unicode_compatible
 from people.models import Person
@@ -60,15 +62,38 @@ class PersonTagQuerySet(CustomQuerySet):
         """
         Return a list of tagged people
         """
-        pk_list = self.values_list("pk", flat=True)
-        return PersonTaggedEntry.objects.get_people(tag__pk__in=pk_list)
+        pk_list = TagPersonIndex.objects.filter(tag__in=self.values("pk"))
+        return Person.objects.filter(pk__in=pk_list.values("person"))
 
     def tag_list(self):
         """
         Return a list of tags which are actually in use
         """
-        pk_list = self.values_list("pk", flat=True)
-        return PersonTaggedEntry.objects.get_tags(tag__pk__in=pk_list)
+        pk_list = TagPersonIndex.objects.filter(tag__in=self.values("pk"))
+        return PersonTag.objects.filter(active=True, pk__in=pk_list.values("tag"))
+
+    def with_group_slug(self):
+        """
+        Annotate each tag with ``active_group_count``, the number of its
+        active groups, and ``active_group_slug``, the slug of its group if
+        it has exactly one (else None); used by ``get_absolute_url()``.
+        """
+        groups = (
+            TagGroup.objects.active()
+            .filter(tags=OuterRef("pk"))
+            .order_by()
+            .values("tags")
+            .annotate(n=models.Count("pk"))
+        )
+        return self.annotate(
+            active_group_count=Coalesce(
+                Subquery(groups.values("n"), output_field=models.IntegerField()), 0
+            ),
+            active_group_slug=Subquery(
+                groups.filter(n=1).annotate(only=models.Max("slug")).values("only"),
+                output_field=models.CharField(),
+            ),
+        )
 
 
 class PersonTagManager(CustomQuerySetManager):
@@ -105,13 +130,25 @@ class PersonTag(models.Model):
         return self.tag
 
     def get_absolute_url(self):
-        if self.groups.count() == 1:
-            return reverse(
-                "persontag-taggroup-detail", kwargs={"slug": self.groups.get().slug}
-            )
+        if "active_group_slug" in self.__dict__:
+            group_slug = self.active_group_slug
+        else:
+            slug_list = list(self.groups.values_list("slug", flat=True)[:2])
+            group_slug = slug_list[0] if len(slug_list) == 1 else None
+        if group_slug is not None:
+            return reverse("persontag-taggroup-detail", kwargs={"slug": group_slug})
         else:
             return reverse("persontag-tag-detail", kwargs={"slug": self.slug})
 
+    @property
+    def has_groups(self):
+        """
+        Does this tag belong to any (active) groups?
+        """
+        if "active_group_count" in self.__dict__:
+            return self.active_group_count > 0
+        return self.groups.exists()
+
     @property
     def groups(self):
         """
@@ -129,16 +166,9 @@ class PersonTaggedEntryQuerySet(CustomQuerySet):
         Given a person tag, return the list of people who have that tag.
         """
         qs = self.filter(active=True, **kwargs)
-        pk_list = qs.values_list("person", flat=True).distinct()
-        # NB: DISTINCT required b/c directoryentry__active will
-        #   cause people with multiple directory entries to occur
-        #   multiple times.
-        return Person.objects.filter(
-            active=True,
-            pk__in=pk_list,
-            flags__slug="directory",
-            directoryentry__active=True,
-        ).distinct()
+        # the index only has the entries of people in the directory.
+        pk_list = TagPersonIndex.objects.filter(entry__in=qs.values("pk"))
+        return Person.objects.filter(pk__in=pk_list.values("person"))
 
     def get_tags(self, **kwargs):
         """
@@ -159,6 +189,20 @@ class PersonTaggedEntryQuerySet(CustomQuerySet):
             person__flags__slug="directory",
         ).select_related("person", "tag")
 
+    def with_tag_urls(self):
+        """
+        Load the tags in one query, annotated for their urls
+        (see ``PersonTagQuerySet.with_group_slug()``).
+        Other related objects are not selected, except the person.
+        """
+        return (
+            self.select_related(None)
+            .select_related("person")
+            .prefetch_related(
+                models.Prefetch("tag", queryset=PersonTag.objects.with_group_slug())
+            )
+        )
+
 
 class PersonTaggedEntryManager(CustomQuerySetManager):
     queryset_class = PersonTaggedEntryQuerySet
@@ -209,6 +253,26 @@ class PersonTaggedEntry(models.Model):
 #######################################################################
 
 
+class TagPersonIndex(models.Model):
+    """
+    The tagged entries of the people listed in the directory;
+    maintained by ``person_tags.index``.
+    """
+
+    entry = models.OneToOneField(
+        PersonTaggedEntry, on_delete=models.CASCADE, primary_key=True, related_name="+"
+    )
+    tag = models.ForeignKey(PersonTag, on_delete=models.CASCADE, related_name="+")
+    person = models.ForeignKey(Person, on_delete=models.CASCADE, related_name="+")
+
+    class Meta:
+        index_together = [["tag", "person"]]
+        verbose_name = "tag index row"
+
+
+#######################################################################
+
+
 class TagGroupQuerySet(CustomQuerySet):
     """
     Custom QuerySet for TagGroups.
@@ -264,10 +328,8 @@ class TagGroup(models.Model):
         """
         Return a queryset of people who have tags in this group.
         """
-        return self.tags.person_list()
-        tag_pk_list = self.tags.values_list("pk", flat=True)
-        qs = PersonTaggedEntry.objects.filter(tag__pk__in=tag_pk_list)
-        return qs.get_people()
+        pk_list = TagPersonIndex.objects.filter(tag__taggroup=self)
+        return Person.objects.filter(pk__in=pk_list.values("person"))
 
 
 #######################################################################
@@ -0,0 +1,85 @@
+"""
+Signal handlers which keep the tag index (see ``person_tags.index``)
+up to date.
+"""
+################################################################
+
+from .index import DIRECTORY_FLAG, schedule_reindex
+
+################################################################
+
+
+def taggedentry_pre_save_remember(sender, instance, raw, **kwargs):
+    """
+    Remember the person of a tagged entry, which may be changing.
+    """
+    if raw or instance.pk is None:
+        return
+    instance._person_tags_old_person = (
+        sender._default_manager.filter(pk=instance.pk)
+        .values_list("person", flat=True)
+        .first()
+    )
+
+
+def index_post_change(sender, instance, **kwargs):
+    """
+    Reindex the person of this instance: a person, a tagged entry,
+    or a directory entry.
+    Used for both post_save and post_delete.
+    """
+    person_pk = getattr(instance, "person_id", instance.pk)
+    old_person_pk = getattr(instance, "_person_tags_old_person", None)
+    schedule_reindex([person_pk, old_person_pk])
+
+
+def index_flags_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """
+    Adding or removing the directory flag reindexes the people.
+    """
+    if action not in ["post_add", "post_remove", "pre_clear"]:
+        return
+    if not reverse:
+        schedule_reindex([instance.pk])
+        return
+    if instance.slug != DIRECTORY_FLAG:
+        return
+    if pk_set is None:  # reverse clear
+        pk_set = instance.person_set.values_list("pk", flat=True)
+    schedule_reindex(pk_set)
+
+
+def index_people_deactivated(sender, pk_list, **kwargs):
+    """
+    People were deactivated in bulk.
+    """
+    schedule_reindex(pk_list)
+
+
+def index_entries_changed(sender, person_pks, **kwargs):
+    """
+    Directory entries were created or (de)activated in bulk,
+    e.g., by the sessional update, or flag synchronization.
+    """
+    schedule_reindex(person_pks)
+
+
+################################################################
+
+
+def sitemap_post_change(sender, **kwargs):
+    """
+    Invalidate the cached sitemaps after any edit of a tag or tag group
+    (or of the tags in a group).
+    Used for post_save, post_delete, and m2m_changed.
+    """
+    from directory.cache import invalidate_scopes
+
+    from .sitemap import SITEMAP_SCOPE
+
+    action = kwargs.get("action")  # only for m2m_changed.
+    if action is None or action in ["post_add", "post_remove", "post_clear"]:
+        invalidate_scopes([SITEMAP_SCOPE])
+
+
+################################################################
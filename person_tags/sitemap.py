@@ -1,10 +1,70 @@
 """
 Sitemap for person pages app.
+
+The sitemaps are paginated (``sitemap:limit`` urls per page), and their
+pages are cached until tags or tag groups change (the ``tags`` scope of
+``directory.cache``).
 """
-from django.contrib.sitemaps import GenericSitemap
+from django.contrib.sitemaps import Sitemap
+from django.contrib.sitemaps import views as sitemap_views
+from directory.cache import cache_directory_page
 
+from . import conf
 from .models import PersonTag, TagGroup
 
-TagGroup_Sitemap = GenericSitemap({"queryset": TagGroup.objects.active()})
+#######################################################################
+
+SITEMAP_SCOPE = "tags"
+
+#######################################################################
+
+
+class TagGroupSitemap(Sitemap):
+    """
+    The active tag groups.
+    """
+
+    @property
+    def limit(self):
+        return conf.get("sitemap:limit")
+
+    def items(self):
+        return TagGroup.objects.active().order_by("pk")
+
+    def lastmod(self, taggroup):
+        return taggroup.modified
+
+
+class PersonTagSitemap(TagGroupSitemap):
+    """
+    The active tags, annotated for their urls.
+    """
+
+    def items(self):
+        return PersonTag.objects.active().with_group_slug().order_by("pk")
+
+    @property
+    def paginator(self):
+        """
+        Count the tags without the url annotations.
+        """
+        paginator = super(PersonTagSitemap, self).paginator
+        paginator.count = PersonTag.objects.active().count()
+        return paginator
+
+    def lastmod(self, tag):
+        return tag.modified
+
+
+TagGroup_Sitemap = TagGroupSitemap()
+
+PersonTag_Sitemap = PersonTagSitemap()
+
+sitemaps = {"areas": TagGroupSitemap, "interests": PersonTagSitemap}
+
+#######################################################################
+
+index = cache_directory_page(SITEMAP_SCOPE)(sitemap_views.index)
+sitemap = cache_directory_page(SITEMAP_SCOPE)(sitemap_views.sitemap)
 
-PersonTag_Sitemap = GenericSitemap({"queryset": PersonTag.objects.active()})
+#######################################################################
@@ -5,7 +5,21 @@ when you run "manage.py test".
 Replace this with more appropriate tests for your application.
 """
 
-from django.test import TestCase
+import json
+
+from directory.cache import get_versions
+from directory.models import DirectoryEntry, EntryType
+from django.conf.urls import url
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sites.requests import RequestSite
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.views.generic import View
+from people.models import Person
+
+from . import sitemap
+from .api import persontaggedentry_list, tag_autocomplete
+from .index import reindex
+from .models import PersonTag, PersonTaggedEntry, TagGroup, TagPersonIndex
 
 
 class SimpleTest(TestCase):
@@ -14,3 +28,260 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class TagAPI(TestCase):
+    """
+    Test the person tags JSON API.
+    """
+
+    def test_list(self):
+        person = Person.objects.create(cn="Tagged Person", given_name="T", sn="P")
+        person.add_flag_by_name("directory")
+        other = Person.objects.create(cn="Not Listed", given_name="N", sn="L")
+        tag = PersonTag.objects.create(slug="statistics", tag="statistics")
+        PersonTaggedEntry.objects.create(person=person, tag=tag)
+        PersonTaggedEntry.objects.create(person=other, tag=tag)
+
+        request = RequestFactory().get("/?fields=person,tag_slug")
+        response = persontaggedentry_list(request)
+        data = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(
+            data["results"], [{"person": person.slug, "tag_slug": "statistics"}]
+        )
+        request = RequestFactory().get(
+            "/?fields=person,tag_slug", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(persontaggedentry_list(request).status_code, 304)
+
+
+class TagAutocomplete(TestCase):
+    """
+    Test the tag autocomplete view.
+    """
+
+    def setUp(self):
+        for slug in ["statistics", "stochastics", "algebra"]:
+            PersonTag.objects.create(slug=slug, tag=slug)
+        PersonTag.objects.create(slug="stale", tag="stale", active=False)
+        self.user = User.objects.create_user("tagger")
+
+    def search(self, term, user):
+        request = RequestFactory().get("/", {"term": term})
+        request.user = user
+        return tag_autocomplete(request)
+
+    def test_search(self):
+        response = self.search("st", self.user)
+        data = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(
+            [result["text"] for result in data["results"]],
+            ["statistics", "stochastics"],
+        )
+        self.assertFalse(data["pagination"]["more"])
+        self.assertEqual(self.search("st", AnonymousUser()).status_code, 302)
+
+
+class TagIndex(TransactionTestCase):
+    """
+    Test the tag index.
+    (TransactionTestCase, since people are reindexed on commit.)
+    """
+
+    def setUp(self):
+        self.staff = EntryType.objects.create(
+            slug="staff", verbose_name="Staff", verbose_name_plural="Staff"
+        )
+        self.tag = PersonTag.objects.create(slug="statistics", tag="statistics")
+        self.other_tag = PersonTag.objects.create(slug="algebra", tag="algebra")
+        self.group = TagGroup.objects.create(name="Mathematics", slug="math")
+        self.group.tags.add(self.tag, self.other_tag)
+        self.people = []
+        for n in range(2):
+            person = Person.objects.create(
+                cn="Person {}".format(n), given_name="P", sn="{}".format(n)
+            )
+            person.add_flag_by_name("directory")
+            DirectoryEntry.objects.create(person=person, type=self.staff)
+            PersonTaggedEntry.objects.create(person=person, tag=self.tag)
+            self.people.append(person)
+
+    def assertPeople(self, queryset, people):
+        self.assertEqual(list(queryset), people)
+
+    def test_signals(self):
+        p0, p1 = self.people
+        tags = PersonTag.objects.filter(pk=self.tag.pk)
+        self.assertPeople(tags.person_list(), [p0, p1])
+        self.assertPeople(PersonTag.objects.tag_list(), [self.tag])
+        self.assertPeople(self.group.people, [p0, p1])
+
+        # the directory entry, the directory flag, and the person.
+        entry = DirectoryEntry.objects.get(person=p0)
+        entry.active = False
+        entry.save()
+        self.assertPeople(tags.person_list(), [p1])
+        entry.active = True
+        entry.save()
+        self.assertPeople(tags.person_list(), [p0, p1])
+
+        p1.flags.clear()
+        self.assertPeople(tags.person_list(), [p0])
+        p1.add_flag_by_name("directory")
+        self.assertPeople(tags.person_list(), [p0, p1])
+
+        p0.active = False
+        p0.save()
+        self.assertPeople(tags.person_list(), [p1])
+        p0.active = True
+        p0.save()
+
+        # tagged entries.
+        tagged = PersonTaggedEntry.objects.create(person=p1, tag=self.other_tag)
+        self.assertPeople(PersonTag.objects.tag_list(), [self.other_tag, self.tag])
+        tagged.person = p0
+        tagged.save()
+        self.assertEqual(
+            list(TagPersonIndex.objects.filter(entry=tagged).values_list("person")),
+            [(p0.pk,)],
+        )
+        self.assertPeople(self.group.people, [p0, p1])
+        self.assertPeople(self.other_tag.persontaggedentry_set.get_people(), [p0])
+        tagged.delete()
+        self.assertPeople(PersonTag.objects.tag_list(), [self.tag])
+
+        self.assertEqual(reindex(), (0, 0))
+
+    def test_bulk_entry_changes(self):
+        """
+        Entries (de)activated in bulk, e.g., by the sessional update,
+        reindex their people.
+        """
+        from directory.utils import sessionals
+
+        p0, p1 = self.people
+        tags = PersonTag.objects.filter(pk=self.tag.pk)
+        entry = DirectoryEntry.objects.get(person=p0)
+        row = sessionals._diff_row(
+            sessionals.DEACTIVATE, p0.pk, p0.cn, entry.pk, self.staff.slug
+        )
+        sessionals.apply_changes([row])
+        self.assertPeople(tags.person_list(), [p1])
+        row = sessionals._diff_row(
+            sessionals.REACTIVATE, p0.pk, p0.cn, entry.pk, self.staff.slug
+        )
+        sessionals.apply_changes([row])
+        self.assertPeople(tags.person_list(), [p0, p1])
+
+    def test_reindex(self):
+        TagPersonIndex.objects.all().delete()
+        self.assertEqual(reindex([self.people[0].pk]), (1, 0))
+        self.assertEqual(reindex(), (1, 0))
+        with self.assertNumQueries(1):
+            self.assertPeople(self.group.people, self.people)
+
+
+urlpatterns = [
+    url(r"^areas/(?P<slug>[\w-]+)/$", View.as_view(), name="persontag-taggroup-detail"),
+    url(r"^interests/(?P<slug>[\w-]+)/$", View.as_view(), name="persontag-tag-detail"),
+    url(
+        r"^sitemap-(?P<section>[\w-]+)\.xml$",
+        sitemap.sitemap,
+        {"sitemaps": sitemap.sitemaps},
+        name="persontag-sitemap",
+    ),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class TagURLs(TestCase):
+    """
+    Test the tag urls, with and without the group annotation.
+    """
+
+    def setUp(self):
+        groups = [
+            TagGroup.objects.create(name=name, slug=name, active=active)
+            for name, active in [("one", True), ("two", True), ("old", False)]
+        ]
+        self.tags = []
+        for slug, group_list in [
+            ("single", groups[:1]),
+            ("double", groups[:2]),
+            ("none", []),
+            ("retired", groups[1:]),
+        ]:
+            tag = PersonTag.objects.create(slug=slug, tag=slug)
+            tag.taggroup_set.set(group_list)
+            self.tags.append(tag)
+
+    def test_urls(self):
+        expected = [
+            "/areas/one/",
+            "/interests/double/",
+            "/interests/none/",
+            "/areas/two/",
+        ]
+        self.assertEqual([tag.get_absolute_url() for tag in self.tags], expected)
+        self.assertEqual(
+            [tag.has_groups for tag in self.tags], [True, True, False, True]
+        )
+        with self.assertNumQueries(1):
+            tags = PersonTag.objects.with_group_slug().order_by("pk")
+            self.assertEqual([tag.get_absolute_url() for tag in tags], expected)
+            self.assertEqual([tag.active_group_count for tag in tags], [1, 2, 0, 1])
+
+    def test_entries(self):
+        person = Person.objects.create(cn="Tagged Person", given_name="T", sn="P")
+        person.add_flag_by_name("directory")
+        for tag in self.tags:
+            PersonTaggedEntry.objects.create(person=person, tag=tag)
+        with self.assertNumQueries(2):
+            entries = PersonTaggedEntry.objects.default().with_tag_urls()
+            urls = dict([(e.tag.slug, e.tag.get_absolute_url()) for e in entries])
+        self.assertEqual(
+            urls, dict([(tag.slug, tag.get_absolute_url()) for tag in self.tags])
+        )
+
+
+@override_settings(ROOT_URLCONF=__name__, PERSON_TAGS_CONFIG={"sitemap:limit": 2})
+class TagSitemaps(TransactionTestCase):
+    """
+    Test the paginated tag sitemaps, and their invalidation.
+    (TransactionTestCase, since invalidation happens on commit.)
+    """
+
+    def setUp(self):
+        group = TagGroup.objects.create(name="Mathematics", slug="math")
+        for slug in ["algebra", "geometry", "statistics"]:
+            PersonTag.objects.create(slug=slug, tag=slug)
+        group.tags.add(PersonTag.objects.get(slug="statistics"))
+        self.site = RequestSite(RequestFactory().get("/"))
+
+    def locations(self, sitemap, page=1):
+        return [url["location"] for url in sitemap.get_urls(page, self.site)]
+
+    def test_sitemaps(self):
+        tags = sitemap.PersonTagSitemap()
+        with self.assertNumQueries(2):  # the count, and the page.
+            self.assertEqual(
+                self.locations(tags),
+                [
+                    "http://testserver/interests/algebra/",
+                    "http://testserver/interests/geometry/",
+                ],
+            )
+        self.assertEqual(self.locations(tags, 2), ["http://testserver/areas/math/"])
+        self.assertEqual(tags.paginator.num_pages, 2)
+        self.assertEqual(
+            self.locations(sitemap.TagGroupSitemap()), ["http://testserver/areas/math/"]
+        )
+        self.assertIsNotNone(tags.get_urls(1, self.site)[0]["lastmod"])
+
+    def test_invalidation(self):
+        versions = get_versions([sitemap.SITEMAP_SCOPE])
+        PersonTag.objects.get(slug="geometry").delete()
+        self.assertNotEqual(get_versions([sitemap.SITEMAP_SCOPE]), versions)
+        versions = get_versions([sitemap.SITEMAP_SCOPE])
+        TagGroup.objects.get().tags.clear()
+        self.assertNotEqual(get_versions([sitemap.SITEMAP_SCOPE]), versions)
@@ -2,6 +2,8 @@ from django.conf.urls import url
 from django.views.generic.detail import DetailView
 from django.views.generic.list import ListView
 
+from . import sitemap
+from .api import persontaggedentry_list, tag_autocomplete
 from .models import PersonTag, PersonTaggedEntry, TagGroup
 from .views import person_tag_create, person_tagged_entry_update
 
@@ -9,7 +11,7 @@ urlpatterns = [
     url(
         r"^$",
         ListView.as_view(
-            queryset=PersonTaggedEntry.objects.default(),
+            queryset=PersonTaggedEntry.objects.default().with_tag_urls(),
             template_name="person_tags/persontaggedentry_list.html",
         ),
         name="persontag-person-list",
@@ -27,7 +29,7 @@ urlpatterns = [
     url(
         r"^interests/$",
         ListView.as_view(
-            queryset=PersonTag.objects.tag_list(),
+            queryset=PersonTag.objects.tag_list().with_group_slug(),
             template_name="person_tags/tag_list.html",
             context_object_name="tag_list",
         ),
@@ -61,4 +63,18 @@ urlpatterns = [
         name="persontag-persontag-create",
     ),
     url(r"^tag/new/$", person_tag_create, name="persontag-persontag-create-general"),
+    url(r"^tag/autocomplete/$", tag_autocomplete, name="persontag-tag-autocomplete"),
+    url(r"^api/tags/$", persontaggedentry_list, name="persontag-api-tag-list"),
+    url(
+        r"^sitemap\.xml$",
+        sitemap.index,
+        {"sitemaps": sitemap.sitemaps, "sitemap_url_name": "persontag-sitemap"},
+        name="persontag-sitemap-index",
+    ),
+    url(
+        r"^sitemap-(?P<section>[\w-]+)\.xml$",
+        sitemap.sitemap,
+        {"sitemaps": sitemap.sitemaps},
+        name="persontag-sitemap",
+    ),
 ]
@@ -46,16 +46,33 @@ class Command(BaseCommand):
             "Enter rooms to search for.  End with CTRL+D on a line by itself.\n\n"
         )
         txt = sys.stdin.read().strip()
-        room_l = txt.split("\n")
+        room_l = [r.strip() for r in txt.split("\n") if r.strip()]
+        # every line is matched at once: see places.search.resolve
+        resolved = ClassRoom.objects.resolve(room_l)
         room_m = []
+        problems = 0
         for r in room_l:
-            obj = list(ClassRoom.objects.search(r))[-1]
+            matches = resolved[r]
+            if len(matches) != 1:
+                problems += 1
+                if not matches:
+                    self.stderr.write("{}\tnot found".format(r))
+                else:
+                    self.stderr.write(
+                        "{}\tambiguous: {}".format(
+                            r, ", ".join(["{}".format(obj) for obj in matches])
+                        )
+                    )
+                continue
+            obj = matches[0]
             room_m.append(obj)
             if options["show-detail"] or options["verbosity"] > 1:
                 self.stdout.write(self.style.SUCCESS("{}\t{}".format(obj.pk, obj)))
 
         room_v = ",".join([str(obj.pk) for obj in room_m])
         self.stdout.write(room_v)
+        if problems:
+            raise CommandError("{} room(s) could not be resolved".format(problems))
 
 
 #######################################################################
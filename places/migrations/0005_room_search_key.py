@@ -0,0 +1,47 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:12
+
+import unicodedata
+
+from django.db import migrations, models
+
+# a copy of places.search.room_search_key, as it was for this migration.
+
+
+def normalize_key(value):
+    if value is None:
+        return ""
+    value = unicodedata.normalize("NFKD", "{}".format(value))
+    return "".join(
+        [c for c in value.casefold() if c.isalnum() and not unicodedata.combining(c)]
+    )
+
+
+def room_search_key(building, number):
+    if building == "-special":
+        return normalize_key(number)
+    return normalize_key(building) + normalize_key(number)
+
+
+def populate_search_key(apps, schema_editor):
+    Room = apps.get_model("places", "Room")
+    db_alias = schema_editor.connection.alias
+    batch = []
+    for room in Room.objects.using(db_alias).only("pk", "building", "number"):
+        room.search_key = room_search_key(room.building, room.number)
+        batch.append(room)
+    Room.objects.using(db_alias).bulk_update(batch, ["search_key"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [("places", "0004_auto_20170602_1100")]
+
+    operations = [
+        migrations.AddField(
+            model_name="room",
+            name="search_key",
+            field=models.CharField(
+                blank=True, db_index=True, default="", editable=False, max_length=96
+            ),
+        ),
+        migrations.RunPython(populate_search_key, migrations.RunPython.noop),
+    ]
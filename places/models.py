@@ -14,6 +14,8 @@ from directory import PhoneNumberField
 from django.db import models
 from django.utils.encoding import python_2_unicode_compatible
 
+from . import search
+
 # Create your models here.
 
 
@@ -22,6 +24,8 @@ class Room_Manager(models.Manager):
     Custom methods:
     
     * search
+    * prefix_search
+    * resolve
     * active
     """
 
@@ -67,6 +71,23 @@ class Room_Manager(models.Manager):
 
         return qs.distinct()
 
+    def prefix_search(self, text):
+        """Room.objects.prefix_search(text) -> <QuerySet>
+
+        Return a queryset of the active rooms whose search key starts
+        with the text's (see places.search), e.g., "MH 2" finds room
+        204 in building MH.
+        """
+        return search.prefix_search(self.active(), text)
+
+    def resolve(self, texts):
+        """Room.objects.resolve(texts) -> {text: [room, ...]}
+
+        Match a list of room strings, in at most three queries.
+        An empty list means no match; more than one, an ambiguous string.
+        """
+        return search.resolve(self.active(), texts)
+
 
 @python_2_unicode_compatible
 class Room(models.Model):
@@ -95,6 +116,10 @@ class Room(models.Model):
         blank=True,
         help_text="A key serial number, room combination, i>clicker frequency, etc.",
     )
+    # normalized building + number, maintained on save; see places.search
+    search_key = models.CharField(
+        max_length=96, blank=True, default="", editable=False, db_index=True
+    )
 
     objects = Room_Manager()
 
@@ -103,10 +128,19 @@ class Room(models.Model):
         unique_together = [["number", "building"]]
 
     def __str__(self):
-        if self.building != "-special":
+        if self.building != search.SPECIAL_BUILDING:
             return self.number + " " + self.building
         return self.number
 
+    def save(self, *args, **kwargs):
+        self.search_key = search.room_search_key(self.building, self.number)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and (
+            "number" in update_fields or "building" in update_fields
+        ):
+            kwargs["update_fields"] = set(update_fields) | {"search_key"}
+        return super(Room, self).save(*args, **kwargs)
+
 
 class ClassRoom_Manager(Room_Manager):
     def TBA(self):
@@ -0,0 +1,132 @@
+"""
+Room search on a normalized key.
+
+Each room stores ``search_key``: its building and number, with accents,
+case, whitespace and punctuation removed, e.g., "Machray Hall" room
+"204" is ``machrayhall204`` (rooms in the special building are keyed by
+their number alone).  The column is indexed, so exact and "starts with"
+lookups on it do not scan the table.
+
+A room string is matched in either order, "<building> <number>" or
+"<number> <building>" (the way rooms are displayed).
+"""
+#######################
+from __future__ import print_function, unicode_literals
+
+import operator
+import unicodedata
+from functools import reduce
+
+from django.db import models
+
+#######################################################################
+
+SPECIAL_BUILDING = "-special"
+
+#######################################################################
+
+
+def normalize_key(value):
+    """
+    Normalize a string for the search key: accents are stripped, the
+    result is case folded, and only letters and digits are kept.
+    """
+    if value is None:
+        return ""
+    value = unicodedata.normalize("NFKD", "{}".format(value))
+    return "".join(
+        [c for c in value.casefold() if c.isalnum() and not unicodedata.combining(c)]
+    )
+
+
+def room_search_key(building, number):
+    """
+    The search key for a room.
+    """
+    if building == SPECIAL_BUILDING:
+        return normalize_key(number)
+    return normalize_key(building) + normalize_key(number)
+
+
+def search_keys(text):
+    """
+    The search keys which a room string may be: the words as given
+    ("<building> <number>"), and with the first word moved to the end
+    ("<number> <building>").
+    """
+    words = "{}".format(text).split()
+    keys = [normalize_key("".join(words))]
+    if len(words) > 1:
+        keys.append(normalize_key("".join(words[1:] + words[:1])))
+    return [k for n, k in enumerate(keys) if k and k not in keys[:n]]
+
+
+#######################################################################
+
+
+def _startswith(keys):
+    return reduce(operator.or_, [models.Q(search_key__startswith=k) for k in keys])
+
+
+def prefix_search(queryset, text):
+    """
+    Restrict ``queryset`` to the rooms whose search key starts with
+    a search key of the text.
+    """
+    keys = search_keys(text)
+    if not keys:
+        return queryset.none()
+    return queryset.filter(_startswith(keys))
+
+
+def _word_matches(room, words):
+    number, building = room.number.casefold(), room.building.casefold()
+    return all([w in number or w in building for w in words])
+
+
+def resolve(queryset, texts):
+    """
+    Match many room strings at once.  Returns a dictionary of the
+    rooms matching each string (in ``queryset`` order): exact matches
+    of the search key, else the rooms whose key starts with it, else
+    (as ``Room.objects.search()`` does) the rooms whose number or
+    building contains every word, e.g., "204 Machray".
+    An empty list means no match; more than one, an ambiguous string.
+
+    This is one query, plus one for all the strings without an exact
+    match, plus one for all the strings without a prefix match.
+    """
+    keys = dict([(text, search_keys(text)) for text in texts])
+    wanted = set([k for key_list in keys.values() for k in key_list])
+    matched = list(queryset.filter(search_key__in=wanted)) if wanted else []
+    results = {}
+    for text, key_list in keys.items():
+        results[text] = [room for room in matched if room.search_key in key_list]
+
+    unmatched = [text for text in keys if keys[text] and not results[text]]
+    if unmatched:
+        prefixes = set([k for text in unmatched for k in keys[text]])
+        matched = list(queryset.filter(_startswith(prefixes)))
+        for text in unmatched:
+            results[text] = [
+                room
+                for room in matched
+                if any(room.search_key.startswith(k) for k in keys[text])
+            ]
+
+    unmatched = [text for text in unmatched if not results[text]]
+    if unmatched:
+        words = dict([(text, text.casefold().split()) for text in unmatched])
+        lookups = [
+            models.Q(number__icontains=w) | models.Q(building__icontains=w)
+            for w in set([w for word_list in words.values() for w in word_list])
+        ]
+        matched = list(queryset.filter(reduce(operator.or_, lookups)).distinct())
+        for text in unmatched:
+            results[text] = [
+                room for room in matched if _word_matches(room, words[text])
+            ]
+    return results
+
+
+#######################################################################
@@ -7,6 +7,8 @@ Replace these with more appropriate tests for your application.
 
 from django.test import TestCase
 
+from .models import ClassRoom, Room
+
 
 class SimpleTest(TestCase):
     def test_basic_addition(self):
@@ -16,6 +18,74 @@ class SimpleTest(TestCase):
         self.failUnlessEqual(1 + 1, 2)
 
 
+class RoomSearch(TestCase):
+    """
+    Test the room search key, prefix search, and bulk resolution.
+    """
+
+    def setUp(self):
+        for number, building in [
+            ("204", "Machray Hall"),
+            ("205", "Machray Hall"),
+            ("2", "Allen"),
+            ("Online", "-special"),
+        ]:
+            ClassRoom.objects.create(
+                number=number, building=building, slug=number + building
+            )
+
+    def test_search_key(self):
+        room = Room.objects.get(number="204")
+        self.assertEqual(room.search_key, "machrayhall204")
+        room.building = "Machray-Hall Annex"
+        room.save(update_fields=["building"])
+        self.assertEqual(Room.objects.get(pk=room.pk).search_key, "machrayhallannex204")
+        self.assertEqual(Room.objects.get(number="Online").search_key, "online")
+
+    def numbers(self, text):
+        return sorted(Room.objects.prefix_search(text).values_list("number", flat=True))
+
+    def test_prefix_search(self):
+        self.assertEqual(self.numbers("machray"), ["204", "205"])
+        self.assertEqual(self.numbers("20 Machray hall"), ["204", "205"])
+        self.assertEqual(self.numbers("  "), [])
+
+    def test_resolve(self):
+        texts = [
+            "204 Machray Hall",
+            "MACHRAY HALL 205",
+            "online",
+            "Machray",
+            "9 X",
+            "204 Machray",
+            "Machray 205",
+        ]
+        with self.assertNumQueries(3):
+            resolved = ClassRoom.objects.resolve(texts)
+        numbers = dict(
+            [
+                (text, [room.number for room in rooms])
+                for text, rooms in resolved.items()
+            ]
+        )
+        self.assertEqual(
+            numbers,
+            {
+                "204 Machray Hall": ["204"],
+                "MACHRAY HALL 205": ["205"],
+                "online": ["Online"],
+                "Machray": ["204", "205"],
+                "9 X": [],
+                "204 Machray": ["204"],
+                "Machray 205": ["205"],
+            },
+        )
+        with self.assertNumQueries(1):
+            ClassRoom.objects.resolve(["2 Allen"])
+        with self.assertNumQueries(2):
+            ClassRoom.objects.resolve(["Allen"])
+
+
 __test__ = {
     "doctest": """
 Another way to test that 1 + 1 is equal to 2.